@@ -140,7 +140,7 @@ def run_region_export(main_window):
                 empty_nav = np.zeros((chunk_size, chunk_size), dtype=np.uint8)
                 empty_overlay = np.zeros((chunk_size, chunk_size), dtype=np.uint8)
 
-                write_heightmap_r16(str(chunk_dir / "heightmap.r16"), height_chunk.tolist(),
+                write_heightmap_r16(str(chunk_dir / "heightmap.r16"), height_chunk,
                                     h_norm=export_data["max_height"])
                 write_control_map_r32(str(chunk_dir / "control.r32"), empty_surface, empty_nav, empty_overlay)
 
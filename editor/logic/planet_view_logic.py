@@ -1,14 +1,14 @@
 # ЗАМЕНА ВСЕГО ФАЙЛА: editor/logic/planet_view_logic.py
-import json
 import logging
-import math
+import os
 import numpy as np
 from pathlib import Path
 from dataclasses import dataclass
 
 from editor.render.palettes import map_planet_bimodal_palette
 from generator_logic.climate import biome_matcher
-from generator_logic.topology.icosa_grid import build_hexplanet, nearest_cell_by_xyz
+from generator_logic.climate.climate_atlas import CLIMATE_ATLAS_FILENAME, write_climate_atlas
+from generator_logic.topology.icosa_grid import HEXPLANET_CACHE_VERSION, HexCellLocator, load_or_build_hexplanet
 from generator_logic.terrain.global_sphere_noise import get_noise_for_sphere_view
 from editor.ui.layouts.world_settings_panel import PLANET_ROUGHNESS_PRESETS
 
@@ -80,73 +80,77 @@ def _normalize_vector(v):
     return v / np.maximum(norm, 1e-9)
 
 
-def _slerp(u, v, t):
-    u, v = _normalize_vector(u), _normalize_vector(v)
-    dot = float(np.clip(np.dot(u, v), -1.0, 1.0))
-    theta = math.acos(dot)
-    if theta < 1e-6: return u.copy()
-    sin_theta = math.sin(theta)
-    a = math.sin((1.0 - t) * theta) / sin_theta
-    b = math.sin(t * theta) / sin_theta
-    return _normalize_vector(a * u + b * v)
-
-
-def _subdivide_triangle(v1, v2, v3, level):
-    if level <= 0: return [(v1, v2, v3)]
-    m12, m23, m31 = _slerp(v1, v2, 0.5), _slerp(v2, v3, 0.5), _slerp(v3, v1, 0.5)
-    tris = []
-    tris.extend(_subdivide_triangle(v1, m12, m31, level - 1))
-    tris.extend(_subdivide_triangle(m12, v2, m23, level - 1))
-    tris.extend(_subdivide_triangle(m31, m23, v3, level - 1))
-    tris.extend(_subdivide_triangle(m12, m23, m31, level - 1))
-    return tris
+def _subdivide_sphere_mesh(V: np.ndarray, F: np.ndarray, level: int):
+    """
+    Разбиение треугольников на 4 по серединам ребер (level раз), точки
+    проецируются на сферу. Середина каждого ребра создается один раз:
+    ребра нумеруются через np.unique по паре вершин, без округления координат.
+    """
+    for _ in range(max(0, int(level))):
+        n_v = V.shape[0]
+        v1, v2, v3 = F[:, 0], F[:, 1], F[:, 2]
+        edges = np.stack([np.stack([v1, v2], 1), np.stack([v2, v3], 1), np.stack([v3, v1], 1)], axis=1)
+        edges = np.sort(edges.reshape(-1, 2), axis=1)
+        _, first, inverse = np.unique(edges[:, 0] * n_v + edges[:, 1], return_index=True, return_inverse=True)
+        mids = n_v + inverse.reshape(-1, 3)
+        # slerp(u, v, 0.5) для единичных векторов - нормированная сумма
+        V = np.vstack([V, _normalize_vector(V[edges[first, 0]] + V[edges[first, 1]])])
+        m12, m23, m31 = mids[:, 0], mids[:, 1], mids[:, 2]
+        F = np.stack([
+            np.stack([v1, m12, m31], 1), np.stack([m12, v2, m23], 1),
+            np.stack([m31, m23, v3], 1), np.stack([m12, m23, m31], 1),
+        ], axis=1).reshape(-1, 3)
+    return V, F
 
 
 def _generate_base_geometry(planet_data: dict, subdivision_level: int):
-    polys_lonlat = planet_data['cell_polys_lonlat_rad']
-    centers_xyz = planet_data['centers_xyz']
-
-    def lonlat_to_xyz(lon, lat):
-        x = math.cos(lat) * math.cos(lon)
-        y = math.cos(lat) * math.sin(lon)
-        z = math.sin(lat)
-        return np.array([x, y, z], dtype=np.float32)
-
-    all_triangles = []
-    for i, poly in enumerate(polys_lonlat):
-        if len(poly) < 3: continue
-        poly_verts_3d = _normalize_vector(np.array([lonlat_to_xyz(lon, lat) for lon, lat in poly]))
-        center_3d = _normalize_vector(centers_xyz[i].astype(np.float32))
-        for j in range(len(poly_verts_3d)):
-            v1, v2 = poly_verts_3d[j], poly_verts_3d[(j + 1) % len(poly_verts_3d)]
-            all_triangles.extend(_subdivide_triangle(center_3d, v1, v2, subdivision_level))
-
-    vertex_map, unique_vertices, final_triangles_indices = {}, [], []
-    for tri in all_triangles:
-        tri_idx = []
-        for v in tri:
-            key = tuple(np.round(v, 6))
-            if key not in vertex_map:
-                vertex_map[key] = len(unique_vertices)
-                unique_vertices.append(v)
-            tri_idx.append(vertex_map[key])
-        final_triangles_indices.append(tri_idx)
-
-    V_sphere_base = _normalize_vector(np.array(unique_vertices, dtype=np.float32))
-    F_fill = np.array(final_triangles_indices, dtype=np.uint32)
-    I_lines, line_vertex_map, line_unique_vertices = [], {}, []
-    for poly in polys_lonlat:
-        poly_indices = []
-        for lon, lat in poly:
-            key = (round(lon, 6), round(lat, 6))
-            if key not in line_vertex_map:
-                line_vertex_map[key] = len(line_unique_vertices)
-                line_unique_vertices.append(lonlat_to_xyz(lon, lat))
-            poly_indices.append(line_vertex_map[key])
-        for k in range(len(poly_indices)): I_lines.append([poly_indices[k], poly_indices[(k + 1) % len(poly_indices)]])
-
-    V_lines = _normalize_vector(np.array(line_unique_vertices, dtype=np.float32))
-    return V_sphere_base, F_fill, V_lines, np.array(I_lines, dtype=np.uint32)
+    centers_xyz = _normalize_vector(planet_data['centers_xyz'].astype(np.float64))
+    corners_xyz = _normalize_vector(planet_data['corners_xyz'].astype(np.float64))
+    indptr = planet_data['cell_polys_indptr']
+    ring = planet_data['cell_polys_corners'].astype(np.int64)
+
+    # Веер треугольников (центр ячейки, угол j, угол j+1) по всем ячейкам сразу
+    counts = np.diff(indptr)
+    cell_of = np.repeat(np.arange(len(counts), dtype=np.int64), counts)
+    next_pos = np.arange(ring.shape[0], dtype=np.int64) + 1
+    next_pos[indptr[1:][counts > 0] - 1] = indptr[:-1][counts > 0]
+    valid = counts[cell_of] >= 3
+    n_centers = centers_xyz.shape[0]
+    fan = np.stack([cell_of, n_centers + ring, n_centers + ring[next_pos]], axis=1)[valid]
+
+    V, F = _subdivide_sphere_mesh(np.vstack([centers_xyz, corners_xyz]), fan, subdivision_level)
+    V_sphere_base = V.astype(np.float32)
+    F_fill = F.astype(np.uint32)
+
+    # Контуры ячеек: общие углы соседних ячеек - одни и те же вершины
+    V_lines = corners_xyz.astype(np.float32)
+    I_lines = np.stack([ring, ring[next_pos]], axis=1).astype(np.uint32)
+    return V_sphere_base, F_fill, V_lines, I_lines
+
+
+def _load_or_build_base_geometry(planet_data: dict, grid_level: int, subdivision_level: int,
+                                 cache_dir: Path | None):
+    """_generate_base_geometry с кэшем на диске по паре уровней разбиения."""
+    if cache_dir is None:
+        return _generate_base_geometry(planet_data, subdivision_level)
+    path = cache_dir / f"base_geometry_v{HEXPLANET_CACHE_VERSION}_f{int(grid_level)}_l{int(subdivision_level)}.npz"
+    if path.exists():
+        try:
+            with np.load(path, allow_pickle=False) as d:
+                return d["V_base"], d["F_fill"], d["V_lines"], d["I_lines"]
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Не удалось прочитать кэш геометрии {path}: {e}. Геометрия будет построена заново.")
+
+    V_base, F_fill, V_lines, I_lines = _generate_base_geometry(planet_data, subdivision_level)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.stem}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, "wb") as f:
+            np.savez(f, V_base=V_base, F_fill=F_fill, V_lines=V_lines, I_lines=I_lines)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Не удалось сохранить кэш геометрии {path}: {e}")
+    return V_base, F_fill, V_lines, I_lines
 
 
 def orchestrate_planet_update(main_window) -> dict | None:
@@ -156,9 +160,14 @@ def orchestrate_planet_update(main_window) -> dict | None:
 
         # Генерируем ДВЕ сетки:
         # 1. Логическая сетка (грубая) - для гексагональной сетки и ID регионов
-        planet_data = build_hexplanet(f=params.subdivision_level_grid)
+        # Обе сетки зависят только от уровней разбиения и кэшируются в проекте
+        geometry_cache_dir = None
+        if main_window.project_manager.current_project_path:
+            geometry_cache_dir = Path(main_window.project_manager.current_project_path) / "cache" / "hexplanet"
+        planet_data = load_or_build_hexplanet(params.subdivision_level_grid, geometry_cache_dir)
         # 2. Визуальная/симуляционная сетка (детальная) - для рендеринга и точного климата
-        V_base, F_fill, V_lines, I_lines = _generate_base_geometry(planet_data, params.subdivision_level_geom)
+        V_base, F_fill, V_lines, I_lines = _load_or_build_base_geometry(
+            planet_data, params.subdivision_level_grid, params.subdivision_level_geom, geometry_cache_dir)
         logger.info(f"-> Геометрия сгенерирована: {len(V_base)} вершин для симуляции/рендера.")
 
         # Генерация рельефа на детальной сетке
@@ -167,9 +176,7 @@ def orchestrate_planet_update(main_window) -> dict | None:
 
         if params.is_climate_enabled:
             logger.info("-> Расчет детального климата на сетке рендеринга...")
-            biomes_path = Path("game_engine_restructured/data/biomes.json")
-            with open(biomes_path, "r", encoding="utf-8") as f:
-                biomes_definition = json.load(f)
+            classifier = biome_matcher.load_biome_classifier(Path("game_engine_restructured/data/biomes.json"))
 
             # --- Шаг 1: Расчет климата на каждой вершине детальной сетки ---
             is_land_mask = heights_01 >= params.sea_level_01
@@ -189,47 +196,34 @@ def orchestrate_planet_update(main_window) -> dict | None:
             humidity_map[~is_land_mask] = 1.0
 
             # --- Шаг 2: Определение биомов и цветов для каждой вершины ---
-            dominant_biomes_for_render = []
-            for i in range(len(V_base)):
-                if not is_land_mask[i]:
-                    dominant_biomes_for_render.append("water")
-                    continue
-                temp, hum = temperature_map[i], humidity_map[i]
-                probs = biome_matcher.calculate_biome_probabilities(temp, hum, biomes_definition)
-                dominant_biomes_for_render.append(max(probs, key=probs.get) if probs else "default")
+            # Одна классификация над всеми вершинами вместо цикла по вершинам
+            _, dominant_idx = classifier.classify(temperature_map, humidity_map)
+            dominant_biomes_for_render = np.where(
+                is_land_mask, classifier.dominant_ids(dominant_idx), "water").tolist()
 
             colors = map_planet_bimodal_palette(heights_01, params.sea_level_01, dominant_biomes_for_render)
 
             # --- Шаг 3: Агрегация детальных данных в кэш для грубой логической сетки ---
             logger.info("-> Агрегация детальных данных о климате в кэш регионов...")
-            vertex_to_cell_map = np.array([nearest_cell_by_xyz(v, planet_data['centers_xyz']) for v in V_base],
-                                          dtype=np.int32)
+            vertex_to_cell_map = HexCellLocator(planet_data['centers_xyz']).query(V_base)
 
-            global_climate_cache = {"version": 2, "world_seed": params.sphere_params['seed'], "region_data": {}}
             num_regions = len(planet_data['centers_xyz'])
-            for i in range(num_regions):
-                region_vertex_indices = np.where(vertex_to_cell_map == i)[0]
-                if region_vertex_indices.size == 0: continue
-
-                avg_temp = np.mean(temperature_map[region_vertex_indices])
-                avg_hum = np.mean(humidity_map[region_vertex_indices])
-                probs = biome_matcher.calculate_biome_probabilities(avg_temp, avg_hum, biomes_definition)
-                sanitized_probs = {k: float(v) for k, v in probs.items()}
-
-                global_climate_cache["region_data"][str(i)] = {
-                    "average_temperature_c": float(avg_temp),
-                    "average_humidity": float(avg_hum),
-                    "dominant_biome": max(sanitized_probs, key=sanitized_probs.get) if sanitized_probs else "default",
-                    "biome_probabilities": sanitized_probs
-                }
+            # Средние по регионам через bincount, затем одна классификация на все регионы
+            counts = np.bincount(vertex_to_cell_map, minlength=num_regions)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                avg_temps = np.bincount(vertex_to_cell_map, weights=temperature_map, minlength=num_regions) / counts
+                avg_hums = np.bincount(vertex_to_cell_map, weights=humidity_map, minlength=num_regions) / counts
+            region_probs, region_dominant = classifier.classify(avg_temps, avg_hums)
+            # -1 - у региона нет вершин; индекс за концом таблицы биомов - "default"
+            region_dominant = np.where(region_dominant < 0, len(classifier), region_dominant)
+            region_dominant = np.where(counts > 0, region_dominant, -1)
 
             if main_window.project_manager.current_project_path:
                 cache_dir = Path(main_window.project_manager.current_project_path) / "cache"
-                cache_dir.mkdir(exist_ok=True)
-                cache_file = cache_dir / "global_climate_data.json"
-                with open(cache_file, 'w', encoding='utf-8') as f:
-                    json.dump(global_climate_cache, f, indent=2)
-                logger.info(f"Глобальный кэш климата сохранен: {cache_file}")
+                cache_file = write_climate_atlas(
+                    cache_dir / CLIMATE_ATLAS_FILENAME, params.sphere_params['seed'], classifier.biome_ids,
+                    avg_temps, avg_hums, region_probs, region_dominant)
+                logger.info(f"Глобальный атлас климата сохранен: {cache_file}")
         else:
             logger.info("-> Режим климата выключен. Раскраска по высоте.")
             colors = map_height_to_grayscale(heights_01)
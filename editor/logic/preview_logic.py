@@ -13,6 +13,12 @@ from editor.graph.graph_runner import run_graph
 from editor.nodes.height.io.world_input_node import WorldInputNode
 from editor.nodes.base_node import GeneratorNode # Исправлен импорт
 from generator_logic.terrain.global_sphere_noise import get_noise_for_region_preview
+from generator_logic.climate.climate_atlas import (
+    CLIMATE_ATLAS_FILENAME, LEGACY_CLIMATE_JSON_FILENAME, ClimateAtlas,
+)
+from game_engine_restructured.world.sphere_coords import (
+    DEFAULT_PLANET_RADIUS_M, local_north_vector, planar_grid_meters, sphere_coords,
+)
 from typing import TYPE_CHECKING, Set, Tuple, Optional, Dict, Any, List
 
 if TYPE_CHECKING:
@@ -56,10 +62,8 @@ def _prepare_context(main_window: MainWindow, for_export: bool) -> Tuple[Dict[st
     vertex_distance = main_window.vertex_distance_input.value()
     world_side_m = calc_resolution * vertex_distance
     context['WORLD_SIZE_METERS'] = world_side_m
-    x_meters = np.linspace(-world_side_m / 2.0, world_side_m / 2.0, calc_resolution, dtype=np.float32)
-    z_meters = np.linspace(-world_side_m / 2.0, world_side_m / 2.0, calc_resolution, dtype=np.float32)
     # --- Важно: Центр координат в (0,0) для shape_masks ---
-    context['x_coords'], context['z_coords'] = np.meshgrid(x_meters, z_meters)
+    context['x_coords'], context['z_coords'] = planar_grid_meters(calc_resolution, vertex_distance)
     context['_original_resolution'] = region_resolution
     context['_original_vertex_distance'] = vertex_distance
     return context, calc_resolution
@@ -81,38 +85,11 @@ def _generate_world_input(main_window: "MainWindow", context: Dict[str, Any], sp
         if radius_m < 1.0: raise ValueError("Radius is too small")
     except Exception:
         logger.warning("Could not parse radius from UI, falling back to default.")
-        radius_m = 6371000.0
+        radius_m = DEFAULT_PLANET_RADIUS_M
 
     x_m, z_m = context['x_coords'], context['z_coords']
-    center_vec = np.array(main_window.current_world_offset, dtype=np.float32)
-    if np.linalg.norm(center_vec) < EPS: center_vec = np.array([1.0, 0.0, 0.0]) # Fallback
-    center_vec /= np.linalg.norm(center_vec) # Нормализуем на всякий случай
-
-    # Определяем "вверх" для расчета базиса (Z-up)
-    global_north_vec = np.array([0.0, 0.0, 1.0], dtype=np.float32)
-
-    # Вычисляем локальные оси U и V (X и Z на плоскости превью)
-    if np.abs(np.dot(center_vec, global_north_vec)) > 0.99:
-         # Если мы на полюсе, выбираем другое направление для "вверх"
-         alternative_up = np.array([0.0, 1.0, 0.0], dtype=np.float32)
-         tangent_u = np.cross(alternative_up, center_vec)
-    else:
-         tangent_u = np.cross(global_north_vec, center_vec) # U = North x Center
-
-    if np.linalg.norm(tangent_u) < EPS:
-         alternative_up = np.array([0.0, 1.0, 0.0], dtype=np.float32)
-         tangent_u = np.cross(alternative_up, center_vec)
-
-    tangent_u /= np.linalg.norm(tangent_u)
-    tangent_v = np.cross(center_vec, tangent_u) # V = Center x U
-    tangent_v /= np.linalg.norm(tangent_v)
-
-    # Генерация координат для шума
-    points_in_plane = (center_vec[np.newaxis, np.newaxis, :]
-                       + tangent_u[np.newaxis, np.newaxis, :] * (x_m / radius_m)[..., np.newaxis]
-                       + tangent_v[np.newaxis, np.newaxis, :] * (z_m / radius_m)[..., np.newaxis])
-    coords_for_noise = points_in_plane / np.linalg.norm(points_in_plane, axis=-1, keepdims=True)
-    coords_for_noise = coords_for_noise.astype(np.float32)
+    center = main_window.current_world_offset
+    coords_for_noise = sphere_coords(x_m, z_m, center, radius_m)
 
     # Если нужен только массив координат
     if return_coords_only:
@@ -141,20 +118,11 @@ def _generate_world_input(main_window: "MainWindow", context: Dict[str, Any], sp
 
     # === ЧАСТЬ 3: ВЫЧИСЛЕНИЕ ЛОКАЛЬНОГО ВЕКТОРА СЕВЕРА ===
     logger.info("Calculating local North vector...")
-    north_tangent = global_north_vec - np.dot(global_north_vec, center_vec) * center_vec
-    north_norm = np.linalg.norm(north_tangent)
-    north_vector_2d = None # Инициализируем как None
-    if north_norm > EPS:
-        north_tangent /= north_norm
-        # Проецируем нормализованный вектор севера на локальные оси U и V
-        north_u = np.dot(north_tangent, tangent_u)
-        north_v = np.dot(north_tangent, tangent_v)
-        # --- ИЗМЕНЕНИЕ: Возвращаем список [float, float] ---
-        north_vector_2d = [float(north_u), float(north_v)]
-        # ------------------------------------
-        logger.info(f"Local North vector calculated: [{north_u:.3f}, {north_v:.3f}] (U corresponds to screen X, V to screen Z/UP)")
+    north_vector_2d = local_north_vector(center)
+    if north_vector_2d is not None:
+        logger.info(f"Local North vector calculated: [{north_vector_2d[0]:.3f}, {north_vector_2d[1]:.3f}] (U corresponds to screen X, V to screen Z/UP)")
     else:
-        # Это происходит, если центр региона (center_vec) совпадает с полюсом (global_north_vec)
+        # Это происходит, если центр региона совпадает с полюсом
         logger.warning("Cannot determine North vector at the pole.")
 
     # Возвращаем height, mask и north_vector_2d (который может быть None)
@@ -242,16 +210,23 @@ def generate_node_graph_output(main_window: MainWindow, for_export: bool = False
     biome_probabilities = {}
     if main_window.project_manager and main_window.project_manager.current_project_path and main_window.climate_enabled.isChecked():
         try:
-            cache_path = Path(main_window.project_manager.current_project_path) / "cache" / "global_climate_data.json"
-            if cache_path.exists():
-                with open(cache_path, "r", encoding="utf-8") as f:
-                    climate_data = json.load(f)
-                region_id_str = str(main_window.current_region_id)
-                region_climate = climate_data.get("region_data", {}).get(region_id_str)
+            cache_dir = Path(main_window.project_manager.current_project_path) / "cache"
+            atlas_path = cache_dir / CLIMATE_ATLAS_FILENAME
+            legacy_path = cache_dir / LEGACY_CLIMATE_JSON_FILENAME
+            region_id = int(main_window.current_region_id)
+            if atlas_path.exists() or legacy_path.exists():
+                if atlas_path.exists():
+                    # Запись региона читается по смещению, без разбора всего кэша
+                    with ClimateAtlas(atlas_path) as atlas:
+                        region_climate = atlas.region(region_id)
+                else:
+                    with open(legacy_path, "r", encoding="utf-8") as f:
+                        climate_data = json.load(f)
+                    region_climate = climate_data.get("region_data", {}).get(str(region_id))
                 if region_climate:
                     biome_probabilities = region_climate.get("biome_probabilities", {})
                 else:
-                    logger.warning(f"Climate cache found, but no data for region ID {region_id_str}.")
+                    logger.warning(f"Climate cache found, but no data for region ID {region_id}.")
                     biome_probabilities = {"error": "cache_miss"}
             else:
                 logger.warning("Climate cache file not found.")
@@ -0,0 +1,73 @@
+# editor/nodes/height/erosion/native_erosion_node.py
+from __future__ import annotations
+import numpy as np
+from editor.nodes.base_node import GeneratorNode
+from generator_logic.terrain.native_erosion import native_erosion_wrapper
+
+
+class NativeErosionNode(GeneratorNode):
+    """
+    Нода «Erosion (Native)» — встроенная эрозия на Numba: врезание русел
+    (stream-power) + осыпание склонов. Не требует Landlab.
+    """
+    __identifier__ = "Ландшафт.Эрозия"
+    NODE_NAME = "Erosion (Native)"
+
+    def __init__(self):
+        super().__init__()
+        self.add_input("In", display_name=False)
+        self.add_output("Out")
+
+        # Флювиальная эрозия
+        self.add_float_input("num_steps", "Steps", value=10, tab="Params", group="Erosion",
+                             p_range=(1, 200), p_widget='spinbox')
+        self.add_float_input("dt", "Δt (год)", value=1.0, tab="Params", group="Erosion",
+                             p_range=(0.01, 100.0), p_widget='slider')
+        self.add_float_input("K_sp", "K (эродимость)", value=5e-6, tab="Params", group="Erosion",
+                             p_range=(1e-7, 1e-3), p_widget='slider')
+        self.add_float_input("m_sp", "m (stream-power)", value=0.5, tab="Params", group="Erosion",
+                             p_range=(0.0, 1.0), p_widget='slider')
+        self.add_float_input("n_sp", "n (stream-power)", value=1.0, tab="Params", group="Erosion",
+                             p_range=(0.5, 2.0), p_widget='slider')
+
+        # Термальная эрозия (осыпание)
+        self.add_float_input("talus_angle_deg", "Talus Angle (°)", value=35.0, tab="Params", group="Thermal",
+                             p_range=(5.0, 60.0), p_widget='slider')
+        self.add_float_input("thermal_rate", "Thermal Rate", value=0.5, tab="Params", group="Thermal",
+                             p_range=(0.0, 1.0), p_widget='slider')
+        self.add_float_input("thermal_iterations", "Thermal Iterations", value=1, tab="Params", group="Thermal",
+                             p_range=(1, 20), p_widget='spinbox')
+
+        # Разбиение на тайлы для параллельного счета
+        self.add_float_input("tile_size", "Tile Size (px)", value=256, tab="Params", group="Performance",
+                             p_range=(64, 2048), p_widget='spinbox')
+        self.add_float_input("halo", "Halo (px)", value=32, tab="Params", group="Performance",
+                             p_range=(0, 256), p_widget='spinbox')
+
+        self.set_color(90, 40, 40)
+
+    def _compute(self, context):
+        inputs = self.inputs()
+        if "In" not in inputs or not inputs["In"].connected_ports():
+            return None
+        in_port = inputs["In"].connected_ports()[0]
+        height_map = in_port.node().compute(context)
+        if height_map is None:
+            return None
+
+        params = {
+            "num_steps": int(float(self.get_property("num_steps"))),
+            "dt": float(self.get_property("dt")),
+            "K_sp": float(self.get_property("K_sp")),
+            "m_sp": float(self.get_property("m_sp")),
+            "n_sp": float(self.get_property("n_sp")),
+            "talus_angle_deg": float(self.get_property("talus_angle_deg")),
+            "thermal_rate": float(self.get_property("thermal_rate")),
+            "thermal_iterations": int(float(self.get_property("thermal_iterations"))),
+            "tile_size": int(float(self.get_property("tile_size"))),
+            "halo": int(float(self.get_property("halo"))),
+        }
+
+        result = native_erosion_wrapper(context, height_map, params).astype(np.float32)
+        self._result_cache = result
+        return result
@@ -22,6 +22,7 @@ def register_all_nodes(graph):
         # Ландшафт.Эрозия
         ("editor.nodes.height.erosion.landlab_erosion_node", "LandlabErosionNode"),
         ("editor.nodes.height.erosion.easy_erosion_node", "EasyErosionNode"),
+        ("editor.nodes.height.erosion.native_erosion_node", "NativeErosionNode"),
 
         # Универсальные.Шумы
         ("editor.nodes.universal.noises.perlin_noise_node", "PerlinNoiseNode"),
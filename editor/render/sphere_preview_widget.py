@@ -9,7 +9,7 @@ from OpenGL import GL
 from OpenGL.GL import *
 
 from editor.core.render_settings import RenderSettings
-from generator_logic.topology.icosa_grid import nearest_cell_by_xyz
+from generator_logic.topology.icosa_grid import HexCellLocator
 
 from editor.render.core_gl import shader_library, shader_manager, lighting
 # --- ДОБАВЛЕН ИМПОРТ КАМЕРЫ ---
@@ -33,6 +33,7 @@ class SpherePreviewWidget(QOpenGLWidget):
         self._fill_indices = np.array([], dtype=np.uint32)
         self._line_indices = np.array([], dtype=np.uint32)
         self._planet_data = None
+        self._cell_locator: HexCellLocator | None = None
         self._render_settings = RenderSettings()
 
         # --- ИЗМЕНЕНИЕ: Управлением камерой занимается отдельный класс ---
@@ -49,6 +50,7 @@ class SpherePreviewWidget(QOpenGLWidget):
 
     def set_planet_data(self, data: dict):
         self._planet_data = data
+        self._cell_locator = HexCellLocator(data['centers_xyz']) if data and 'centers_xyz' in data else None
 
     def set_geometry(self, vertices: np.ndarray, fill_indices: np.ndarray, line_indices: np.ndarray,
                      colors: np.ndarray):
@@ -228,7 +230,7 @@ class SpherePreviewWidget(QOpenGLWidget):
         intersection_np = np.array([intersection_point_3d.x(), intersection_point_3d.y(), intersection_point_3d.z()],
                                    dtype=np.float32)
         intersection_np /= np.linalg.norm(intersection_np)
-        closest_idx = nearest_cell_by_xyz(intersection_np, self._planet_data['centers_xyz'])
+        closest_idx = self._cell_locator.query_one(intersection_np)
         self.cell_picked.emit(int(closest_idx))
 
     def mouseMoveEvent(self, event: QtGui.QMouseEvent):
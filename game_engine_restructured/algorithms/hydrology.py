@@ -15,10 +15,10 @@ from ..core import constants as const
 # Используем удобные функции-обертки для работы с ID
 from ..core.constants import KIND_BASE_WATERBED, NAV_WATER, surface_set, nav_set
 from ..numerics.fast_hydrology import (
-    build_d8_flow_directions, flow_accumulation_from_dirs,
-    label_connected_components
+    build_d8_flow_directions, flow_accumulation,
+    label_components, priority_flood_fill, river_band_distance,
+    select_river_threshold
 )
-from scipy.ndimage import distance_transform_edt, label, binary_dilation
 
 if TYPE_CHECKING:
     from ..core.preset import Preset
@@ -73,54 +73,57 @@ def generate_highland_lakes(
 
     # Ищем впадины только на суше (выше уровня моря)
     land_mask = stitched_heights >= sea_level
-    labeled_basins, num_basins = label(land_mask == False) # Ищем "дырки" в суше
+    # Ищем "дырки" в суше (4-связность, как у scipy.ndimage.label по умолчанию)
+    labeled_basins, num_basins, basins = label_components(~land_mask, connectivity=4)
 
     if num_basins == 0:
         return
 
-    # --- ИСПРАВЛЕНА ЛОГИКА: Корректная фильтрация мелких впадин ---
+    # Отбираем только достаточно большие "бассейны", не касающиеся края карты
+    h, w = labeled_basins.shape
     min_lake_size = int(water_cfg.get("min_lake_size_px", 20))
-    unique_labels, basin_sizes = np.unique(labeled_basins, return_counts=True)
-    # Отбираем ID только тех "бассейнов", которые достаточно большие
-    valid_labels = unique_labels[(basin_sizes >= min_lake_size) | (unique_labels == 0)] # 0 - это фон, его оставляем
-    # Создаем маску для удаления всех "мелких" меток
-    is_valid_basin = np.isin(labeled_basins, valid_labels)
-    labeled_basins[~is_valid_basin] = 0 # Обнуляем метки, не прошедшие фильтр
-    # --- КОНЕЦ ИСПРАВЛЕНИЯ ---
-
-    # Исключаем озера, которые касаются края карты
-    edge_labels = np.unique(np.concatenate((
-        labeled_basins[0, :], labeled_basins[-1, :],
-        labeled_basins[:, 0], labeled_basins[:, -1]
-    )))
-
-    lakes_created = 0
-    # Итерируем только по ID оставшихся (крупных) озер
-    for i in np.unique(labeled_basins):
-        if i == 0 or i in edge_labels:
-            continue
-
-        basin_mask = (labeled_basins == i)
-        # Находим точку "перелива" - самую низкую точку на границе впадины
-        border_mask = binary_dilation(basin_mask) & ~basin_mask
-        if not np.any(border_mask): continue
-
-        pour_point_height = np.min(stitched_heights[border_mask])
-        lake_mask = basin_mask & (stitched_heights < pour_point_height)
-        if not np.any(lake_mask): continue
-
-        # Вероятность появления озера зависит от влажности
-        if stitched_humidity is not None:
-            avg_humidity = float(np.mean(stitched_humidity[lake_mask]))
-            base_chance = water_cfg.get("lake_chance_base", 0.1)
-            multiplier = water_cfg.get("lake_chance_humidity_multiplier", 3.0)
+    bboxes = basins.bboxes
+    touches_edge = (bboxes[:, 0] == 0) | (bboxes[:, 1] == 0) | (bboxes[:, 2] == h) | (bboxes[:, 3] == w)
+    valid = (basins.sizes >= min_lake_size) & ~touches_edge
+    valid[0] = False
+
+    # Точка "перелива" - самая низкая клетка на границе впадины. Считаем ее
+    # сразу для всех впадин по парам соседних клеток с разными метками.
+    rim_height = np.full(num_basins + 1, np.inf, dtype=np.float64)
+    for axis in (0, 1):
+        a = labeled_basins.take(np.arange(0, labeled_basins.shape[axis] - 1), axis=axis)
+        b = labeled_basins.take(np.arange(1, labeled_basins.shape[axis]), axis=axis)
+        ha = stitched_heights.take(np.arange(0, stitched_heights.shape[axis] - 1), axis=axis)
+        hb = stitched_heights.take(np.arange(1, stitched_heights.shape[axis]), axis=axis)
+        edge = a != b
+        # Граница впадины a - клетка b, и наоборот
+        np.minimum.at(rim_height, a[edge & (a > 0)], hb[edge & (a > 0)])
+        np.minimum.at(rim_height, b[edge & (b > 0)], ha[edge & (b > 0)])
+    valid &= np.isfinite(rim_height)
+
+    lake_cells = valid[labeled_basins] & (stitched_heights < rim_height[labeled_basins])
+    lake_labels = labeled_basins[lake_cells]
+    lake_sizes = np.bincount(lake_labels, minlength=num_basins + 1)
+    candidates = np.nonzero(valid & (lake_sizes > 0))[0]
+
+    # Вероятность появления озера зависит от влажности. Порядок вызовов rng -
+    # по возрастанию меток, как и раньше, поэтому набор озер для сида не меняется.
+    accepted = np.zeros(num_basins + 1, dtype=bool)
+    if stitched_humidity is not None:
+        humidity_sums = np.bincount(lake_labels, weights=stitched_humidity[lake_cells], minlength=num_basins + 1)
+        base_chance = water_cfg.get("lake_chance_base", 0.1)
+        multiplier = water_cfg.get("lake_chance_humidity_multiplier", 3.0)
+        for i in candidates:
+            avg_humidity = float(humidity_sums[i] / lake_sizes[i])
             final_chance = base_chance + base_chance * avg_humidity * multiplier
-            if rng.random() > final_chance:
-                continue
+            accepted[i] = rng.random() <= final_chance
+    else:
+        accepted[candidates] = True
 
-        surface_set(stitched_surface, lake_mask, KIND_BASE_WATERBED)
-        nav_set(stitched_nav, lake_mask, NAV_WATER)
-        lakes_created += 1
+    lake_mask = lake_cells & accepted[labeled_basins]
+    surface_set(stitched_surface, lake_mask, KIND_BASE_WATERBED)
+    nav_set(stitched_nav, lake_mask, NAV_WATER)
+    lakes_created = int(np.count_nonzero(accepted))
 
     if lakes_created > 0:
         print(f"    -> Создано {lakes_created} высокогорных озер.")
@@ -134,61 +137,87 @@ def generate_rivers(
         stitched_surface_ext: np.ndarray,
         stitched_nav_ext: np.ndarray,
         preset: "Preset",
-        chunk_size: int
+        chunk_size: int,
+        inflow: np.ndarray | None = None
 ) -> np.ndarray:
     """
     Моделирует сток воды по ландшафту и в самых полноводных местах
-    прорезает русла рек.
+    прорезает русла рек. inflow - приток из-за границы холста (например,
+    из грубого графа стока мира), добавляется к собственному стоку клеток.
+
+    Порог рек - самый высокий, при котором ядро региона задевают
+    target_sources_core рек длиной не меньше min_length_px (по всему
+    расширенному холсту). Раньше порог искался двоичным поиском
+    (binary_search_iters) по числу любых сегментов в ядре, и короткие
+    сегменты потом отсеивались, так что рек могло остаться меньше.
     """
     river_cfg = getattr(preset, "water", {}).get("river", {})
     if not river_cfg.get("enabled", False):
         return np.zeros_like(stitched_heights_ext, dtype=bool)
 
     print("  -> [Hydrology] Генерация речной сети...")
+    if "binary_search_iters" in river_cfg:
+        print("!!! [Hydrology] water.river.binary_search_iters устарел и игнорируется: "
+              "порог рек подбирается точно, без двоичного поиска.")
     t0 = time.perf_counter()
 
     # Рассчитываем, куда потечет вода из каждой точки
-    flow_dirs = build_d8_flow_directions(stitched_heights_ext)
+    if river_cfg.get("fill_depressions", True):
+        # Впадины заполняются, сток из них идет через точку перелива,
+        # поэтому реки не обрываются в мелких ямах. Сам рельеф не меняется.
+        _, flow_dirs = priority_flood_fill(
+            stitched_heights_ext, float(river_cfg.get("fill_epsilon", 0.0))
+        )
+    else:
+        flow_dirs = build_d8_flow_directions(stitched_heights_ext)
     # Рассчитываем, сколько "единиц" воды протекает через каждую точку
-    flow_map = flow_accumulation_from_dirs(stitched_heights_ext, flow_dirs)
+    flow_map = flow_accumulation(flow_dirs, weights=None if inflow is None else 1.0 + inflow)
 
     target_sources = int(river_cfg.get("target_sources_core", 3))
-
-    # Подбираем такой порог "полноводности", чтобы получить нужное число рек
-    low_thr, high_thr = 1.0, float(np.max(flow_map))
-    best_mask = np.zeros_like(flow_map, dtype=bool)
-    iters = int(river_cfg.get("binary_search_iters", 12))
-    for _ in range(iters):
-        mid_thr = (low_thr + high_thr) / 2.0
-        if mid_thr <= low_thr or high_thr - low_thr < 1.0: break
-        candidate_mask = flow_map > mid_thr
-        core_mask = candidate_mask[chunk_size:-chunk_size, chunk_size:-chunk_size]
-        num_sources = 0 if not np.any(core_mask) else label_connected_components(core_mask)[1]
-        if num_sources < target_sources:
-            high_thr = mid_thr
-        else:
-            low_thr, best_mask = mid_thr, candidate_mask
-
-    # Отфильтровываем слишком короткие ручейки
-    labels, n = label_connected_components(best_mask)
     min_len = int(river_cfg.get("min_length_px", 128))
-    for i in range(1, n + 1):
-        segment_mask = (labels == i)
-        if int(np.sum(segment_mask)) < min_len:
-            best_mask[segment_mask] = False
+
+    # Подбираем порог "полноводности" одним проходом: самый высокий порог,
+    # при котором ядро региона задевают target_sources рек длиной не меньше
+    # min_len. Длина реки меряется по всему расширенному холсту - так же,
+    # как в отсеве ниже, поэтому отобранные реки отсев переживают.
+    core_mask = np.zeros(flow_map.shape, dtype=bool)
+    core_mask[chunk_size:-chunk_size, chunk_size:-chunk_size] = True
+    low_thr, _, _ = select_river_threshold(flow_map, core_mask, min_len, target_sources)
+    best_mask = flow_map >= low_thr
+
+    # Отфильтровываем слишком короткие ручейки (на всем расширенном холсте)
+    labels, n, segments = label_components(best_mask, connectivity=8)
+    if n > 0:
+        keep = segments.sizes >= min_len
+        keep[0] = False
+        best_mask = keep[labels]
 
     # Прорезаем русло в земле и наносим текстуру воды
     if np.any(best_mask):
-        river_dist = distance_transform_edt(~best_mask)
         W0, beta, Wmax = float(river_cfg.get("base_width_px", 1.5)), float(river_cfg.get("width_exponent", 0.6)), float(
             river_cfg.get("max_width_px", 10.0))
         normF = np.log(np.maximum(1.0, flow_map / (max(low_thr, 1.0) + 1e-6)))
         width = np.clip(W0 * normF ** beta, 0, Wmax)
         depth = np.clip(width * 0.4, 0.5, 5.0)
-        carve_mask = (river_dist <= np.ceil(width)) & best_mask
-        height_delta = depth * np.maximum(0.0, 1.0 - river_dist / (width + 1e-6))
 
-        stitched_heights_ext[carve_mask] -= height_delta[carve_mask]
+        if river_cfg.get("carve_banks", False):
+            # Берега: профиль глубины спадает с расстоянием до русла. Расстояние
+            # считается только в полосе max_width_px вокруг рек.
+            river_dist, source = river_band_distance(best_mask, int(np.ceil(Wmax)))
+            in_band = source >= 0
+            src = source[in_band]
+            src_width = width.ravel()[src]
+            src_depth = depth.ravel()[src]
+            band_dist = river_dist[in_band]
+            carve = band_dist <= np.ceil(src_width)
+            height_delta = src_depth * np.maximum(0.0, 1.0 - band_dist / (src_width + 1e-6))
+            band_heights = stitched_heights_ext[in_band]
+            band_heights[carve] -= height_delta[carve]
+            stitched_heights_ext[in_band] = band_heights
+        else:
+            # Только сами клетки русла (расстояние до реки 0 - полная глубина)
+            stitched_heights_ext[best_mask] -= depth[best_mask]
+
         surface_set(stitched_surface_ext, best_mask, const.KIND_BASE_WATERBED)
         nav_set(stitched_nav_ext, best_mask, const.NAV_WATER)
 
@@ -8,9 +8,17 @@ import numpy as np
 from PIL import Image
 
 from game_engine_restructured.algorithms.terrain.uber_blend import smoothstep
+from game_engine_restructured.core.utils.cache import BoundedCache, cache_limit_bytes
 
-# Кэш для хранения загруженных текстур, чтобы не читать их с диска каждый раз
-STAMP_CACHE: Dict[str, np.ndarray] = {}
+# Кэш для хранения загруженных текстур, чтобы не читать их с диска каждый раз.
+# Ограничен по памяти: при вытеснении текстура просто перечитается с диска.
+# Лимит по умолчанию; пресет задает свой через configure_stamp_cache.
+STAMP_CACHE = BoundedCache("stamps", max_bytes=cache_limit_bytes(None, "stamps"))
+
+
+def configure_stamp_cache(export_cfg: Dict[str, Any] | None) -> None:
+    """Применяет export.cache_limits_mb.stamps к общему кэшу штампов процесса."""
+    STAMP_CACHE.set_limits(max_bytes=cache_limit_bytes(export_cfg, "stamps"))
 
 
 def _load_stamp_texture(path: str) -> np.ndarray | None:
@@ -19,8 +27,9 @@ def _load_stamp_texture(path: str) -> np.ndarray | None:
         print(f"!!! [Stamping] CRITICAL ERROR: Файл штампа не найден по пути: {path}")
         return None
 
-    if path in STAMP_CACHE:
-        return STAMP_CACHE[path]
+    cached = STAMP_CACHE.get(path)
+    if cached is not None:
+        return cached
     try:
         with Image.open(path) as img:
             # Убедимся, что изображение в оттенках серого для корректной работы
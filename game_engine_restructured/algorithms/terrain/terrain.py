@@ -6,6 +6,7 @@ import numpy as np
 # --- НАШИ НОВЫЕ ИНСТРУМЕНТЫ ---
 # Импортируем модули с нашими нодами
 from .steps import noise, blending, effects
+from .tile_store import ApronTileStore, pipeline_fingerprint
 
 # --- РЕЕСТР НОД ---
 # Этот словарь связывает строковое имя "type" из JSON-конфига
@@ -27,34 +28,25 @@ def _print_range(tag: str, arr: np.ndarray) -> None:
     print(f"  -> [DIAGNOSTIC] Диапазон '{tag}': min={mn:<8.2f} max={mx:<8.2f} delta={mx - mn:.2f}")
 
 
-def generate_elevation_region(
-        seed: int, scx: int, scz: int, region_size_chunks: int, chunk_size: int, preset: Any, scratch_buffers: dict,
-) -> np.ndarray:
-    """
-    Главная функция-оркестратор. Генерирует карту высот, выполняя шаги из конвейера.
-    """
-    # --- ШАГ 1: Подготовка координат (без изменений) ---
-    cfg = getattr(preset, "elevation", {})
-    cell_size = float(getattr(preset, "cell_size", 1.0))
-    ext_size = (region_size_chunks + 2) * chunk_size
-    base_cx = scx * region_size_chunks - 1
-    base_cz = scz * region_size_chunks - 1
-    gx0_px = base_cx * chunk_size
-    gz0_px = base_cz * chunk_size
+# Ноды, результат которых в пикселе зависит только от координат этого пикселя.
+# Если весь конвейер состоит из таких нод, рельеф можно считать тайлами
+# и переиспользовать "фартук" между соседними регионами. Штампы, маски,
+# террасы и сглаживание смотрят на соседей или на весь холст, поэтому с
+# ними регион считается целиком (как раньше).
+TILE_LOCAL_NODES = frozenset({"noise"})
 
-    px_coords_x = np.arange(ext_size, dtype=np.float32) + gx0_px
-    px_coords_z = np.arange(ext_size, dtype=np.float32) + gz0_px
-    x_coords, z_coords = np.meshgrid(px_coords_x, px_coords_z)
 
-    # --- ШАГ 2: Инициализация конвейера ---
-    # Получаем список операций из JSON-конфига
-    pipeline_steps = cfg.get("pipeline", [])
-    if not pipeline_steps:
-        print("!!! [Terrain] CRITICAL ERROR: Конвейер 'pipeline' не найден или пуст в конфиге. Генерация остановлена.")
-        return np.zeros_like(x_coords)
+def is_tile_local_pipeline(cfg: dict) -> bool:
+    """Проверяет, что все включенные шаги конвейера поточечные."""
+    steps = [s for s in cfg.get("pipeline", []) if s.get("enabled", True)]
+    return bool(steps) and all(s.get("type") in TILE_LOCAL_NODES for s in steps)
 
-    print("-> [Terrain] Запуск динамического конвейера...")
 
+def run_elevation_pipeline(
+        pipeline_steps: list, x_coords: np.ndarray, z_coords: np.ndarray, cell_size: float, seed: int,
+        verbose: bool = True,
+) -> np.ndarray:
+    """Прогоняет конвейер нод на заданной сетке координат и возвращает карту высот."""
     # Создаем "контекст" - словарь, который передается от ноды к ноде.
     # Он содержит все текущие данные сцены.
     context = {
@@ -65,7 +57,6 @@ def generate_elevation_region(
         "seed": seed
     }
 
-    # --- ШАГ 3: Главный цикл выполнения конвейера ---
     for i, step_cfg in enumerate(pipeline_steps):
         if not step_cfg.get("enabled", True):
             continue
@@ -82,14 +73,15 @@ def generate_elevation_region(
             print(f"!!! [Terrain] WARNING: Нода типа '{node_type}' (id: {node_id}) не найдена в реестре. Шаг пропущен.")
             continue
 
-        print(f"  -> Шаг {i + 1}/{len(pipeline_steps)}: Выполнение ноды '{node_id}' (тип: {node_type})...")
+        if verbose:
+            print(f"  -> Шаг {i + 1}/{len(pipeline_steps)}: Выполнение ноды '{node_id}' (тип: {node_type})...")
 
         # Вызываем функцию-ноду, передавая ей ее параметры и ВЕСЬ контекст.
         # Нода возвращает обновленный контекст, который пойдет на вход следующей ноде.
         try:
             context = node_func(params=step_cfg.get("params", {}), context=context)
-            # --- ДОБАВЬТЕ ЭТУ СТРОКУ ---
-            _print_range(f"After '{node_id}'", context["main_heightmap"])
+            if verbose:
+                _print_range(f"After '{node_id}'", context["main_heightmap"])
 
         except Exception as e:
             print(f"!!! [Terrain] CRITICAL ERROR при выполнении ноды '{node_id}': {e}")
@@ -97,12 +89,93 @@ def generate_elevation_region(
             # return np.zeros_like(x_coords) # Остановка
             continue  # Продолжение
 
-    # --- ШАГ 4: Завершение и пост-эффекты ---
-    height_grid = context["main_heightmap"]
+    return context["main_heightmap"]
+
+
+def _generate_from_tiles(
+        seed: int, base_cx: int, base_cz: int, tiles_per_side: int, chunk_size: int, cell_size: float,
+        cfg: dict, tile_store: ApronTileStore,
+) -> np.ndarray:
+    """
+    Собирает расширенный холст из тайлов размером в чанк. Недостающие тайлы
+    считаются по одному и кладутся в хранилище для соседних регионов.
+    """
+    pipeline_steps = cfg.get("pipeline", [])
+    base_height = float(cfg.get("base_height_m", 0.0))
+    fingerprint = pipeline_fingerprint(seed, chunk_size, cell_size, cfg)
+    tile_store.use_fingerprint(fingerprint)
+    ext_size = tiles_per_side * chunk_size
+    height_grid = np.empty((ext_size, ext_size), dtype=np.float32)
+    local = np.arange(chunk_size, dtype=np.float32)
+
+    reused = 0
+    for dz in range(tiles_per_side):
+        for dx in range(tiles_per_side):
+            tx, tz = base_cx + dx, base_cz + dz
+            key = (fingerprint, tx, tz)
+            tile = tile_store.get(key)
+            if tile is None:
+                x_coords, z_coords = np.meshgrid(local + tx * chunk_size, local + tz * chunk_size)
+                tile = run_elevation_pipeline(pipeline_steps, x_coords, z_coords, cell_size, seed, verbose=False)
+                tile = (tile + base_height).astype(np.float32, copy=False)
+                tile_store.put(key, tile)
+            else:
+                reused += 1
+            height_grid[dz * chunk_size:(dz + 1) * chunk_size, dx * chunk_size:(dx + 1) * chunk_size] = tile
+
+    print(f"-> [Terrain] Тайловый режим: переиспользовано {reused}/{tiles_per_side * tiles_per_side} тайлов.")
+    return height_grid
 
+
+def generate_elevation_region(
+        seed: int, scx: int, scz: int, region_size_chunks: int, chunk_size: int, preset: Any, scratch_buffers: dict,
+        tile_store: ApronTileStore | None = None,
+) -> np.ndarray:
+    """
+    Главная функция-оркестратор. Генерирует карту высот, выполняя шаги из конвейера.
+    Если передан tile_store и конвейер поточечный, холст собирается из тайлов,
+    общих с соседними регионами.
+    """
+    # --- ШАГ 1: Подготовка координат (без изменений) ---
+    cfg = getattr(preset, "elevation", {})
+    cell_size = float(getattr(preset, "cell_size", 1.0))
+    ext_size = (region_size_chunks + 2) * chunk_size
+    base_cx = scx * region_size_chunks - 1
+    base_cz = scz * region_size_chunks - 1
+    gx0_px = base_cx * chunk_size
+    gz0_px = base_cz * chunk_size
+
+    # --- ШАГ 2: Инициализация конвейера ---
+    # Получаем список операций из JSON-конфига
+    pipeline_steps = cfg.get("pipeline", [])
+    if not pipeline_steps:
+        print("!!! [Terrain] CRITICAL ERROR: Конвейер 'pipeline' не найден или пуст в конфиге. Генерация остановлена.")
+        return np.zeros((ext_size, ext_size), dtype=np.float32)
+
+    print("-> [Terrain] Запуск динамического конвейера...")
+
+    if tile_store is not None and is_tile_local_pipeline(cfg):
+        height_grid = _generate_from_tiles(
+            seed, base_cx, base_cz, region_size_chunks + 2, chunk_size, cell_size, cfg, tile_store
+        )
+        _print_range("Final Heightmap", height_grid)
+        return height_grid
+    if tile_store is not None:
+        blocking = sorted({s.get("type") for s in pipeline_steps
+                           if s.get("enabled", True) and s.get("type") not in TILE_LOCAL_NODES})
+        print(f"-> [Terrain] Тайловый режим выключен: ноды {blocking} не поточечные, регион считается целиком.")
+
+    px_coords_x = np.arange(ext_size, dtype=np.float32) + gx0_px
+    px_coords_z = np.arange(ext_size, dtype=np.float32) + gz0_px
+    x_coords, z_coords = np.meshgrid(px_coords_x, px_coords_z)
+
+    # --- ШАГ 3: Главный цикл выполнения конвейера ---
+    height_grid = run_elevation_pipeline(pipeline_steps, x_coords, z_coords, cell_size, seed)
+
+    # --- ШАГ 4: Завершение и пост-эффекты ---
     # Применяем финальные общие параметры
     height_grid += float(cfg.get("base_height_m", 0.0))
 
     _print_range("Final Heightmap", height_grid)
 
-    return height_grid.copy()
\ No newline at end of file
+    return height_grid.copy()
@@ -0,0 +1,117 @@
+# ==============================================================================
+# Файл: game_engine_restructured/algorithms/terrain/tile_store.py
+# Назначение: Хранилище тайлов высот размером в один чанк. Позволяет соседним
+#             регионам переиспользовать "фартук" (apron), который уже был
+#             посчитан для соседа, вместо повторной генерации.
+# ==============================================================================
+from __future__ import annotations
+import hashlib
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+import numpy as np
+
+from ...core.utils.cache import BoundedCache, CacheStats
+
+TileKey = Tuple[str, int, int]
+
+
+def pipeline_fingerprint(seed: int, chunk_size: int, cell_size: float, elevation_cfg: Dict[str, Any]) -> str:
+    """Хэш всех входов, от которых зависит тайл высот."""
+    payload = {
+        "seed": int(seed),
+        "chunk_size": int(chunk_size),
+        "cell_size": float(cell_size),
+        "elevation": elevation_cfg,
+    }
+    blob = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha1(blob).hexdigest()[:16]
+
+
+class ApronTileStore:
+    """
+    Кэш тайлов высот, адресуемых координатами тайла (tx, tz) на сетке рельефа
+    и отпечатком конвейера. Тайл всегда считается одним и тем же вызовом
+    (одинаковая форма и координаты), поэтому переиспользованный тайл
+    побитово совпадает с пересчитанным.
+
+    Если задан disk_dir, тайлы дублируются на диск (.npy), и их могут
+    подхватить другие процессы-воркеры. В памяти держится не больше
+    max_bytes; вытесненные тайлы при необходимости читаются с диска.
+    На диске каждый отпечаток - отдельный каталог; при переходе на новый
+    отпечаток (см. use_fingerprint) каталоги прежних удаляются.
+    """
+
+    def __init__(self, disk_dir: Path | None = None, max_bytes: int | None = None):
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self._tiles = BoundedCache("apron", max_bytes=max_bytes)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_loads = 0
+        self._fingerprint: str | None = None
+
+    def use_fingerprint(self, fingerprint: str) -> None:
+        """
+        Отмечает отпечаток текущего конвейера. Тайлы других отпечатков после
+        смены настроек рельефа уже не понадобятся, их каталоги удаляются.
+        """
+        with self._lock:
+            if fingerprint == self._fingerprint:
+                return
+            self._fingerprint = fingerprint
+        if self.disk_dir is None or not self.disk_dir.is_dir():
+            return
+        stale = [p for p in self.disk_dir.iterdir() if p.is_dir() and p.name != fingerprint]
+        for path in stale:
+            shutil.rmtree(path, ignore_errors=True)
+        if stale:
+            print(f"-> [Terrain] Удалено устаревших наборов тайлов: {len(stale)}.")
+
+    def _disk_path(self, key: TileKey) -> Path:
+        fingerprint, tx, tz = key
+        return self.disk_dir / fingerprint / f"{tx}_{tz}.npy"
+
+    def get(self, key: TileKey) -> np.ndarray | None:
+        tile = self._tiles.get(key)
+        if tile is None and self.disk_dir is not None:
+            path = self._disk_path(key)
+            if path.exists():
+                try:
+                    tile = np.load(path)
+                except (OSError, ValueError):
+                    tile = None
+                if tile is not None:
+                    self._tiles.put(key, tile)
+                    with self._lock:
+                        self.disk_loads += 1
+        with self._lock:
+            if tile is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return tile
+
+    def put(self, key: TileKey, tile: np.ndarray) -> None:
+        tile = np.ascontiguousarray(tile, dtype=np.float32)
+        self._tiles.put(key, tile)
+        if self.disk_dir is not None:
+            path = self._disk_path(key)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f"{path.stem}.{os.getpid()}.tmp.npy")
+            np.save(tmp_path, tile)
+            os.replace(tmp_path, path)
+
+    def stats(self) -> CacheStats:
+        memory = self._tiles.stats()
+        with self._lock:
+            # Попадания/промахи - по хранилищу целиком (память + диск)
+            return CacheStats(
+                name="apron", items=memory.items, nbytes=memory.nbytes, max_bytes=memory.max_bytes,
+                hits=self.hits, misses=self.misses, evictions=memory.evictions,
+                spill_hits=self.disk_loads,
+            )
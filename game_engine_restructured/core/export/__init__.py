@@ -4,9 +4,25 @@
 # ==============================================================================
 from __future__ import annotations
 
-from .binary_exporters import write_heightmap_r16, write_control_map_r32
-from .image_exporters import write_chunk_preview
+from .binary_exporters import (
+    encode_control_map_r32,
+    encode_heightmap_r16,
+    log_control_map_stats,
+    log_heightmap_range,
+    pack_control_map,
+    write_control_map_r32,
+    write_heightmap_r16,
+)
+from .image_exporters import (
+    encode_chunk_preview_png,
+    encode_preview_png,
+    render_preview_rgb,
+    write_chunk_preview,
+    write_region_preview_atlas,
+)
 from .json_exporters import (
+    encode_client_chunk_meta,
+    encode_objects_json,
     write_client_chunk_meta,
     write_navigation_rle,
     write_objects_json,
@@ -19,11 +35,15 @@ from .numpy_exporters import (
     write_raw_chunk,
     write_raw_regional_layers,
 )
+from .region_pack import RegionPackReader, RegionPackWriter
+from .async_writer import AsyncChunkWriter, atomic_write_bytes
 
 __all__ = [
     "write_heightmap_r16",
     "write_control_map_r32",
     "write_chunk_preview",
+    "render_preview_rgb",
+    "write_region_preview_atlas",
     "write_region_meta",
     "write_client_chunk_meta",
     "write_objects_json",
@@ -33,4 +53,17 @@ __all__ = [
     "write_raw_chunk",
     "read_raw_chunk",
     "write_raw_regional_layers",
+    "encode_heightmap_r16",
+    "encode_control_map_r32",
+    "pack_control_map",
+    "log_heightmap_range",
+    "log_control_map_stats",
+    "encode_objects_json",
+    "encode_client_chunk_meta",
+    "encode_chunk_preview_png",
+    "encode_preview_png",
+    "RegionPackWriter",
+    "RegionPackReader",
+    "AsyncChunkWriter",
+    "atomic_write_bytes",
 ]
\ No newline at end of file
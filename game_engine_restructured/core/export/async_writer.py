@@ -0,0 +1,120 @@
+# ==============================================================================
+# Файл: game_engine_restructured/core/export/async_writer.py
+# Назначение: Фоновая очередь записи файлов экспорта. Пока потоки пишут
+#             готовые байты на диск, основной поток уже считает следующий чанк.
+# ==============================================================================
+from __future__ import annotations
+import concurrent.futures
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List
+
+
+def atomic_write_bytes(path: str | Path, data: bytes, fsync: bool = False) -> None:
+    """Пишет байты во временный файл и атомарно переименовывает его."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+@dataclass
+class WriterStats:
+    files: int = 0
+    bytes: int = 0
+    errors: int = 0
+    # Сколько основной поток простоял в ожидании свободного места в очереди
+    blocked_s: float = 0.0
+
+
+class AsyncChunkWriter:
+    """
+    Ограниченная очередь записи.
+
+    submit() отдает байты файла пулу потоков и сразу возвращает управление.
+    Если в очереди уже max_pending файлов, submit() ждет (back-pressure),
+    чтобы готовые данные не копились в памяти быстрее, чем их успевает
+    принять диск. flush() - барьер: возвращается, когда все отправленные
+    файлы записаны (вызывается в конце региона).
+
+    При max_workers=0 запись выполняется синхронно в вызывающем потоке.
+    """
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 32, fsync: bool = False, verbose: bool = False):
+        self.max_workers = max(0, int(max_workers))
+        self.fsync = bool(fsync)
+        self.verbose = verbose
+        self.stats = WriterStats()
+        self._slots = threading.BoundedSemaphore(max(1, int(max_pending)))
+        self._lock = threading.Lock()
+        self._pending: List[concurrent.futures.Future] = []
+        self._executor = (
+            concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="chunk-writer")
+            if self.max_workers > 0 else None
+        )
+
+    def _write(self, path: str, data: bytes) -> None:
+        try:
+            atomic_write_bytes(path, data, fsync=self.fsync)
+            with self._lock:
+                self.stats.files += 1
+                self.stats.bytes += len(data)
+            if self.verbose:
+                print(f"--- EXPORT: {Path(path).name} saved: {path}")
+        except Exception as e:
+            with self._lock:
+                self.stats.errors += 1
+            print(f"!!! LOG: CRITICAL ERROR while writing {path}: {e}")
+
+    def _write_and_release(self, path: str, data: bytes) -> None:
+        try:
+            self._write(path, data)
+        finally:
+            self._slots.release()
+
+    def submit(self, path: str | Path, data: bytes) -> None:
+        if self._executor is None:
+            self._write(str(path), data)
+            return
+
+        t0 = time.perf_counter()
+        self._slots.acquire()
+        waited = time.perf_counter() - t0
+        future = self._executor.submit(self._write_and_release, str(path), data)
+        with self._lock:
+            self.stats.blocked_s += waited
+            self._pending.append(future)
+            # Убираем уже завершенные, чтобы список не рос
+            if len(self._pending) > 256:
+                self._pending = [f for f in self._pending if not f.done()]
+
+    def submit_files(self, directory: str | Path, files: Dict[str, bytes]) -> None:
+        for name, data in files.items():
+            self.submit(Path(directory) / name, data)
+
+    def flush(self) -> WriterStats:
+        """Ждет завершения всех отправленных записей."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        concurrent.futures.wait(pending)
+        return self.stats
+
+    def close(self) -> None:
+        self.flush()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def __enter__(self) -> "AsyncChunkWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
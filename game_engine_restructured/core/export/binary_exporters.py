@@ -6,7 +6,7 @@
 from __future__ import annotations
 import os
 from pathlib import Path
-from typing import List
+from typing import Dict, Tuple
 
 import numpy as np
 
@@ -40,39 +40,117 @@ def _pack_control_data(base_id=0, overlay_id=0, blend=0, nav=True) -> np.uint32:
     return np.uint32(val)
 
 
+def _atomic_write_bytes(path: str, data: bytes) -> None:
+    _ensure_path_exists(path)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def encode_heightmap_r16(height_grid: np.ndarray, h_norm: float | None) -> bytes:
+    """Кодирует карту высот в байты формата .r16 (little-endian uint16)."""
+    height_array = np.asarray(height_grid, dtype=np.float32)
+    if h_norm is None or h_norm <= 0:
+        raise ValueError("write_heightmap_r16: h_norm must be a positive float")
+
+    normalized = np.clip(height_array / float(h_norm), 0.0, 1.0)
+    return (normalized * 65535.0).astype("<u2").tobytes()
+
+
 def write_heightmap_r16(
         path: str,
-        height_grid: List[List[float]],
+        height_grid: np.ndarray,
         *,
         h_norm: float | None = None,   # <— НОВОЕ
         verbose: bool = False
 ):
     """Сохраняет карту высот в 16-битном беззнаковом формате."""
     try:
-        if not height_grid or not height_grid[0]:
+        height_array = np.asarray(height_grid, dtype=np.float32)
+        if height_array.size == 0:
             return
 
-        if h_norm is None or h_norm <= 0:
-            raise ValueError("write_heightmap_r16: h_norm must be a positive float")
-
-        height_array = np.array(height_grid, dtype=np.float32)
-        normalized = np.clip(height_array / float(h_norm), 0.0, 1.0)
-        final_array = (normalized * 65535.0).astype("<u2")
-
-        _ensure_path_exists(path)
-        tmp_path = path + ".tmp"
-        with open(tmp_path, "wb") as f:
-            f.write(final_array.tobytes())
-        os.replace(tmp_path, path)
+        _atomic_write_bytes(path, encode_heightmap_r16(height_array, h_norm))
 
         if verbose:
-            hmin, hmax = float(height_array.min()), float(height_array.max())
-            print(f"--- EXPORT height.r16 → {path}")
-            print(f"    H_NORM={h_norm:.3f} | input range: [{hmin:.3f}, {hmax:.3f}] m")
+            log_heightmap_range(path, height_array, h_norm)
     except Exception as e:
         print(f"!!! LOG: CRITICAL ERROR while creating heightmap.r16: {e}")
 
 
+def log_heightmap_range(path: str, height_grid: np.ndarray, h_norm: float) -> None:
+    """Диагностика карты высот для log_file_saves: нормировка и диапазон входных высот."""
+    height_array = np.asarray(height_grid, dtype=np.float32)
+    hmin, hmax = float(height_array.min()), float(height_array.max())
+    print(f"--- EXPORT height.r16 → {path}")
+    print(f"    H_NORM={h_norm:.3f} | input range: [{hmin:.3f}, {hmax:.3f}] m")
+
+
+def _count_values(values: np.ndarray) -> Dict[int, int]:
+    ids, counts = np.unique(values, return_counts=True)
+    return {int(i): int(c) for i, c in zip(ids.tolist(), counts.tolist())}
+
+
+def pack_control_map(
+        surface_grid: np.ndarray,
+        nav_grid: np.ndarray,
+        overlay_grid: np.ndarray,
+) -> Tuple[np.ndarray, Dict[str, Dict]]:
+    """
+    Векторная версия _pack_control_data для всей карты сразу.
+
+    Возвращает массив '<u4' (h, w) в той же укладке битов и статистику:
+    base_id_counts / overlay_id_counts / blend_counts / nav_counts.
+    """
+    # int64 повторяет семантику Python-int для масок & 0x1F / & 0xFF
+    base_ids = np.asarray(surface_grid).astype(np.int64)
+    overlay_ids = np.asarray(overlay_grid).astype(np.int64)
+    nav = np.asarray(nav_grid)
+    is_navigable = (nav == 0) | (nav == 7)  # 0=passable, 7=bridge
+    blend = np.where(overlay_ids != 0, 255, 0).astype(np.int64)
+
+    packed = ((base_ids & 0x1F) << 27) | ((overlay_ids & 0x1F) << 22) | ((blend & 0xFF) << 14)
+    packed |= is_navigable.astype(np.int64) << 3
+    control_map = packed.astype("<u4")
+
+    navigable = int(np.count_nonzero(is_navigable))
+    stats = {
+        "base_id_counts": _count_values(base_ids),
+        "overlay_id_counts": _count_values(overlay_ids),
+        "blend_counts": _count_values(blend),
+        "nav_counts": {True: navigable, False: int(is_navigable.size) - navigable},
+    }
+    return control_map, stats
+
+
+def encode_control_map_r32(
+        surface_grid: np.ndarray,
+        nav_grid: np.ndarray,
+        overlay_grid: np.ndarray,
+) -> bytes:
+    """Кодирует управляющую карту в байты формата .r32."""
+    control_map, _ = pack_control_map(surface_grid, nav_grid, overlay_grid)
+    return control_map.tobytes()
+
+
+def log_control_map_stats(chunk_coords: str, stats: Dict[str, Dict]) -> None:
+    """Диагностика управляющей карты для log_file_saves (статистика из pack_control_map)."""
+    print(f"  -> [ControlMap] Stats for chunk {chunk_coords}:")
+    for tile_id, count in sorted(stats["base_id_counts"].items()):
+        if count > 0:
+            tile_name = SURFACE_ID_TO_KIND.get(tile_id, f"Unknown_ID_{tile_id}")
+            print(f"     - {tile_name}: {count} pixels")
+
+    overlay_gt_0 = sum(v for k, v in stats["overlay_id_counts"].items() if k > 0)
+    if overlay_gt_0 > 0:
+        print(f"     - Overlay Count (>0): {overlay_gt_0} pixels")
+
+    nav_counts = stats["nav_counts"]
+    print(f"     - Navigable: {nav_counts[True]} pixels")
+    print(f"     - Non-navigable: {nav_counts[False]} pixels")
+
+
 def write_control_map_r32(
         path: str,
         surface_grid: np.ndarray,
@@ -83,58 +161,15 @@ def write_control_map_r32(
     """
     Сохраняет управляющую карту текстур (control map) в 32-битном формате.
 
-    Детальное описание формата см. в документации функции _pack_control_data.
+    Детальное описание формата см. в документации функции _pack_control_data,
+    сама упаковка выполняется векторно в pack_control_map.
     """
     try:
-        h, w = surface_grid.shape
-        control_map = np.zeros((h, w), dtype="<u4")
-
-        # --- ВАША НОВАЯ ЛОГИКА СБОРА СТАТИСТИКИ ---
-        base_id_counts = {}
-        overlay_id_counts = {}
-        blend_counts = {}
-        nav_counts = {True: 0, False: 0}
-
-        for z in range(h):
-            for x in range(w):
-                base_id = int(surface_grid[z, x])
-                is_navigable = nav_grid[z, x] in (0, 7)  # 0=passable, 7=bridge
-                overlay_id = int(overlay_grid[z, x])
-                blend = 255 if overlay_id != 0 else 0
-
-                base_id_counts[base_id] = base_id_counts.get(base_id, 0) + 1
-                overlay_id_counts[overlay_id] = overlay_id_counts.get(overlay_id, 0) + 1
-                blend_counts[blend] = blend_counts.get(blend, 0) + 1
-                nav_counts[is_navigable] += 1
-
-                control_map[z, x] = _pack_control_data(
-                    base_id=base_id,
-                    overlay_id=overlay_id,
-                    blend=blend,
-                    nav=is_navigable,
-                )
-
-        _ensure_path_exists(path)
-        tmp_path = path + ".tmp"
-        with open(tmp_path, "wb") as f:
-            f.write(control_map.tobytes())
-        os.replace(tmp_path, path)
+        control_map, stats = pack_control_map(surface_grid, nav_grid, overlay_grid)
+        _atomic_write_bytes(path, control_map.tobytes())
 
         if verbose:
-            # --- ВАША НОВАЯ ЛОГИКА ВЫВОДА СТАТИСТИКИ ---
-            chunk_coords = Path(path).parent.name
-            print(f"  -> [ControlMap] Stats for chunk {chunk_coords}:")
-            for tile_id, count in sorted(base_id_counts.items()):
-                if count > 0:
-                    tile_name = SURFACE_ID_TO_KIND.get(tile_id, f"Unknown_ID_{tile_id}")
-                    print(f"     - {tile_name}: {count} pixels")
-
-            overlay_gt_0 = sum(v for k, v in overlay_id_counts.items() if k > 0)
-            if overlay_gt_0 > 0:
-                print(f"     - Overlay Count (>0): {overlay_gt_0} pixels")
-
-            print(f"     - Navigable: {nav_counts[True]} pixels")
-            print(f"     - Non-navigable: {nav_counts[False]} pixels")
+            log_control_map_stats(Path(path).parent.name, stats)
             print(f"--- EXPORT: Binary Control map (.r32) saved: {path}")
 
     except Exception as e:
@@ -1,16 +1,20 @@
 # ==============================================================================
 # Файл: game_engine_restructured/core/export/image_exporters.py
 # Назначение: Функции для генерации изображений (preview.png).
+# ВЕРСИЯ 2.0: Превью строится через таблицы цветов (LUT) по ID, без
+#             попиксельной отрисовки; добавлен атлас превью региона.
 # ==============================================================================
 from __future__ import annotations
+import io
 import os
 from pathlib import Path
-from typing import Dict, List
+from functools import lru_cache
+from typing import Dict, Tuple
 
 import numpy as np
 from PIL import Image
 
-from ..constants import NAV_ID_TO_KIND, SURFACE_ID_TO_KIND
+from ..constants import NAV_ID_TO_KIND, NAV_KIND_TO_ID, SURFACE_ID_TO_KIND, SURFACE_KIND_TO_ID
 
 
 def _ensure_path_exists(path: str) -> None:
@@ -18,6 +22,118 @@ def _ensure_path_exists(path: str) -> None:
     Path(path).parent.mkdir(parents=True, exist_ok=True)
 
 
+# Виды навигации, которые на превью перекрывают текстуру поверхности
+_NAV_OVERRIDE_KINDS = ("water", "obstacle_prop", "bridge")
+# Последняя строка таблицы - для ID вне диапазона 0..255
+_LUT_SIZE = 257
+
+
+def _build_color_map(palette: Dict[str, str]) -> Dict[str, str]:
+    return {
+        "water": palette.get("water", "#3A6FD8"),
+        "obstacle_prop": palette.get("obstacle_prop", "#444444"),
+        "bridge": palette.get("bridge", "#C8A452"),
+        "base_dirt": palette.get("base_dirt", "#8B4513"),
+        "base_grass": palette.get("base_grass", "#5FAF3A"),
+        "base_sand": palette.get("base_sand", "#D8C27A"),
+        "base_rock": palette.get("base_rock", "#9AA0A6"),
+        "base_road": palette.get("base_road", "#7A5C3A"),
+    }
+
+
+def _hex_to_rgb(hex_color: str) -> Tuple[int, int, int]:
+    hex_color = hex_color.lstrip("#")
+    if len(hex_color) == 8: hex_color = hex_color[2:]  # Убираем альфа-канал
+    return tuple(int(hex_color[i: i + 2], 16) for i in (0, 2, 4))
+
+
+@lru_cache(maxsize=32)
+def _build_luts(color_items: Tuple[Tuple[str, str], ...]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Строит таблицы цветов по ID: цвет поверхности, флаг "навигация
+    перекрывает поверхность" и цвет навигации. Кэшируется по палитре.
+    """
+    color_map = dict(color_items)
+    default_rgb = _hex_to_rgb(color_map["base_dirt"])
+
+    def color_of(kind: str) -> Tuple[int, int, int]:
+        return _hex_to_rgb(color_map[kind]) if kind in color_map else default_rgb
+
+    surface_lut = np.empty((_LUT_SIZE, 3), dtype=np.uint8)
+    nav_lut = np.zeros((_LUT_SIZE, 3), dtype=np.uint8)
+    nav_override = np.zeros(_LUT_SIZE, dtype=bool)
+    for i in range(_LUT_SIZE):
+        surface_lut[i] = color_of(SURFACE_ID_TO_KIND.get(i, "base_dirt"))
+        nav_kind = NAV_ID_TO_KIND.get(i, "passable")
+        if nav_kind in _NAV_OVERRIDE_KINDS:
+            nav_override[i] = True
+            nav_lut[i] = color_of(nav_kind)
+
+    for lut in (surface_lut, nav_lut, nav_override):
+        lut.setflags(write=False)
+    return surface_lut, nav_override, nav_lut
+
+
+def _to_id_grid(grid, kind2id: Dict[str, int]) -> np.ndarray:
+    """Приводит сетку к индексам таблицы цветов (0..256)."""
+    arr = np.asarray(grid)
+    if arr.dtype.kind in ("U", "S", "O"):
+        # Старый формат: сетка строк
+        lookup = np.vectorize(lambda k: kind2id.get(k, _LUT_SIZE - 1), otypes=[np.int64])
+        return lookup(arr) if arr.size else arr.astype(np.int64)
+    if arr.dtype == np.uint8:
+        return arr
+    ids = arr.astype(np.int64)
+    ids[(ids < 0) | (ids >= _LUT_SIZE - 1)] = _LUT_SIZE - 1
+    return ids
+
+
+def render_preview_rgb(surface_grid, nav_grid, palette: Dict[str, str]) -> np.ndarray:
+    """
+    Переводит ID поверхности и навигации в RGB-массив (h, w, 3) uint8
+    через таблицы цветов. Без переворота и масштабирования.
+    """
+    color_map = _build_color_map(palette or {})
+    surface_lut, nav_override, nav_lut = _build_luts(tuple(sorted(color_map.items())))
+
+    surface_ids = _to_id_grid(surface_grid, SURFACE_KIND_TO_ID)
+    nav_ids = _to_id_grid(nav_grid, NAV_KIND_TO_ID)
+
+    rgb = surface_lut[surface_ids]
+    # Приоритет отрисовки: вода/препятствия важнее текстуры земли
+    override = nav_override[nav_ids]
+    rgb[override] = nav_lut[nav_ids[override]]
+    return rgb
+
+
+def _to_image(rgb: np.ndarray, scale: int) -> Image.Image:
+    # Ось Z в мире направлена "вверх" картинки
+    img_arr = np.flipud(rgb)
+    if scale > 1:
+        img_arr = np.repeat(np.repeat(img_arr, scale, axis=0), scale, axis=1)
+    return Image.fromarray(np.ascontiguousarray(img_arr), mode="RGB")
+
+
+def _save_png(path: str, rgb: np.ndarray, scale: int = 2) -> None:
+    img = _to_image(rgb, scale)
+    _ensure_path_exists(path)
+    tmp_path = path + ".tmp"
+    img.save(tmp_path, format="PNG")
+    os.replace(tmp_path, path)
+
+
+def encode_preview_png(rgb: np.ndarray) -> bytes:
+    """PNG-байты превью из уже раскрашенного массива render_preview_rgb."""
+    buf = io.BytesIO()
+    _to_image(rgb, scale=2).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def encode_chunk_preview_png(surface_grid, nav_grid, palette: Dict[str, str]) -> bytes:
+    """PNG-байты превью чанка (то же изображение, что пишет write_chunk_preview)."""
+    return encode_preview_png(render_preview_rgb(surface_grid, nav_grid, palette))
+
+
 def write_chunk_preview(
         path: str,
         surface_grid,
@@ -25,96 +141,27 @@ def write_chunk_preview(
         palette: Dict[str, str],
         verbose: bool = False,
 ):
-    """Рисует превью чанка и сохраняет его в PNG."""
-    # --- НАЧАЛО НОВОГО КОДА ДЛЯ ДИАГНОСТИКИ ---
+    """Рисует превью чанка (через таблицы цветов) и сохраняет его в PNG."""
     if verbose:  # Мы используем тот же флаг, что и для лога сохранения файлов
-        from collections import Counter
         chunk_coords = Path(path).parent.name
         print(f"  -> [Preview IMG] Stats for chunk {chunk_coords}:")
 
-        # Проверяем, что это numpy-массив, и считаем ID
         if isinstance(surface_grid, np.ndarray):
-            counts = Counter(surface_grid.flatten())
-            for tile_id, count in sorted(counts.items()):
+            ids, counts = np.unique(surface_grid, return_counts=True)
+            for tile_id, count in zip(ids.tolist(), counts.tolist()):
                 tile_name = SURFACE_ID_TO_KIND.get(tile_id, f"Unknown_ID_{tile_id}")
                 print(f"     - {tile_name}: {count} pixels")
         else:
             print("     - WARNING: surface_grid is not a NumPy array!")
-    # --- КОНЕЦ НОВОГО КОДА ДЛЯ ДИАГНОСТИКИ ---
 
     if not palette:
         print("[Preview] WARN: preset.export.palette пустая — будут дефолтные цвета.")
 
-    color_map = {
-        "water": palette.get("water", "#3A6FD8"),
-        "obstacle_prop": palette.get("obstacle_prop", "#444444"),
-        "bridge": palette.get("bridge", "#C8A452"),
-        "base_dirt": palette.get("base_dirt", "#8B4513"),
-        "base_grass": palette.get("base_grass", "#5FAF3A"),
-        "base_sand": palette.get("base_sand", "#D8C27A"),
-        "base_rock": palette.get("base_rock", "#9AA0A6"),
-        "base_road": palette.get("base_road", "#7A5C3A"),
-    }
-    default_color_hex = color_map["base_dirt"]
-
-    def _ensure_str_grid(
-            grid, id2name: Dict[int, str], default_name: str
-    ) -> List[List[str]]:
-        """
-        Гарантирует, что на выходе будет список списков строк,
-        безопасно работая с NumPy-массивами.
-        """
-        # --- НАЧАЛО ИЗМЕНЕНИЙ: Правильная проверка для NumPy ---
-        if grid is None or grid.size == 0:
-            return []
-        # --- КОНЕЦ ИЗМЕНЕНИЙ ---
-
-        # Проверяем, нужно ли конвертировать ID в строки
-        # Для numpy-массивов нужно проверять тип элемента, а не всего массива
-        if isinstance(grid, np.ndarray) and np.issubdtype(grid.dtype, np.number):
-            return [[id2name.get(int(v), default_name) for v in row] for row in grid]
-
-        # Если это уже список списков строк, просто возвращаем его
-        if isinstance(grid[0][0], str):
-            return grid
-
-        # На случай, если это список списков чисел (старый формат)
-        return [[id2name.get(int(v), default_name) for v in row] for row in grid]
-
-    surface_grid_str = _ensure_str_grid(surface_grid, SURFACE_ID_TO_KIND, "base_dirt")
-    nav_grid_str = _ensure_str_grid(nav_grid, NAV_ID_TO_KIND, "passable")
-
     try:
-        h = len(surface_grid_str)
-        w = len(surface_grid_str[0]) if h else 0
-        if w == 0:
+        if surface_grid is None or np.size(surface_grid) == 0:
             return
 
-        img = Image.new("RGB", (w, h))
-        px = img.load()
-
-        for y in range(h):
-            for x in range(w):
-                nav_kind = nav_grid_str[y][x]
-                # Приоритет отрисовки: вода/препятствия важнее текстуры земли
-                final_kind = (
-                    nav_kind
-                    if nav_kind in ("water", "obstacle_prop", "bridge")
-                    else surface_grid_str[y][x]
-                )
-                hex_color = color_map.get(final_kind, default_color_hex).lstrip("#")
-                if len(hex_color) == 8: hex_color = hex_color[2:] # Убираем альфа-канал
-                r, g, b = tuple(int(hex_color[i : i + 2], 16) for i in (0, 2, 4))
-                px[x, y] = (r, g, b)
-
-        img = img.transpose(Image.FLIP_TOP_BOTTOM).resize(
-            (w * 2, h * 2), Image.Resampling.NEAREST
-        )
-
-        _ensure_path_exists(path)
-        tmp_path = path + ".tmp"
-        img.save(tmp_path, format="PNG")
-        os.replace(tmp_path, path)
+        _save_png(path, render_preview_rgb(surface_grid, nav_grid, palette), scale=2)
 
         if verbose:
             print(f"--- EXPORT: Preview image saved: {path}")
@@ -122,4 +169,32 @@ def write_chunk_preview(
     except Exception as e:
         import traceback
         print(f"[Preview] CRITICAL ERROR: {e}")
-        traceback.print_exc()
\ No newline at end of file
+        traceback.print_exc()
+
+
+def write_region_preview_atlas(
+        path: str,
+        chunk_rgbs: Dict[Tuple[int, int], np.ndarray],
+        region_size: int,
+        chunk_size: int,
+        scale: int = 1,
+        verbose: bool = False,
+):
+    """
+    Склеивает RGB-превью чанков региона (из render_preview_rgb) в один PNG.
+    Ключи chunk_rgbs - локальные координаты чанка (dx, dz) внутри региона.
+    Отсутствующие чанки остаются черными.
+    """
+    try:
+        atlas = np.zeros((region_size * chunk_size, region_size * chunk_size, 3), dtype=np.uint8)
+        for (dx, dz), rgb in chunk_rgbs.items():
+            atlas[dz * chunk_size:(dz + 1) * chunk_size, dx * chunk_size:(dx + 1) * chunk_size] = rgb
+
+        _save_png(path, atlas, scale=scale)
+
+        if verbose:
+            print(f"--- EXPORT: Region preview atlas saved: {path}")
+    except Exception as e:
+        import traceback
+        print(f"[Preview] CRITICAL ERROR while creating region atlas: {e}")
+        traceback.print_exc()
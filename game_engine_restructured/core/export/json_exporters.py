@@ -14,7 +14,7 @@ import numpy as np  # <-- Добавляем импорт numpy
 
 from ...world.object_types import PlacedObject
 from ...world.serialization import ClientChunkContract, RegionMetaContract
-from ..utils.rle import encode_rle_rows
+from ..utils.rle import encode_rle_rows_array
 
 
 def _ensure_path_exists(path: str) -> None:
@@ -22,24 +22,26 @@ def _ensure_path_exists(path: str) -> None:
     Path(path).parent.mkdir(parents=True, exist_ok=True)
 
 
+def _default_serializer(o):
+    if dataclasses.is_dataclass(o):
+        return dataclasses.asdict(o)
+    if isinstance(o, np.integer): return int(o)
+    if isinstance(o, np.floating): return float(o)
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def _encode_json(data: Any) -> bytes:
+    """Сериализует данные в байты UTF-8 (тот же вид, что и в файлах)."""
+    return json.dumps(data, ensure_ascii=False, indent=2, default=_default_serializer).encode("utf-8")
+
+
 def _atomic_write_json(path: str, data: Any, verbose: bool = False):
     """Атомарно записывает данные в JSON файл для предотвращения битых файлов."""
     _ensure_path_exists(path)
     tmp_path = path + ".tmp"
 
-    def default_serializer(o):
-        if dataclasses.is_dataclass(o):
-            return dataclasses.asdict(o)
-        try:
-            # import numpy as _np # Numpy уже импортирован выше
-            if isinstance(o, np.integer): return int(o)
-            if isinstance(o, np.floating): return float(o)
-        except ImportError:
-            pass
-        raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
-
-    with open(tmp_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2, default=default_serializer)
+    with open(tmp_path, "wb") as f:
+        f.write(_encode_json(data))
     os.replace(tmp_path, path)
     if verbose:
         print(f"--- EXPORT: JSON file saved: {path}")
@@ -57,11 +59,8 @@ def write_region_meta(
     _atomic_write_json(path, data, verbose)
 
 
-def write_client_chunk_meta(
-        path: str, chunk_contract: ClientChunkContract, verbose: bool = False
-):
-    """Записывает метаданные чанка для клиента."""
-    data = {
+def _client_chunk_meta(chunk_contract: ClientChunkContract) -> Dict[str, Any]:
+    return {
         "version": chunk_contract.version,
         "cx": chunk_contract.cx,
         "cz": chunk_contract.cz,
@@ -72,12 +71,22 @@ def write_client_chunk_meta(
             "objects": "objects.json",
         },
     }
-    _atomic_write_json(path, data, verbose)
 
 
-def write_objects_json(path: str, objects: list[PlacedObject], verbose: bool = False):
-    """Записывает список размещенных объектов."""
-    data = [
+def encode_client_chunk_meta(chunk_contract: ClientChunkContract) -> bytes:
+    """Байты chunk.json (для упаковки в region pack)."""
+    return _encode_json(_client_chunk_meta(chunk_contract))
+
+
+def write_client_chunk_meta(
+        path: str, chunk_contract: ClientChunkContract, verbose: bool = False
+):
+    """Записывает метаданные чанка для клиента."""
+    _atomic_write_json(path, _client_chunk_meta(chunk_contract), verbose)
+
+
+def _objects_data(objects: list[PlacedObject]) -> list:
+    return [
         {
             "id": obj.prefab_id,
             "center_hex": {"q": obj.center_q, "r": obj.center_r},
@@ -86,7 +95,16 @@ def write_objects_json(path: str, objects: list[PlacedObject], verbose: bool = F
         }
         for obj in objects
     ]
-    _atomic_write_json(path, data, verbose)
+
+
+def encode_objects_json(objects: list[PlacedObject]) -> bytes:
+    """Байты objects.json (для упаковки в region pack)."""
+    return _encode_json(_objects_data(objects))
+
+
+def write_objects_json(path: str, objects: list[PlacedObject], verbose: bool = False):
+    """Записывает список размещенных объектов."""
+    _atomic_write_json(path, _objects_data(objects), verbose)
 
 
 def write_world_meta_json(path: str, **kwargs) -> None:
@@ -122,14 +140,11 @@ def write_navigation_rle(
 
         h, w = nav_grid_ids.shape
 
-        # Конвертируем numpy array в list of lists, так как RLE-кодер работает с ними
-        id_grid = nav_grid_ids.tolist()
-
         cols, rows = grid_spec.dims_for_chunk() if grid_spec else (w, h)
         data = {
             "version": "nav_rle_v1", "size": {"cols": cols, "rows": rows},
             "legend": {"0": "passable", "1": "obstacle_prop", "2": "water", "7": "bridge"},
-            "rows": encode_rle_rows(id_grid)["rows"],
+            "rows": encode_rle_rows_array(nav_grid_ids)["rows"],
         }
         _atomic_write_json(path, data, verbose)
     except Exception as e:
@@ -14,6 +14,7 @@ import numpy as np
 
 from ..grid.hex import HexGridSpec
 from ..types import GenResult
+from ..utils.layers import ChunkLayers, LAYER_DTYPES
 
 
 # --- Вспомогательные функции, которые нам понадобятся ---
@@ -39,7 +40,7 @@ def _atomic_write_json(path: str, data: any, verbose: bool = False):
 # --- Основные функции ---
 
 def write_raw_chunk(path_prefix: str, chunk_data: GenResult):
-    """Сохраняет сырой чанк. Теперь ПРАВИЛЬНО работает с numpy-массивами."""
+    """Сохраняет сырой чанк: все слои ChunkLayers пишутся как есть, без конвертаций."""
     meta_path = path_prefix + ".meta.json"
     grid_path = path_prefix + ".npz"
 
@@ -52,23 +53,16 @@ def write_raw_chunk(path_prefix: str, chunk_data: GenResult):
     }
     _atomic_write_json(meta_path, meta)
 
-    height_grid = np.array(chunk_data.layers.get("height_q", {}).get("grid", []), dtype=np.float32)
-
-    surface_ids = chunk_data.layers.get("surface")
-    nav_ids = chunk_data.layers.get("navigation")
-
-    if not isinstance(surface_ids, np.ndarray) or not isinstance(nav_ids, np.ndarray):
-        print(
-            f"!!! WARNING for chunk {chunk_data.cx},{chunk_data.cz}: Layers are not NumPy arrays! This may indicate a problem.")
-        from ..constants import SURFACE_KIND_TO_ID, NAV_KIND_TO_ID
-        surface_ids = np.array([[SURFACE_KIND_TO_ID.get(k, 0) for k in row] for row in surface_ids], dtype=np.uint8)
-        nav_ids = np.array([[NAV_KIND_TO_ID.get(k, 1) for k in row] for row in nav_ids], dtype=np.uint8)
+    layers = chunk_data.layers
+    if layers is None:
+        print(f"!!! WARNING for chunk {chunk_data.cx},{chunk_data.cz}: chunk has no layers, nothing to save.")
+        return
 
     _ensure_path_exists(grid_path)
     tmp_path = grid_path + ".tmp"
     with open(tmp_path, "wb") as f:
-        np.savez_compressed(f, height=height_grid, surface=surface_ids.astype(np.uint8),
-                            navigation=nav_ids.astype(np.uint8))
+        np.savez_compressed(f, height=layers.height, surface=layers.surface,
+                            navigation=layers.navigation, overlay=layers.overlay)
 
     # --- НАЧАЛО ИСПРАВЛЕНИЯ ---
     # Переименовываем временный файл в основной. Этого здесь не хватало.
@@ -77,7 +71,7 @@ def write_raw_chunk(path_prefix: str, chunk_data: GenResult):
 
 
 def read_raw_chunk(path_prefix: str) -> GenResult | None:
-    """Читает сырой чанк. Теперь возвращает слои как numpy-массивы."""
+    """Читает сырой чанк. Возвращает слои как ChunkLayers (numpy-массивы)."""
     meta_path = path_prefix + ".meta.json"
     grid_path = path_prefix + ".npz"
     if not os.path.exists(meta_path) or not os.path.exists(grid_path):
@@ -87,9 +81,14 @@ def read_raw_chunk(path_prefix: str) -> GenResult | None:
         with open(meta_path, "r", encoding="utf-8") as f:
             meta = json.load(f)
         with np.load(grid_path) as data:
-            height = data["height"].tolist()
+            height = data["height"]
             surface_ids = data["surface"]
             nav_ids = data["navigation"]
+            # Старые файлы сохранялись без overlay
+            if "overlay" in data:
+                overlay = data["overlay"]
+            else:
+                overlay = np.zeros((meta["size"], meta["size"]), dtype=LAYER_DTYPES["overlay"])
 
         spec = HexGridSpec(**meta["grid_spec"]) if meta.get("grid_spec") else None
         return GenResult(
@@ -97,12 +96,12 @@ def read_raw_chunk(path_prefix: str) -> GenResult | None:
             cx=meta["cx"], cz=meta["cz"], size=meta["size"],
             cell_size=meta["cell_size"], grid_spec=spec,
             stage_seeds=meta.get("stage_seeds", {}),
-            layers={
-                "height_q": {"grid": height},
-                "surface": surface_ids,
-                "navigation": nav_ids,
-                "overlay": np.zeros((meta["size"], meta["size"]), dtype=np.int32),
-            },
+            layers=ChunkLayers(
+                surface=surface_ids,
+                navigation=nav_ids,
+                overlay=overlay,
+                height=height,
+            ),
         )
     except Exception as e:
         print(f"!!! ERROR reading raw chunk {path_prefix}: {e}")
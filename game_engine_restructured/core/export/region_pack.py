@@ -0,0 +1,192 @@
+# ==============================================================================
+# Файл: game_engine_restructured/core/export/region_pack.py
+# Назначение: Упакованный контейнер региона (.rpack). Все файлы всех чанков
+#             региона (heightmap.r16, control.r32, objects.json, ...) лежат
+#             в одном файле с таблицей-индексом, вместо тысяч мелких файлов.
+# ==============================================================================
+"""
+Формат .rpack (все числа little-endian):
+
+    [Заголовок, 64 байта]
+        magic        8s   b"RGNPACK1"
+        version      u32
+        scx, scz     i32, i32
+        entry_count  u32
+        index_offset u64  смещение таблицы-индекса от начала файла
+        (остаток заполнен нулями)
+
+    [Данные]
+        Блоки файлов; каждый начинается с адреса, кратного 64 байтам,
+        поэтому массивы (r16/r32) можно читать из mmap без копирования.
+
+    [Индекс, entry_count записей по 48 байт]
+        cx, cz       i32, i32
+        name         24s  имя файла чанка, UTF-8, дополнено нулями
+        offset       u64
+        length       u64
+
+Имена внутри пакета совпадают с именами файлов, на которые ссылается
+chunk.json (ClientChunkContract), поэтому клиенту достаточно заменить
+"открыть файл" на "взять срез из пакета".
+"""
+from __future__ import annotations
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+
+PACK_MAGIC = b"RGNPACK1"
+PACK_VERSION = 1
+PACK_ALIGN = 64
+
+_HEADER = struct.Struct("<8sIiiIQ")
+_HEADER_SIZE = 64
+_ENTRY = struct.Struct("<ii24sQQ")
+_NAME_BYTES = 24
+
+EntryKey = Tuple[int, int, str]
+
+
+def _align(value: int) -> int:
+    return (value + PACK_ALIGN - 1) // PACK_ALIGN * PACK_ALIGN
+
+
+class RegionPackWriter:
+    """
+    Последовательно пишет блоки во временный файл; индекс и заголовок
+    дописываются в close(), после чего файл атомарно переименовывается.
+    """
+
+    def __init__(self, path: str | Path, scx: int, scz: int):
+        self.path = Path(path)
+        self.scx, self.scz = int(scx), int(scz)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._tmp_path = self.path.with_name(self.path.name + ".tmp")
+        self._f = open(self._tmp_path, "wb")
+        self._f.write(b"\0" * _HEADER_SIZE)
+        self._pos = _HEADER_SIZE
+        self._entries: List[Tuple[int, int, bytes, int, int]] = []
+        self._keys: set = set()
+
+    def add(self, cx: int, cz: int, name: str, data: bytes) -> None:
+        name_bytes = name.encode("utf-8")
+        if len(name_bytes) > _NAME_BYTES:
+            raise ValueError(f"RegionPack: имя '{name}' длиннее {_NAME_BYTES} байт")
+        key = (int(cx), int(cz), name)
+        if key in self._keys:
+            raise ValueError(f"RegionPack: запись {key} уже добавлена")
+        self._keys.add(key)
+
+        offset = _align(self._pos)
+        if offset > self._pos:
+            self._f.write(b"\0" * (offset - self._pos))
+        self._f.write(data)
+        self._pos = offset + len(data)
+        self._entries.append((key[0], key[1], name_bytes, offset, len(data)))
+
+    def close(self) -> None:
+        if self._f is None:
+            return
+        index_offset = _align(self._pos)
+        self._f.write(b"\0" * (index_offset - self._pos))
+        for cx, cz, name_bytes, offset, length in self._entries:
+            self._f.write(_ENTRY.pack(cx, cz, name_bytes, offset, length))
+
+        self._f.seek(0)
+        self._f.write(_HEADER.pack(PACK_MAGIC, PACK_VERSION, self.scx, self.scz,
+                                   len(self._entries), index_offset))
+        self._f.close()
+        self._f = None
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self) -> None:
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+            self._tmp_path.unlink(missing_ok=True)
+
+    def __enter__(self) -> "RegionPackWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class RegionPackReader:
+    """
+    Читает .rpack через mmap: один open на весь регион, данные чанков
+    отдаются как memoryview / numpy-массивы поверх отображенной памяти.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._file = open(self.path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+
+        magic, version, scx, scz, count, index_offset = _HEADER.unpack_from(self._mm, 0)
+        if magic != PACK_MAGIC:
+            self.close()
+            raise ValueError(f"RegionPack: {self.path} не является файлом .rpack")
+        if version != PACK_VERSION:
+            self.close()
+            raise ValueError(f"RegionPack: неподдерживаемая версия {version}")
+
+        self.scx, self.scz = scx, scz
+        self._index: Dict[EntryKey, Tuple[int, int]] = {}
+        for i in range(count):
+            cx, cz, name_bytes, offset, length = _ENTRY.unpack_from(self._mm, index_offset + i * _ENTRY.size)
+            name = name_bytes.rstrip(b"\0").decode("utf-8")
+            self._index[(cx, cz, name)] = (offset, length)
+
+    def __contains__(self, key: EntryKey) -> bool:
+        return key in self._index
+
+    def chunks(self) -> List[Tuple[int, int]]:
+        return sorted({(cx, cz) for cx, cz, _ in self._index})
+
+    def names(self, cx: int, cz: int) -> List[str]:
+        return sorted(name for kcx, kcz, name in self._index if (kcx, kcz) == (cx, cz))
+
+    def entries(self) -> Iterator[Tuple[EntryKey, Tuple[int, int]]]:
+        return iter(self._index.items())
+
+    def get(self, cx: int, cz: int, name: str) -> memoryview:
+        """Срез файла чанка без копирования."""
+        offset, length = self._index[(cx, cz, name)]
+        return memoryview(self._mm)[offset:offset + length]
+
+    def read_bytes(self, cx: int, cz: int, name: str) -> bytes:
+        return bytes(self.get(cx, cz, name))
+
+    def read_array(self, cx: int, cz: int, name: str, dtype, shape=None) -> np.ndarray:
+        """numpy-массив поверх mmap (только чтение), например dtype='<u2' для r16."""
+        arr = np.frombuffer(self.get(cx, cz, name), dtype=np.dtype(dtype))
+        return arr.reshape(shape) if shape is not None else arr
+
+    def close(self) -> None:
+        # mmap нельзя закрыть, пока на него есть живые memoryview
+        if getattr(self, "_mm", None) is not None:
+            try:
+                self._mm.close()
+            except BufferError:
+                pass
+            self._mm = None
+        if getattr(self, "_file", None) is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> "RegionPackReader":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
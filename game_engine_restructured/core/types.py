@@ -5,6 +5,7 @@ from typing import Any, Dict, List, Protocol
 
 # Добавляем импорт HexGridSpec
 from .grid.hex import HexGridSpec
+from .utils.layers import ChunkLayers
 
 
 @dataclass
@@ -20,7 +21,7 @@ class GenResult:
     cell_size: float
 
     grid_spec: HexGridSpec | None = None
-    layers: Dict[str, Any] = field(default_factory=dict)
+    layers: ChunkLayers | None = None
     fields: Dict[str, Any] = field(default_factory=dict)
     ports: Dict[str, List[int]] = field(
         default_factory=lambda: {"N": [], "E": [], "S": [], "W": []}
@@ -0,0 +1,305 @@
+# ==============================================================================
+# Файл: game_engine_restructured/core/utils/cache.py
+# Назначение: Ограниченный по памяти LRU-кэш для чанков, регионов и текстур.
+#             Считает занятые байты, вытесняет самые старые записи, может
+#             сбрасывать вытесненное на диск и ведет счетчики попаданий.
+# ==============================================================================
+from __future__ import annotations
+import dataclasses
+import hashlib
+import os
+import pickle
+import shutil
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Iterable
+
+import numpy as np
+
+_MISSING = object()
+MB = 1024 * 1024
+
+# Лимиты по умолчанию (МБ); переопределяются через export.cache_limits_mb
+DEFAULT_CACHE_LIMITS_MB: Dict[str, float] = {
+    "chunks": 256,
+    "regions": 512,
+    "apron": 256,
+    "stamps": 128,
+}
+
+
+def cache_limit_bytes(export_cfg: Dict[str, Any] | None, name: str) -> int | None:
+    """Лимит кэша в байтах из настроек экспорта; 0 или None - без лимита."""
+    limits = dict(DEFAULT_CACHE_LIMITS_MB)
+    limits.update((export_cfg or {}).get("cache_limits_mb", {}) or {})
+    limit_mb = limits.get(name)
+    return int(float(limit_mb) * MB) if limit_mb else None
+
+
+def estimate_nbytes(value: Any, _depth: int = 0) -> int:
+    """
+    Грубая оценка памяти значения. Для numpy-массивов точная (nbytes),
+    контейнеры и dataclass'ы (GenResult, ChunkLayers) обходятся рекурсивно.
+    """
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if _depth > 4:
+        return sys.getsizeof(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            estimate_nbytes(k, _depth + 1) + estimate_nbytes(v, _depth + 1) for k, v in value.items()
+        )
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(estimate_nbytes(v, _depth + 1) for v in value)
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return sys.getsizeof(value) + sum(
+            estimate_nbytes(getattr(value, f.name), _depth + 1) for f in dataclasses.fields(value)
+        )
+    return sys.getsizeof(value)
+
+
+@dataclass
+class CacheStats:
+    """Снимок счетчиков кэша."""
+
+    name: str
+    items: int = 0
+    nbytes: int = 0
+    max_bytes: int | None = None
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    spills: int = 0
+    spill_hits: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def merged(self, other: "CacheStats") -> "CacheStats":
+        """Суммирует счетчики (например, кэшей одного типа из разных процессов)."""
+        return CacheStats(
+            name=self.name,
+            items=self.items + other.items,
+            nbytes=self.nbytes + other.nbytes,
+            max_bytes=self.max_bytes,
+            hits=self.hits + other.hits,
+            misses=self.misses + other.misses,
+            evictions=self.evictions + other.evictions,
+            spills=self.spills + other.spills,
+            spill_hits=self.spill_hits + other.spill_hits,
+        )
+
+    def format(self) -> str:
+        limit = f"{self.max_bytes / MB:.0f}" if self.max_bytes else "∞"
+        line = (f"{self.name}: {self.items} зап., {self.nbytes / MB:.1f}/{limit} МБ, "
+                f"попаданий {self.hits}, промахов {self.misses} ({self.hit_rate:.0%}), "
+                f"вытеснено {self.evictions}")
+        if self.spills or self.spill_hits:
+            line += f", на диск {self.spills}, с диска {self.spill_hits}"
+        return line
+
+
+class BoundedCache:
+    """
+    Потокобезопасный LRU-кэш с ограничением по байтам и/или числу записей.
+
+    Интерфейс повторяет нужную часть dict: get / [] / in / setdefault /
+    pop / len, поэтому заменяет обычные словари-кэши без правок вызывающего
+    кода. Если задан spill_dir, вытесненные записи сохраняются на диск
+    (pickle) и при следующем обращении поднимаются обратно в память.
+    Значения считаются неизменяемыми после помещения в кэш.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            max_bytes: int | None = None,
+            max_items: int | None = None,
+            spill_dir: str | Path | None = None,
+            sizeof: Callable[[Any], int] = estimate_nbytes,
+    ):
+        self.name = name
+        self.max_bytes = int(max_bytes) if max_bytes else None
+        self.max_items = int(max_items) if max_items else None
+        self.spill_dir = Path(spill_dir) if spill_dir else None
+        self._sizeof = sizeof
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+        self._spilled: Dict[Hashable, Path] = {}
+        self._nbytes = 0
+        self._lock = threading.RLock()
+        self._stats = CacheStats(name=name, max_bytes=self.max_bytes)
+
+    # --- Основной интерфейс ---
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is not _MISSING:
+                self._data.move_to_end(key)
+                self._stats.hits += 1
+                return value
+
+            value = self._load_spilled(key)
+            if value is _MISSING:
+                self._stats.misses += 1
+                return default
+            self._stats.hits += 1
+            self._stats.spill_hits += 1
+            self._insert(key, value)
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._insert(key, value)
+
+    def setdefault(self, key: Hashable, value: Any) -> Any:
+        with self._lock:
+            existing = self.get(key, _MISSING)
+            if existing is not _MISSING:
+                return existing
+            self._insert(key, value)
+            return value
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            value = self._data.pop(key, _MISSING)
+            if value is not _MISSING:
+                self._nbytes -= self._sizes.pop(key, 0)
+            spilled = self._load_spilled(key, remove=True, load=value is _MISSING)
+            if value is _MISSING:
+                value = spilled
+            return default if value is _MISSING else value
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._spilled):
+                self._load_spilled(key, remove=True, load=False)
+            self._data.clear()
+            self._sizes.clear()
+            self._nbytes = 0
+
+    def set_limits(self, max_bytes: int | None = None, max_items: int | None = None) -> None:
+        """Меняет лимиты уже созданного кэша; лишнее сразу вытесняется."""
+        with self._lock:
+            self.max_bytes = int(max_bytes) if max_bytes else None
+            self.max_items = int(max_items) if max_items else None
+            self._stats.max_bytes = self.max_bytes
+            self._evict(keep=_MISSING)
+
+    def close(self) -> None:
+        """Очищает кэш и удаляет его каталог выгрузки на диск."""
+        with self._lock:
+            self.clear()
+            if self.spill_dir is not None:
+                shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+    def keys(self) -> Iterable[Hashable]:
+        with self._lock:
+            return list(self._data.keys()) + [k for k in self._spilled if k not in self._data]
+
+    def __getitem__(self, key: Hashable) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        self.put(key, value)
+
+    def __contains__(self, key: Hashable) -> bool:
+        # Проверка наличия не считается обращением и не двигает LRU
+        with self._lock:
+            return key in self._data or key in self._spilled
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    @property
+    def nbytes(self) -> int:
+        return self._nbytes
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return dataclasses.replace(self._stats, items=len(self._data), nbytes=self._nbytes)
+
+    # --- Внутренняя кухня ---
+
+    def _insert(self, key: Hashable, value: Any) -> None:
+        if key in self._data:
+            self._nbytes -= self._sizes.pop(key, 0)
+            del self._data[key]
+        self._load_spilled(key, remove=True, load=False)
+
+        size = int(self._sizeof(value))
+        self._data[key] = value
+        self._sizes[key] = size
+        self._nbytes += size
+        self._evict(keep=key)
+
+    def _evict(self, keep: Hashable) -> None:
+        while self._data and self._over_limit():
+            oldest = next(iter(self._data))
+            if oldest == keep:
+                # Одна запись больше лимита - оставляем ее, иначе кэш бесполезен
+                break
+            value = self._data.pop(oldest)
+            self._nbytes -= self._sizes.pop(oldest, 0)
+            self._stats.evictions += 1
+            if self.spill_dir is not None:
+                self._spill(oldest, value)
+
+    def _over_limit(self) -> bool:
+        if self.max_bytes is not None and self._nbytes > self.max_bytes:
+            return True
+        if self.max_items is not None and len(self._data) > self.max_items:
+            return True
+        return False
+
+    def _spill_path(self, key: Hashable) -> Path:
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:20]
+        return self.spill_dir / f"{digest}.pkl"
+
+    def _spill(self, key: Hashable, value: Any) -> None:
+        path = self._spill_path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f"{path.stem}.{os.getpid()}.tmp")
+            with open(tmp_path, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+            self._spilled[key] = path
+            self._stats.spills += 1
+        except (OSError, pickle.PicklingError) as e:
+            print(f"!!! [Cache:{self.name}] Не удалось выгрузить запись {key!r} на диск: {e}")
+
+    def _load_spilled(self, key: Hashable, remove: bool = True, load: bool = True) -> Any:
+        path = self._spilled.pop(key, None) if remove else self._spilled.get(key)
+        if path is None:
+            return _MISSING
+        value = _MISSING
+        try:
+            if load:
+                with open(path, "rb") as f:
+                    value = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            print(f"!!! [Cache:{self.name}] Не удалось прочитать запись {key!r} с диска: {e}")
+        finally:
+            if remove:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        return value
+
+
+def format_cache_report(stats: Iterable[CacheStats]) -> str:
+    lines = ["[Cache] Итоги по кэшам:"]
+    lines.extend(f"  - {s.format()}" for s in stats)
+    return "\n".join(lines)
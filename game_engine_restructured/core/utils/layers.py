@@ -1,19 +1,64 @@
 # game_engine/core/utils/layers.py
 from __future__ import annotations
-from typing import Any, Dict
+from dataclasses import dataclass, fields
+from typing import Dict, Tuple
+
+import numpy as np
 
 # --- ИЗМЕНЕНИЕ: Импортируем весь модуль как const ---
 from .. import constants as const
 
+# Типы хранения слоев чанка. ID поверхностей и навигации укладываются в uint8
+# (см. constants.py), высота хранится в метрах как float32.
+LAYER_DTYPES: Dict[str, np.dtype] = {
+    "surface": np.dtype(const.SURFACE_DTYPE),
+    "navigation": np.dtype(const.NAV_DTYPE),
+    "overlay": np.dtype(np.uint8),
+    "height": np.dtype(np.float32),
+}
+
+
+@dataclass
+class ChunkLayers:
+    """
+    Типизированный контейнер слоев одного чанка. Все слои - 2D numpy-массивы
+    одинаковой формы (size x size), без промежуточных Python-списков.
+    """
+
+    surface: np.ndarray
+    navigation: np.ndarray
+    overlay: np.ndarray
+    height: np.ndarray
+
+    def __post_init__(self):
+        # Приводим к нужным типам (без копии, если тип уже совпадает)
+        for name, dtype in LAYER_DTYPES.items():
+            setattr(self, name, np.asarray(getattr(self, name), dtype=dtype))
+
+    @classmethod
+    def empty(cls, size: int) -> "ChunkLayers":
+        return cls(
+            surface=np.full((size, size), const.SURFACE_KIND_TO_ID[const.KIND_BASE_DIRT], dtype=LAYER_DTYPES["surface"]),
+            navigation=np.full((size, size), const.NAV_KIND_TO_ID[const.NAV_PASSABLE], dtype=LAYER_DTYPES["navigation"]),
+            overlay=np.zeros((size, size), dtype=LAYER_DTYPES["overlay"]),
+            height=np.zeros((size, size), dtype=LAYER_DTYPES["height"]),
+        )
+
+    @staticmethod
+    def names() -> Tuple[str, ...]:
+        return tuple(f.name for f in fields(ChunkLayers))
+
+    def set(self, name: str, grid: np.ndarray) -> None:
+        """Записывает КОПИЮ массива в слой, приводя его к типу слоя."""
+        setattr(self, name, np.array(grid, dtype=LAYER_DTYPES[name], copy=True))
+
+    @property
+    def size(self) -> int:
+        return int(self.height.shape[0])
+
 
-def make_empty_layers(size: int) -> Dict[str, Any]:
+def make_empty_layers(size: int) -> ChunkLayers:
     """
-    Создает пустой контейнер слоёв, теперь с 'overlay' слоем.
+    Создает пустой контейнер слоёв (surface/navigation/overlay/height).
     """
-    return {
-        # --- ИЗМЕНЕНИЕ: Используем новые константы ---
-        "surface": [[const.KIND_BASE_DIRT for _ in range(size)] for _ in range(size)],
-        "navigation": [[const.NAV_PASSABLE for _ in range(size)] for _ in range(size)],
-        "overlay": [[0 for _ in range(size)] for _ in range(size)],
-        "height_q": {"grid": [[0.0 for _ in range(size)] for _ in range(size)]},
-    }
+    return ChunkLayers.empty(size)
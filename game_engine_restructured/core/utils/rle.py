@@ -3,6 +3,8 @@
 from __future__ import annotations
 from typing import Any, Dict, List, Sequence
 
+import numpy as np
+
 
 def encode_rle_line(line: Sequence[Any]) -> List[List[Any]]:
     """Кодирует одну строку в RLE формат."""
@@ -27,6 +29,39 @@ def encode_rle_rows(grid: List[List[Any]]) -> Dict[str, Any]:
     return {"encoding": "rle_rows_v1", "rows": [encode_rle_line(row) for row in grid]}
 
 
+def encode_rle_rows_array(grid: np.ndarray) -> Dict[str, Any]:
+    """
+    То же, что encode_rle_rows, но для 2D numpy-массива: границы серий
+    ищутся векторно, без перевода сетки в списки.
+    """
+    grid = np.asarray(grid)
+    h, w = grid.shape
+    if w == 0:
+        return {"encoding": "rle_rows_v1", "rows": [[] for _ in range(h)]}
+
+    # Начало серии: первый столбец или смена значения относительно соседа слева
+    starts = np.ones((h, w), dtype=bool)
+    starts[:, 1:] = grid[:, 1:] != grid[:, :-1]
+    row_idx, col_idx = np.nonzero(starts)
+    values = grid[row_idx, col_idx].tolist()
+
+    # Длина серии = расстояние до следующего начала в той же строке (или до конца строки)
+    next_col = np.empty_like(col_idx)
+    next_col[:-1] = col_idx[1:]
+    row_ends = np.ones(len(row_idx), dtype=bool)
+    row_ends[:-1] = row_idx[1:] != row_idx[:-1]
+    next_col[row_ends] = w
+    runs = (next_col - col_idx).tolist()
+
+    counts = np.bincount(row_idx, minlength=h).tolist()
+    rows: List[List[List[Any]]] = []
+    pos = 0
+    for n in counts:
+        rows.append([[values[i], runs[i]] for i in range(pos, pos + n)])
+        pos += n
+    return {"encoding": "rle_rows_v1", "rows": rows}
+
+
 def decode_rle_rows(rows: List[List[List[Any]]]) -> List[List[Any]]:
     """Декодирует RLE-строки обратно в 2D-сетку."""
     grid: List[List[Any]] = []
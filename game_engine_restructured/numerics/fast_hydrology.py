@@ -1,9 +1,11 @@
 # Файл: game_engine_restructured/algorithms/hydrology/fast_hydrology.py
 from __future__ import annotations
 
-from typing import Tuple
+from contextlib import contextmanager
+from typing import Iterator, NamedTuple, Tuple
 
 import numpy as np
+import numba
 from numba import njit, prange
 
 # Кодирование направлений D8: 0=E, 1=NE, 2=N, 3=NW, 4=W, 5=SW, 6=S, 7=SE
@@ -11,9 +13,28 @@ D8_NEIGHBORS = np.array([
     [0, 1], [-1, 1], [-1, 0], [-1, -1],
     [0, -1], [1, -1], [1, 0], [1, 1]
 ], dtype=np.int8)
+# Длина шага к соседу (в клетках): 1 по осям, sqrt(2) по диагонали
+D8_DISTANCES = np.array([1.0, np.sqrt(2.0), 1.0, np.sqrt(2.0), 1.0, np.sqrt(2.0), 1.0, np.sqrt(2.0)], dtype=np.float32)
 
 
-@njit(cache=True, fastmath=True)
+@contextmanager
+def numba_threads(count: int | None) -> Iterator[int]:
+    """
+    Временно ограничивает число потоков параллельных ядер Numba.
+    count None/0 - без изменений. Отдает фактическое число потоков.
+    """
+    previous = numba.get_num_threads()
+    if not count or count <= 0:
+        yield previous
+        return
+    numba.set_num_threads(max(1, min(int(count), numba.config.NUMBA_NUM_THREADS)))
+    try:
+        yield numba.get_num_threads()
+    finally:
+        numba.set_num_threads(previous)
+
+
+@njit(cache=True, fastmath=True, parallel=True)
 def build_d8_flow_directions(heights: np.ndarray) -> np.ndarray:
     """
     Для каждой клетки находит направление наискорейшего спуска (D8).
@@ -39,6 +60,130 @@ def build_d8_flow_directions(heights: np.ndarray) -> np.ndarray:
     return dirs
 
 
+
+# --- Priority-flood (Barnes et al., 2014) с epsilon-заполнением ---
+# Очередь с приоритетом - двоичная куча на массивах: ключ (высота, порядковый
+# номер вставки), поэтому при равных высотах порядок обхода детерминирован.
+
+@njit(cache=True)
+def _heap_less(keys, order, a, b) -> bool:
+    if keys[a] < keys[b]:
+        return True
+    if keys[a] > keys[b]:
+        return False
+    return order[a] < order[b]
+
+
+@njit(cache=True)
+def _heap_swap(keys, order, cells, a, b) -> None:
+    keys[a], keys[b] = keys[b], keys[a]
+    order[a], order[b] = order[b], order[a]
+    cells[a], cells[b] = cells[b], cells[a]
+
+
+@njit(cache=True)
+def _heap_push(keys, order, cells, size, key, seq, cell) -> int:
+    i = size
+    keys[i] = key
+    order[i] = seq
+    cells[i] = cell
+    while i > 0:
+        parent = (i - 1) >> 1
+        if not _heap_less(keys, order, i, parent):
+            break
+        _heap_swap(keys, order, cells, i, parent)
+        i = parent
+    return size + 1
+
+
+@njit(cache=True)
+def _heap_pop(keys, order, cells, size) -> int:
+    """Удаляет вершину кучи (ее значения нужно прочитать заранее). Возвращает новый размер."""
+    size -= 1
+    if size > 0:
+        keys[0] = keys[size]
+        order[0] = order[size]
+        cells[0] = cells[size]
+        i = 0
+        while True:
+            left = 2 * i + 1
+            if left >= size:
+                break
+            child = left
+            if left + 1 < size and _heap_less(keys, order, left + 1, left):
+                child = left + 1
+            if not _heap_less(keys, order, child, i):
+                break
+            _heap_swap(keys, order, cells, i, child)
+            i = child
+    return size
+
+
+@njit(cache=True)
+def priority_flood_fill(heights: np.ndarray, epsilon: float = 0.0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Заполняет все бессточные впадины и одновременно строит маршруты стока D8.
+
+    Обход идет от краев карты (они считаются стоками) вглубь в порядке
+    возрастания высоты. Каждая впервые достигнутая клетка поднимается
+    минимум до высоты клетки, из которой ее достигли, плюс приращение, и
+    сток из нее направляется в эту клетку. Приращение равно epsilon, а при
+    epsilon <= 0 - минимальному шагу float32 (nextafter), поэтому на
+    заполненной поверхности у каждой внутренней клетки есть строго более
+    низкий сосед и плоских участков без стока не остается.
+
+    Возвращает (filled float32, flow_dirs int8). Кодирование направлений -
+    как у build_d8_flow_directions; -1 только у клеток края (выходы стока).
+    Сложность O(n log n).
+    """
+    h, w = heights.shape
+    n = h * w
+    filled = heights.astype(np.float32)
+    dirs = np.full((h, w), -1, dtype=np.int8)
+    closed = np.zeros((h, w), dtype=np.bool_)
+
+    keys = np.empty(n, dtype=np.float32)
+    order = np.empty(n, dtype=np.int64)
+    cells = np.empty(n, dtype=np.int64)
+    size = 0
+    seq = 0
+    eps = np.float32(epsilon)
+    inf = np.float32(np.inf)
+
+    # Засеваем очередь клетками края
+    for z in range(h):
+        for x in range(w):
+            if z == 0 or x == 0 or z == h - 1 or x == w - 1:
+                closed[z, x] = True
+                size = _heap_push(keys, order, cells, size, filled[z, x], seq, z * w + x)
+                seq += 1
+
+    while size > 0:
+        cell = cells[0]
+        level = keys[0]
+        size = _heap_pop(keys, order, cells, size)
+        z, x = cell // w, cell % w
+
+        if eps > 0.0:
+            min_next = level + eps
+        else:
+            min_next = np.nextafter(level, inf)
+
+        for i in range(8):
+            nz, nx = z + D8_NEIGHBORS[i, 0], x + D8_NEIGHBORS[i, 1]
+            if nz < 0 or nz >= h or nx < 0 or nx >= w or closed[nz, nx]:
+                continue
+            closed[nz, nx] = True
+            if filled[nz, nx] < min_next:
+                filled[nz, nx] = min_next
+            # Сосед стекает обратно в текущую клетку: противоположное направление
+            dirs[nz, nx] = (i + 4) % 8
+            size = _heap_push(keys, order, cells, size, filled[nz, nx], seq, nz * w + nx)
+            seq += 1
+
+    return filled, dirs
+
+
 @njit(cache=True, fastmath=True)
 def flow_accumulation_from_dirs(
         heights: np.ndarray, flow_dirs: np.ndarray
@@ -65,6 +210,513 @@ def flow_accumulation_from_dirs(
     return flow_map
 
 
+
+# --- Накопление потока за O(n): топологический порядок по входящим степеням ---
+
+# С какого размера сетки flow_accumulation() выбирает параллельный вариант
+PARALLEL_ACCUMULATION_MIN_CELLS = 2048 * 2048
+
+
+@njit(cache=True, parallel=True)
+def _flow_receivers(flow_dirs: np.ndarray) -> np.ndarray:
+    """Плоский индекс клетки-приемника для каждой клетки (-1 - сток/выход за край)."""
+    h, w = flow_dirs.shape
+    recv = np.full(h * w, -1, dtype=np.int64)
+    for z in prange(h):
+        for x in range(w):
+            d = flow_dirs[z, x]
+            if d >= 0:
+                nz, nx = z + D8_NEIGHBORS[d, 0], x + D8_NEIGHBORS[d, 1]
+                if 0 <= nz < h and 0 <= nx < w:
+                    recv[z * w + x] = nz * w + nx
+    return recv
+
+
+@njit(cache=True)
+def _accumulate_topological(flow_dirs: np.ndarray, initial: np.ndarray) -> np.ndarray:
+    """
+    Накопление потока без сортировки по высоте (алгоритм Кана).
+
+    Клетки без притоков (входящая степень 0) ставятся в очередь; каждая
+    извлеченная клетка отдает свой поток приемнику и уменьшает его входящую
+    степень. Сеть D8 - лес деревьев, поэтому каждая клетка обрабатывается
+    ровно один раз: O(n). Результат совпадает с flow_accumulation_from_dirs.
+    """
+    h, w = flow_dirs.shape
+    n = h * w
+    recv = _flow_receivers(flow_dirs)
+
+    indeg = np.zeros(n, dtype=np.int32)
+    for c in range(n):
+        r = recv[c]
+        if r >= 0:
+            indeg[r] += 1
+
+    queue = np.empty(n, dtype=np.int64)
+    tail = 0
+    for c in range(n):
+        if indeg[c] == 0:
+            queue[tail] = c
+            tail += 1
+
+    acc = initial.ravel().copy()
+    head = 0
+    while head < tail:
+        c = queue[head]
+        head += 1
+        r = recv[c]
+        if r >= 0:
+            acc[r] += acc[c]
+            indeg[r] -= 1
+            if indeg[r] == 0:
+                queue[tail] = r
+                tail += 1
+    return acc.reshape(h, w)
+
+
+@njit(cache=True, parallel=True)
+def _flow_accumulation_strips(flow_dirs: np.ndarray, n_strips: int, initial: np.ndarray) -> np.ndarray:
+    """
+    Параллельное накопление по горизонтальным полосам.
+
+    1. Каждая полоса независимо считает локальное накопление (Кан внутри
+       полосы), запоминает порядок обхода и для каждой клетки - "выход":
+       последнюю клетку ее пути внутри полосы, отдающую воду в другую полосу.
+    2. Последовательно решается маленький граф на границах полос: поток,
+       втекающий в клетку-вход, равен полному накоплению всех клеток-экспортеров,
+       стекающих в нее, а полное накопление экспортера - его локальному
+       плюс притоки входов, чей путь выходит через него.
+    3. Каждая полоса повторяет свой обход с весами 1 + приток на входах.
+    """
+    h, w = flow_dirs.shape
+    n = h * w
+    recv = _flow_receivers(flow_dirs)
+    n_strips = max(1, min(n_strips, h))
+    strip_h = (h + n_strips - 1) // n_strips
+    n_strips = (h + strip_h - 1) // strip_h
+
+    order = np.empty(n, dtype=np.int64)
+    exit_cell = np.full(n, -1, dtype=np.int64)
+    base = initial.ravel()
+    acc = base.copy()
+
+    # --- Проход 1: локальное накопление в полосах ---
+    for s in prange(n_strips):
+        lo = s * strip_h * w
+        hi = min(h, (s + 1) * strip_h) * w
+        indeg = np.zeros(hi - lo, dtype=np.int32)
+        for c in range(lo, hi):
+            r = recv[c]
+            if lo <= r < hi:
+                indeg[r - lo] += 1
+        tail = lo
+        for c in range(lo, hi):
+            if indeg[c - lo] == 0:
+                order[tail] = c
+                tail += 1
+        head = lo
+        while head < tail:
+            c = order[head]
+            head += 1
+            r = recv[c]
+            if lo <= r < hi:
+                acc[r] += acc[c]
+                indeg[r - lo] -= 1
+                if indeg[r - lo] == 0:
+                    order[tail] = r
+                    tail += 1
+        # Обратный обход: выход клетки = выход ее приемника
+        for k in range(hi - 1, lo - 1, -1):
+            c = order[k]
+            r = recv[c]
+            if r < 0:
+                exit_cell[c] = -1
+            elif r < lo or r >= hi:
+                exit_cell[c] = c
+            else:
+                exit_cell[c] = exit_cell[r]
+
+    # --- Проход 2: граф на границах полос (только первые/последние строки) ---
+    inflow = np.zeros(n, dtype=np.float32)      # приток в клетку-вход из других полос
+    through = np.zeros(n, dtype=np.float32)     # притоки входов, выходящие через экспортера
+    pend_entry = np.zeros(n, dtype=np.int32)    # сколько экспортеров еще не отдали поток во вход
+    pend_exit = np.zeros(n, dtype=np.int32)     # сколько входов еще не передали поток экспортеру
+
+    boundary_rows = np.empty(2 * n_strips, dtype=np.int64)
+    nb = 0
+    for s in range(n_strips):
+        z0 = s * strip_h
+        z1 = min(h, (s + 1) * strip_h) - 1
+        boundary_rows[nb] = z0
+        nb += 1
+        if z1 != z0:
+            boundary_rows[nb] = z1
+            nb += 1
+
+    for k in range(nb):
+        z = boundary_rows[k]
+        for x in range(w):
+            c = z * w + x
+            if exit_cell[c] == c:
+                pend_entry[recv[c]] += 1
+    for k in range(nb):
+        z = boundary_rows[k]
+        for x in range(w):
+            c = z * w + x
+            if pend_entry[c] > 0 and exit_cell[c] >= 0:
+                pend_exit[exit_cell[c]] += 1
+
+    stack = np.empty(2 * nb * w + 1, dtype=np.int64)
+    top = 0
+    for k in range(nb):
+        z = boundary_rows[k]
+        for x in range(w):
+            c = z * w + x
+            if exit_cell[c] == c and pend_exit[c] == 0:
+                stack[top] = c
+                top += 1
+    while top > 0:
+        top -= 1
+        x_cell = stack[top]
+        t = recv[x_cell]
+        inflow[t] += acc[x_cell] + through[x_cell]
+        pend_entry[t] -= 1
+        if pend_entry[t] == 0:
+            e = exit_cell[t]
+            if e >= 0:
+                through[e] += inflow[t]
+                pend_exit[e] -= 1
+                if pend_exit[e] == 0:
+                    stack[top] = e
+                    top += 1
+
+    # --- Проход 3: повторный обход полос с учетом притоков ---
+    for s in prange(n_strips):
+        lo = s * strip_h * w
+        hi = min(h, (s + 1) * strip_h) * w
+        for c in range(lo, hi):
+            acc[c] = base[c] + inflow[c]
+        for k in range(lo, hi):
+            c = order[k]
+            r = recv[c]
+            if lo <= r < hi:
+                acc[r] += acc[c]
+    return acc.reshape(h, w)
+
+
+def _initial_flow(flow_dirs: np.ndarray, weights: np.ndarray | None) -> np.ndarray:
+    if weights is None:
+        return np.ones(flow_dirs.shape, dtype=np.float32)
+    if weights.shape != flow_dirs.shape:
+        raise ValueError(f"weights {weights.shape} не совпадает с flow_dirs {flow_dirs.shape}")
+    return np.ascontiguousarray(weights, dtype=np.float32)
+
+
+def flow_accumulation_topological(flow_dirs: np.ndarray, weights: np.ndarray | None = None) -> np.ndarray:
+    """
+    Накопление потока за O(n). weights - собственный сток каждой клетки
+    (по умолчанию 1), например 1 + приток из-за границы региона.
+    """
+    return _accumulate_topological(flow_dirs, _initial_flow(flow_dirs, weights))
+
+
+def flow_accumulation_parallel(flow_dirs: np.ndarray, n_strips: int | None = None,
+                               weights: np.ndarray | None = None) -> np.ndarray:
+    """
+    Параллельный вариант flow_accumulation_topological для больших сеток.
+    По умолчанию по 4 полосы на поток Numba.
+    """
+    if n_strips is None:
+        n_strips = 4 * numba.get_num_threads()
+    return _flow_accumulation_strips(flow_dirs, int(n_strips), _initial_flow(flow_dirs, weights))
+
+
+def flow_accumulation(flow_dirs: np.ndarray, parallel: bool | None = None,
+                      weights: np.ndarray | None = None) -> np.ndarray:
+    """
+    Накопление потока по карте направлений D8. Параллельный вариант
+    выбирается для больших сеток, если Numba доступно больше одного потока.
+    """
+    if parallel is None:
+        parallel = numba.get_num_threads() > 1 and flow_dirs.size >= PARALLEL_ACCUMULATION_MIN_CELLS
+    if parallel:
+        return flow_accumulation_parallel(flow_dirs, weights=weights)
+    return flow_accumulation_topological(flow_dirs, weights)
+
+
+
+# --- Многонаправленный сток: D-infinity (Tarboton, 1997) и MFD (Freeman, 1991) ---
+# Все ядра направлений возвращают для MFD/D∞ веса (h, w, 8): доля стока
+# клетки в каждого из 8 соседей в кодировке D8_NEIGHBORS (сумма 1 или 0).
+
+# Фасеты D∞: (направление на соседа по оси, направление на диагональ, ac, af)
+DINF_FACETS = np.array([
+    [0, 1, 0, 1], [2, 1, 1, -1], [2, 3, 1, 1], [4, 3, 2, -1],
+    [4, 5, 2, 1], [6, 5, 3, -1], [6, 7, 3, 1], [0, 7, 4, -1],
+], dtype=np.int8)
+
+
+@njit(cache=True, fastmath=True, parallel=True)
+def dinf_flow_directions(heights: np.ndarray, cell_size: float = 1.0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Направление стока D∞: угол наибольшего уклона по 8 треугольным фасетам,
+    в радианах против часовой стрелки от востока (как D8: 0=E, pi/2=N).
+    Возвращает (angle, slope); angle = -1 у клеток без спуска.
+    """
+    h, w = heights.shape
+    angle = np.full((h, w), -1.0, dtype=np.float32)
+    slope = np.zeros((h, w), dtype=np.float32)
+    quarter = np.pi / 4.0
+    for z in prange(h):
+        for x in range(w):
+            e0 = heights[z, x]
+            best_s = 0.0
+            best_a = -1.0
+            for k in range(8):
+                d1, d2 = DINF_FACETS[k, 0], DINF_FACETS[k, 1]
+                z1, x1 = z + D8_NEIGHBORS[d1, 0], x + D8_NEIGHBORS[d1, 1]
+                z2, x2 = z + D8_NEIGHBORS[d2, 0], x + D8_NEIGHBORS[d2, 1]
+                if not (0 <= z1 < h and 0 <= x1 < w and 0 <= z2 < h and 0 <= x2 < w):
+                    continue
+                e1, e2 = heights[z1, x1], heights[z2, x2]
+                s1 = (e0 - e1) / cell_size
+                s2 = (e1 - e2) / cell_size
+                r = np.arctan2(s2, s1)
+                s = np.sqrt(s1 * s1 + s2 * s2)
+                if r < 0.0:
+                    r = 0.0
+                    s = s1
+                elif r > quarter:
+                    r = quarter
+                    s = (e0 - e2) / (cell_size * np.sqrt(2.0))
+                if s > best_s:
+                    best_s = s
+                    best_a = DINF_FACETS[k, 3] * r + DINF_FACETS[k, 2] * (np.pi / 2.0)
+            angle[z, x] = best_a
+            slope[z, x] = best_s
+    return angle, slope
+
+
+@njit(cache=True, fastmath=True, parallel=True)
+def dinf_flow_weights(angle: np.ndarray) -> np.ndarray:
+    """Раскладывает угол D∞ на доли стока в два соседних направления D8."""
+    h, w = angle.shape
+    weights = np.zeros((h, w, 8), dtype=np.float32)
+    quarter = np.pi / 4.0
+    for z in prange(h):
+        for x in range(w):
+            a = angle[z, x]
+            if a < 0.0:
+                continue
+            sector = int(a / quarter)
+            frac = (a - sector * quarter) / quarter
+            if sector >= 8:
+                sector, frac = 7, 1.0
+            weights[z, x, sector % 8] += 1.0 - frac
+            weights[z, x, (sector + 1) % 8] += frac
+    return weights
+
+
+@njit(cache=True, fastmath=True, parallel=True)
+def mfd_flow_weights(heights: np.ndarray, exponent: float = 1.1) -> np.ndarray:
+    """
+    MFD (Freeman): сток делится между всеми более низкими соседями
+    пропорционально tan(уклона)^exponent.
+    """
+    h, w = heights.shape
+    weights = np.zeros((h, w, 8), dtype=np.float32)
+    for z in prange(h):
+        for x in range(w):
+            e0 = heights[z, x]
+            total = 0.0
+            for i in range(8):
+                nz, nx = z + D8_NEIGHBORS[i, 0], x + D8_NEIGHBORS[i, 1]
+                if 0 <= nz < h and 0 <= nx < w:
+                    drop = e0 - heights[nz, nx]
+                    if drop > 0.0:
+                        v = (drop / D8_DISTANCES[i]) ** exponent
+                        weights[z, x, i] = v
+                        total += v
+            if total > 0.0:
+                for i in range(8):
+                    weights[z, x, i] /= total
+    return weights
+
+
+@njit(cache=True)
+def flow_accumulation_weighted(weights: np.ndarray) -> np.ndarray:
+    """
+    Накопление потока для многонаправленных весов (MFD, D∞) в
+    топологическом порядке: клетка отдает поток, когда получены все
+    притоки. Поток, уходящий за край карты, теряется.
+    """
+    h, w, _ = weights.shape
+    n = h * w
+    indeg = np.zeros(n, dtype=np.int32)
+    for z in range(h):
+        for x in range(w):
+            for i in range(8):
+                if weights[z, x, i] > 0.0:
+                    nz, nx = z + D8_NEIGHBORS[i, 0], x + D8_NEIGHBORS[i, 1]
+                    if 0 <= nz < h and 0 <= nx < w:
+                        indeg[nz * w + nx] += 1
+
+    queue = np.empty(n, dtype=np.int64)
+    tail = 0
+    for c in range(n):
+        if indeg[c] == 0:
+            queue[tail] = c
+            tail += 1
+
+    acc = np.ones(n, dtype=np.float32)
+    head = 0
+    while head < tail:
+        c = queue[head]
+        head += 1
+        z, x = c // w, c % w
+        for i in range(8):
+            frac = weights[z, x, i]
+            if frac > 0.0:
+                nz, nx = z + D8_NEIGHBORS[i, 0], x + D8_NEIGHBORS[i, 1]
+                if 0 <= nz < h and 0 <= nx < w:
+                    r = nz * w + nx
+                    acc[r] += acc[c] * frac
+                    indeg[r] -= 1
+                    if indeg[r] == 0:
+                        queue[tail] = r
+                        tail += 1
+    return acc.reshape(h, w)
+
+
+
+# --- Подбор порога рек за один проход (union-find) ---
+
+@njit(cache=True)
+def _uf_find(parent: np.ndarray, i: int) -> int:
+    # Поиск корня со сжатием пути вдвое
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+@njit(cache=True)
+def select_river_threshold(flow_map: np.ndarray, count_mask: np.ndarray, min_size: int,
+                           target: int) -> Tuple[float, int, int]:
+    """
+    Подбирает порог накопления для рек одним проходом.
+
+    Клетки с накоплением > 1 добавляются в порядке убывания накопления и
+    объединяются с уже добавленными 8-соседями (union-find); после каждого
+    уровня известны число сегментов маски flow >= уровень и число "длинных"
+    сегментов: не короче min_size клеток всего холста и задевающих
+    count_mask (например, ядро региона). Длина меряется так же, как при
+    последующем отсеве коротких сегментов по всему холсту. Возвращается
+    первый (самый высокий) уровень, на котором длинных сегментов не меньше
+    target, а если такого нет - уровень с наибольшим их числом.
+
+    Возвращает (порог, всего сегментов, длинных сегментов); маска рек -
+    flow_map >= порог. Если рек нет, порог = inf.
+    """
+    h, w = flow_map.shape
+    flat = flow_map.ravel()
+    counted = count_mask.ravel()
+    candidates = np.nonzero(flat > 1.0)[0]
+    if candidates.size == 0:
+        return np.inf, 0, 0
+    order = candidates[np.argsort(-flat[candidates])]
+
+    parent = np.full(h * w, -1, dtype=np.int64)
+    size = np.zeros(h * w, dtype=np.int64)
+    touches = np.zeros(h * w, dtype=np.bool_)
+    total = 0
+    long_count = 0
+    best_thr, best_total, best_long = np.inf, 0, -1
+
+    k = 0
+    m = order.size
+    while k < m:
+        level = flat[order[k]]
+        # Добавляем все клетки текущего уровня
+        while k < m and flat[order[k]] == level:
+            c = order[k]
+            k += 1
+            parent[c] = c
+            size[c] = 1
+            touches[c] = counted[c]
+            total += 1
+            if min_size <= 1 and touches[c]:
+                long_count += 1
+            z, x = c // w, c % w
+            for dz in range(-1, 2):
+                for dx in range(-1, 2):
+                    if dz == 0 and dx == 0:
+                        continue
+                    nz, nx = z + dz, x + dx
+                    if nz < 0 or nz >= h or nx < 0 or nx >= w:
+                        continue
+                    nb = nz * w + nx
+                    if parent[nb] < 0:
+                        continue
+                    ra = _uf_find(parent, c)
+                    rb = _uf_find(parent, nb)
+                    if ra == rb:
+                        continue
+                    if size[ra] < size[rb]:
+                        ra, rb = rb, ra
+                    was_long = ((1 if size[ra] >= min_size and touches[ra] else 0)
+                                + (1 if size[rb] >= min_size and touches[rb] else 0))
+                    parent[rb] = ra
+                    size[ra] += size[rb]
+                    touches[ra] = touches[ra] or touches[rb]
+                    total -= 1
+                    long_count += (1 if size[ra] >= min_size and touches[ra] else 0) - was_long
+
+        if long_count > best_long:
+            best_thr, best_total, best_long = level, total, long_count
+        if long_count >= target:
+            return level, total, long_count
+    return best_thr, best_total, max(best_long, 0)
+
+
+
+@njit(cache=True, fastmath=True)
+def river_band_distance(mask: np.ndarray, radius: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Точное евклидово расстояние до ближайшей клетки маски, но только в
+    полосе шириной radius вокруг нее; дальше - 1e9, как у
+    chamfer_distance_transform (с fastmath сравнения с inf не определены).
+    Обход идет от клеток маски по кругу радиуса radius, поэтому стоимость
+    пропорциональна длине рек, а не площади карты.
+
+    Возвращает (dist float32, source int64): source - плоский индекс
+    ближайшей клетки маски (-1 вне полосы).
+    """
+    h, w = mask.shape
+    dist = np.full((h, w), 1e9, dtype=np.float32)
+    source = np.full((h, w), -1, dtype=np.int64)
+    r2 = radius * radius
+    for z in range(h):
+        for x in range(w):
+            if not mask[z, x]:
+                continue
+            src = z * w + x
+            for dz in range(-radius, radius + 1):
+                nz = z + dz
+                if nz < 0 or nz >= h:
+                    continue
+                for dx in range(-radius, radius + 1):
+                    nx = x + dx
+                    d2 = dz * dz + dx * dx
+                    if nx < 0 or nx >= w or d2 > r2:
+                        continue
+                    d = np.sqrt(np.float32(d2))
+                    if d < dist[nz, nx]:
+                        dist[nz, nx] = d
+                        source[nz, nx] = src
+    return dist, source
+
+
 @njit(cache=True, fastmath=True, parallel=True)
 def chamfer_distance_transform(mask: np.ndarray) -> np.ndarray:
     """
@@ -95,31 +747,250 @@ def chamfer_distance_transform(mask: np.ndarray) -> np.ndarray:
     return dist
 
 
-@njit(cache=True)
-def label_connected_components(mask: np.ndarray) -> Tuple[np.ndarray, int]:
+# --- Точное евклидово расстояние (Felzenszwalb & Huttenlocher, 2012) ---
+
+EDT_NO_SOURCE = 1e9   # расстояние, если на карте нет ни одной клетки-источника
+_EDT_BIG = 1e20       # "бесконечность" для квадратов расстояний
+
+
+@njit(cache=True, fastmath=True)
+def _edt_1d(f: np.ndarray, n: int, out: np.ndarray, v: np.ndarray, zb: np.ndarray) -> None:
     """
-    Простой Numba-совместимый аналог scipy.ndimage.label для подсчета
-    связных компонентов (истоков рек).
+    Нижняя огибающая парабол: out[q] = min_p ((q - p)^2 + f[p]).
+    Клетки с f >= _EDT_BIG в огибающую не входят. Границы участков
+    огибающей тоже ограничены ±_EDT_BIG: под fastmath inf недопустим.
     """
+    k = -1
+    for q in range(n):
+        fq = f[q]
+        if fq >= _EDT_BIG:
+            continue
+        if k < 0:
+            k = 0
+            v[0] = q
+            zb[0] = -_EDT_BIG
+            zb[1] = _EDT_BIG
+            continue
+        while True:
+            p = v[k]
+            s = ((fq + q * q) - (f[p] + p * p)) / (2.0 * q - 2.0 * p)
+            if s <= zb[k]:
+                k -= 1
+            else:
+                break
+        k += 1
+        v[k] = q
+        zb[k] = s
+        zb[k + 1] = _EDT_BIG
+
+    if k < 0:
+        for q in range(n):
+            out[q] = _EDT_BIG
+        return
+
+    k = 0
+    for q in range(n):
+        while zb[k + 1] < q:
+            k += 1
+        p = v[k]
+        out[q] = (q - p) * (q - p) + f[p]
+
+
+@njit(cache=True, fastmath=True, parallel=True)
+def _edt_multi(masks: np.ndarray) -> np.ndarray:
+    m, h, w = masks.shape
+    sq = np.empty((m, h, w), dtype=np.float64)
+
+    # Проход 1: по строкам (все маски сразу, параллельно по строкам)
+    for t in prange(m * h):
+        k, z = t // h, t % h
+        f = np.empty(w, dtype=np.float64)
+        v = np.empty(w, dtype=np.int64)
+        zb = np.empty(w + 1, dtype=np.float64)
+        for x in range(w):
+            f[x] = 0.0 if masks[k, z, x] else _EDT_BIG
+        _edt_1d(f, w, sq[k, z], v, zb)
+
+    # Проход 2: по столбцам
+    out = np.empty((m, h, w), dtype=np.float32)
+    for t in prange(m * w):
+        k, x = t // w, t % w
+        f = np.empty(h, dtype=np.float64)
+        d = np.empty(h, dtype=np.float64)
+        v = np.empty(h, dtype=np.int64)
+        zb = np.empty(h + 1, dtype=np.float64)
+        for z in range(h):
+            f[z] = sq[k, z, x]
+        _edt_1d(f, h, d, v, zb)
+        for z in range(h):
+            out[k, z, x] = EDT_NO_SOURCE if d[z] >= _EDT_BIG else np.sqrt(d[z])
+    return out
+
+
+def euclidean_distance_transform_multi(masks: np.ndarray) -> np.ndarray:
+    """
+    Точное евклидово расстояние (в клетках) до ближайшей клетки True для
+    нескольких масок (k, h, w) за один вызов; строки и столбцы всех масок
+    обрабатываются параллельно. Там, где у маски нет ни одной клетки True,
+    результат равен EDT_NO_SOURCE (как у chamfer_distance_transform).
+    """
+    masks = np.ascontiguousarray(masks, dtype=np.bool_)
+    if masks.ndim != 3:
+        raise ValueError(f"Ожидается массив масок (k, h, w), получено {masks.shape}")
+    return _edt_multi(masks)
+
+
+def euclidean_distance_transform(mask: np.ndarray) -> np.ndarray:
+    """Точное евклидово расстояние до ближайшей клетки True (одна маска)."""
+    return euclidean_distance_transform_multi(np.asarray(mask)[np.newaxis])[0]
+
+
+# --- Разметка связных компонент: двухпроходный union-find по полосам ---
+
+class ComponentStats(NamedTuple):
+    """Статистика компонент; индекс - метка (строка 0 - фон, не заполняется)."""
+    sizes: np.ndarray      # (n+1,) int64 - число клеток
+    bboxes: np.ndarray     # (n+1, 4) int32 - z0, x0, z1, x1 (z1/x1 не включительно)
+    minima: np.ndarray     # (n+1,) float32 - минимум values по компоненте (inf без values)
+
+
+@njit(cache=True)
+def _uf_union_min(parent: np.ndarray, a: int, b: int) -> None:
+    # Корнем всегда становится меньший индекс, поэтому корень компоненты -
+    # ее первая клетка в порядке обхода строк
+    ra = _uf_find(parent, a)
+    rb = _uf_find(parent, b)
+    if ra < rb:
+        parent[rb] = ra
+    elif rb < ra:
+        parent[ra] = rb
+
+
+@njit(cache=True)
+def _uf_root(parent: np.ndarray, i: int) -> int:
+    # Поиск корня без записи (безопасен в параллельном цикле)
+    while parent[i] != i:
+        i = parent[i]
+    return i
+
+
+@njit(cache=True, parallel=True)
+def _label_components_strips(mask: np.ndarray, connectivity: int, n_strips: int,
+                             values: np.ndarray, has_values: bool):
     h, w = mask.shape
+    n = h * w
+    parent = np.full(n, -1, dtype=np.int64)
+    n_strips = max(1, min(n_strips, h))
+    strip_h = (h + n_strips - 1) // n_strips
+    n_strips = (h + strip_h - 1) // strip_h
+
+    # --- Проход 1: локальная разметка полос (каждая трогает только свои клетки) ---
+    for s in prange(n_strips):
+        z0 = s * strip_h
+        z1 = min(h, z0 + strip_h)
+        for z in range(z0, z1):
+            for x in range(w):
+                if not mask[z, x]:
+                    continue
+                c = z * w + x
+                parent[c] = c
+                if x > 0 and mask[z, x - 1]:
+                    _uf_union_min(parent, c, c - 1)
+                if z > z0:
+                    if mask[z - 1, x]:
+                        _uf_union_min(parent, c, c - w)
+                    if connectivity == 8:
+                        if x > 0 and mask[z - 1, x - 1]:
+                            _uf_union_min(parent, c, c - w - 1)
+                        if x + 1 < w and mask[z - 1, x + 1]:
+                            _uf_union_min(parent, c, c - w + 1)
+
+    # --- Проход 2: склейка по границам полос ---
+    for s in range(1, n_strips):
+        z = s * strip_h
+        for x in range(w):
+            if not mask[z, x]:
+                continue
+            c = z * w + x
+            if mask[z - 1, x]:
+                _uf_union_min(parent, c, c - w)
+            if connectivity == 8:
+                if x > 0 and mask[z - 1, x - 1]:
+                    _uf_union_min(parent, c, c - w - 1)
+                if x + 1 < w and mask[z - 1, x + 1]:
+                    _uf_union_min(parent, c, c - w + 1)
+
+    # Последовательные метки в порядке первого появления (как у scipy.ndimage.label)
+    root_label = np.zeros(n, dtype=np.int32)
+    count = 0
+    for c in range(n):
+        if parent[c] == c:
+            count += 1
+            root_label[c] = count
+
     labels = np.zeros((h, w), dtype=np.int32)
-    label_count = 0
+    for z in prange(h):
+        for x in range(w):
+            c = z * w + x
+            if parent[c] >= 0:
+                labels[z, x] = root_label[_uf_root(parent, c)]
 
+    # --- Статистика за один проход ---
+    sizes = np.zeros(count + 1, dtype=np.int64)
+    bboxes = np.zeros((count + 1, 4), dtype=np.int32)
+    minima = np.full(count + 1, np.inf, dtype=np.float32)
+    for k in range(1, count + 1):
+        bboxes[k, 0] = h
+        bboxes[k, 1] = w
     for z in range(h):
         for x in range(w):
-            if mask[z, x] and labels[z, x] == 0:
-                label_count += 1
-                q = [(z, x)]
-                labels[z, x] = label_count
-                head = 0
-                while head < len(q):
-                    cz, cx = q[head]
-                    head += 1
-                    for dz in range(-1, 2):
-                        for dx in range(-1, 2):
-                            if dz == 0 and dx == 0: continue
-                            nz, nx = cz + dz, cx + dx
-                            if 0 <= nz < h and 0 <= nx < w and mask[nz, nx] and labels[nz, nx] == 0:
-                                labels[nz, nx] = label_count
-                                q.append((nz, nx))
-    return labels, label_count
\ No newline at end of file
+            lab = labels[z, x]
+            if lab == 0:
+                continue
+            sizes[lab] += 1
+            if z < bboxes[lab, 0]: bboxes[lab, 0] = z
+            if x < bboxes[lab, 1]: bboxes[lab, 1] = x
+            if z + 1 > bboxes[lab, 2]: bboxes[lab, 2] = z + 1
+            if x + 1 > bboxes[lab, 3]: bboxes[lab, 3] = x + 1
+            if has_values and values[z, x] < minima[lab]:
+                minima[lab] = values[z, x]
+    return labels, count, sizes, bboxes, minima
+
+
+def label_components(
+        mask: np.ndarray,
+        connectivity: int = 8,
+        values: np.ndarray | None = None,
+        n_strips: int | None = None,
+) -> Tuple[np.ndarray, int, ComponentStats]:
+    """
+    Разметка связных компонент маски (аналог scipy.ndimage.label).
+
+    Полосы строк размечаются параллельно union-find'ом, затем склеиваются
+    по границам. Метки идут подряд в порядке первого появления при обходе
+    строк. Вместе с метками возвращаются размеры, рамки и (если переданы
+    values) минимумы values по каждой компоненте.
+    """
+    if connectivity not in (4, 8):
+        raise ValueError(f"connectivity должна быть 4 или 8, получено {connectivity}")
+    if n_strips is None:
+        n_strips = 4 * numba.get_num_threads()
+    mask = np.ascontiguousarray(mask, dtype=np.bool_)
+    has_values = values is not None
+    if has_values:
+        values = np.ascontiguousarray(values, dtype=np.float32)
+    else:
+        values = np.zeros((1, 1), dtype=np.float32)
+    labels, count, sizes, bboxes, minima = _label_components_strips(
+        mask, int(connectivity), int(n_strips), values, has_values
+    )
+    return labels, int(count), ComponentStats(sizes, bboxes, minima)
+
+
+def label_connected_components(mask: np.ndarray) -> Tuple[np.ndarray, int]:
+    """
+    Простой аналог scipy.ndimage.label (8-связность) для подсчета
+    связных компонентов (истоков рек).
+    """
+    labels, count, _ = label_components(mask, connectivity=8)
+    return labels, count
@@ -0,0 +1,137 @@
+# ==============================================================================
+# Файл: game_engine_restructured/numerics/hydrology_bench.py
+# Назначение: Замер ядер гидрологии: накопление потока на одной и той же
+#             карте D8 и ядра направлений стока (D8, D∞, MFD) при разном
+#             числе потоков.
+# Запуск: python -m game_engine_restructured.numerics.hydrology_bench --size 4096 --threads 1,8
+# ==============================================================================
+from __future__ import annotations
+import argparse
+import time
+from typing import Callable, Dict, List
+
+import numba
+import numpy as np
+
+from .fast_hydrology import (
+    build_d8_flow_directions, dinf_flow_directions, dinf_flow_weights,
+    flow_accumulation_from_dirs, flow_accumulation_parallel,
+    flow_accumulation_topological, flow_accumulation_weighted,
+    mfd_flow_weights, numba_threads, priority_flood_fill,
+)
+
+
+def make_test_heights(size: int, seed: int = 0) -> np.ndarray:
+    """Гладкий шумовой рельеф с наклоном, чтобы сток был похож на настоящий."""
+    rng = np.random.default_rng(seed)
+    coarse = rng.random((size // 64 + 2, size // 64 + 2)).astype(np.float32)
+    # Билинейное увеличение грубой сетки + мелкий шум
+    zi = np.linspace(0, coarse.shape[0] - 1.001, size, dtype=np.float32)
+    xi = np.linspace(0, coarse.shape[1] - 1.001, size, dtype=np.float32)
+    z0, x0 = zi.astype(np.int64), xi.astype(np.int64)
+    fz, fx = (zi - z0)[:, None], (xi - x0)[None, :]
+    a = coarse[z0][:, x0]
+    b = coarse[z0][:, x0 + 1]
+    c = coarse[z0 + 1][:, x0]
+    d = coarse[z0 + 1][:, x0 + 1]
+    smooth = (a * (1 - fx) + b * fx) * (1 - fz) + (c * (1 - fx) + d * fx) * fz
+    tilt = np.linspace(0.0, 0.5, size, dtype=np.float32)[None, :]
+    return (smooth * 1000.0 + tilt * 1000.0 + rng.random((size, size), dtype=np.float32)).astype(np.float32)
+
+
+def _time_kernel(fn: Callable[[], np.ndarray], repeats: int) -> tuple[float, np.ndarray]:
+    result = fn()  # прогрев (компиляция Numba)
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def run_benchmark(size: int, repeats: int = 3, fill: bool = True, seed: int = 0) -> List[Dict[str, float]]:
+    heights = make_test_heights(size, seed)
+    if fill:
+        heights, flow_dirs = priority_flood_fill(heights, 0.0)
+    else:
+        flow_dirs = build_d8_flow_directions(heights)
+
+    kernels = {
+        "argsort (flow_accumulation_from_dirs)": lambda: flow_accumulation_from_dirs(heights, flow_dirs),
+        "topological": lambda: flow_accumulation_topological(flow_dirs),
+        "parallel strips": lambda: flow_accumulation_parallel(flow_dirs),
+    }
+
+    rows: List[Dict[str, float]] = []
+    reference = None
+    for name, fn in kernels.items():
+        elapsed, acc = _time_kernel(fn, repeats)
+        if reference is None:
+            reference = acc
+        rows.append({
+            "kernel": name,
+            "ms": elapsed * 1000.0,
+            "max_abs_diff": float(np.max(np.abs(acc - reference))),
+        })
+    return rows
+
+
+def run_direction_benchmark(size: int, thread_counts: List[int], repeats: int = 3,
+                            seed: int = 0) -> List[Dict[str, float]]:
+    """
+    Ядра направлений стока при разном числе потоков. Ускорение считается
+    относительно первого значения thread_counts (обычно 1 поток - прежнее
+    поведение build_d8_flow_directions без parallel=True).
+    """
+    heights, _ = priority_flood_fill(make_test_heights(size, seed), 0.0)
+    kernels = {
+        "d8": lambda: build_d8_flow_directions(heights),
+        "dinf": lambda: dinf_flow_weights(dinf_flow_directions(heights, 1.0)[0]),
+        "mfd": lambda: mfd_flow_weights(heights, 1.1),
+    }
+
+    rows: List[Dict[str, float]] = []
+    for name, fn in kernels.items():
+        base = None
+        for threads in thread_counts:
+            with numba_threads(threads) as actual:
+                elapsed, _ = _time_kernel(fn, repeats)
+            base = base or elapsed
+            rows.append({"kernel": name, "threads": actual, "ms": elapsed * 1000.0, "speedup": base / elapsed})
+
+    # Накопление для многонаправленных весов (последовательное)
+    for name, weights in (("accumulate dinf", kernels["dinf"]()), ("accumulate mfd", kernels["mfd"]())):
+        elapsed, _ = _time_kernel(lambda: flow_accumulation_weighted(weights), repeats)
+        rows.append({"kernel": name, "threads": 1, "ms": elapsed * 1000.0, "speedup": 1.0})
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Сравнение ядер гидрологии")
+    parser.add_argument("--size", type=int, default=2048)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--threads", type=str, default="",
+                        help="список чисел потоков Numba через запятую, например 1,4,8")
+    parser.add_argument("--suite", choices=("accumulation", "directions", "all"), default="all")
+    parser.add_argument("--no-fill", action="store_true", help="D8 по исходному рельефу, без заполнения впадин")
+    args = parser.parse_args()
+
+    thread_counts = [int(t) for t in args.threads.split(",") if t.strip()] or [1, numba.get_num_threads()]
+    thread_counts = list(dict.fromkeys(thread_counts))
+    print(f"[Bench] Сетка {args.size}x{args.size}, потоков Numba доступно: {numba.config.NUMBA_NUM_THREADS}")
+
+    if args.suite in ("accumulation", "all"):
+        print("[Bench] Накопление потока:")
+        with numba_threads(thread_counts[-1]):
+            rows = run_benchmark(args.size, args.repeats, fill=not args.no_fill)
+        for row in rows:
+            print(f"  - {row['kernel']:<40} {row['ms']:9.1f} мс   расхождение: {row['max_abs_diff']:g}")
+
+    if args.suite in ("directions", "all"):
+        print("[Bench] Направления стока:")
+        for row in run_direction_benchmark(args.size, thread_counts, args.repeats):
+            print(f"  - {row['kernel']:<20} потоков {row['threads']:<3} {row['ms']:9.1f} мс   x{row['speedup']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
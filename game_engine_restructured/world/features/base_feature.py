@@ -11,9 +11,9 @@ class FeatureBrush:
         self.result = result
         self.preset = preset
         # --- Получаем доступ ко всем нужным слоям ---
-        self.surface_grid = result.layers["surface"]
-        self.nav_grid = result.layers["navigation"]
-        self.overlay_grid = result.layers["overlay"]  # <--- ВОТ ЭТА СТРОКА
+        self.surface_grid = result.layers.surface
+        self.nav_grid = result.layers.navigation
+        self.overlay_grid = result.layers.overlay
         self.size = len(self.surface_grid)
 
     def apply(self, **kwargs):
@@ -42,10 +42,10 @@ def build_local_roads(result: GenResult, region: Region, preset: Preset) -> None
     if len(local_waypoints) < 2:
         return
 
-    surface_grid = result.layers["surface"]
-    nav_grid = result.layers["navigation"]
-    overlay_grid = result.layers["overlay"]
-    height_grid = result.layers["height_q"]["grid"]
+    surface_grid = result.layers.surface
+    nav_grid = result.layers.navigation
+    overlay_grid = result.layers.overlay
+    height_grid = result.layers.height
 
     policy = make_road_policy(
         allow_slopes=True, allow_water_as_bridge=True, water_bridge_cost=15.0
@@ -2,6 +2,8 @@
 from __future__ import annotations
 from typing import List, Dict, Any, Tuple
 from ..core.grid.hex import HexGridSpec
+from ..core.types import GenResult
+from ..core.utils.layers import ChunkLayers, LAYER_DTYPES
 import numpy as np
 
 
@@ -19,26 +21,20 @@ def _stitch_layers(
     base_cx, base_cz = min(all_cx), min(all_cz)
 
     stitched_layers = {
-        name: np.zeros(
-            (region_pixel_size, region_pixel_size),
-            dtype=object if name in ["surface", "navigation"] else np.float32,
-        )
+        name: np.zeros((region_pixel_size, region_pixel_size), dtype=LAYER_DTYPES[name])
         for name in layer_names
     }
 
     for (cx, cz), chunk_data in base_chunks.items():
+        if chunk_data.layers is None:
+            continue
         start_x = (cx - base_cx) * chunk_size
         start_y = (cz - base_cz) * chunk_size
 
         for name in layer_names:
-            source_data = chunk_data.layers.get(name) or chunk_data.layers.get(
-                f"{name}_q", {}
-            ).get("grid")
-            if source_data:
-                grid = np.array(source_data)
-                stitched_layers[name][
-                    start_y: start_y + chunk_size, start_x: start_x + chunk_size
-                ] = grid
+            stitched_layers[name][
+                start_y: start_y + chunk_size, start_x: start_x + chunk_size
+            ] = getattr(chunk_data.layers, name)
 
     return stitched_layers, (base_cx, base_cz)
 
@@ -52,24 +48,22 @@ def _apply_changes_to_chunks(
 ):
     """
     Нарезает измененные слои обратно в объекты чанков.
-    ВЕРСИЯ 2.1: Присваивает КОПИЮ среза, чтобы избежать ошибок с памятью.
+    ВЕРСИЯ 3.0: Слои чанка - типизированные массивы ChunkLayers, срез
+    копируется сразу в нужный тип, без .tolist().
     """
+    layer_names = [name for name in stitched_layers if name in LAYER_DTYPES]
     for (cx, cz), chunk in base_chunks.items():
         start_x = (cx - base_cx) * chunk_size
         start_y = (cz - base_cz) * chunk_size
+        if chunk.layers is None:
+            chunk.layers = ChunkLayers.empty(chunk_size)
 
-        for name, grid in stitched_layers.items():
-            sub_grid = grid[
+        for name in layer_names:
+            sub_grid = stitched_layers[name][
                 start_y: start_y + chunk_size, start_x: start_x + chunk_size
             ]
-
-            # --- ГЛАВНОЕ ИСПРАВЛЕНИЕ ---
-            if name == 'height':
-                # Высоту оставляем списком для совместимости
-                chunk.layers["height_q"]["grid"] = sub_grid.tolist()
-            elif name in chunk.layers:
-                # Напрямую присваиваем КОПИЮ NumPy-среза.
-                chunk.layers[name] = sub_grid.copy() # <--- ДОБАВЛЕНО .copy()
+            # Присваиваем КОПИЮ среза, чтобы не держать ссылку на весь холст
+            chunk.layers.set(name, sub_grid)
 
 
 def region_key(cx: int, cz: int, region_size: int) -> Tuple[int, int]:
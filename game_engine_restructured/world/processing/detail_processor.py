@@ -45,9 +45,9 @@ class DetailProcessor:
         #         print(f"  -> Generating server hex map for chunk ({chunk.cx},{chunk.cz})...")
         #     chunk.hex_map_data = generate_hex_map_from_pixels(
         #         chunk.grid_spec,
-        #         chunk.layers["surface"],
-        #         chunk.layers["navigation"],
-        #         chunk.layers["height_q"]["grid"]
+        #         chunk.layers.surface,
+        #         chunk.layers.navigation,
+        #         chunk.layers.height
         #     )
 
         chunk.capabilities["has_biomes"] = True
@@ -0,0 +1,180 @@
+# ==============================================================================
+# Файл: game_engine_restructured/world/processing/drainage_graph.py
+# Назначение: Грубый граф стока для всей загружаемой области мира. Задает
+#             каждому региону приток воды через его границу, чтобы реки
+#             соседних регионов совпадали без расширения "фартука".
+# ==============================================================================
+from __future__ import annotations
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from ...algorithms.terrain.terrain import run_elevation_pipeline
+from ...numerics.fast_hydrology import (
+    D8_NEIGHBORS, flow_accumulation_topological, priority_flood_fill,
+)
+from .stage_checkpoints import stage_key
+
+
+@dataclass
+class BoundaryFlow:
+    """Сток через границу расширенного холста региона (в пикселях площади)."""
+    inflow: np.ndarray      # (ext, ext) float32 - приток, добавляемый к собственному стоку клеток
+    inflow_total: float     # сколько воды входит в холст извне
+    outflow_total: float    # сколько воды граф выводит из холста наружу
+
+
+class DrainageGraph:
+    """
+    Рельеф области [-radius, radius] регионов (плюс один чанк "фартука")
+    считается с шагом coarse_px пикселей, впадины заполняются, строятся
+    направления D8 и накопление. Граф детерминирован (сид + настройки
+    рельефа), поэтому все процессы и все регионы видят один и тот же сток.
+
+    Для региона граф сообщает, сколько воды втекает в его расширенный
+    холст из соседних грубых клеток; этот приток добавляется в самую
+    низкую точку соответствующей грубой клетки внутри холста.
+    """
+
+    def __init__(self, heights: np.ndarray, flow_dirs: np.ndarray, accumulation: np.ndarray,
+                 origin_px: int, coarse_px: int):
+        self.heights = heights
+        self.flow_dirs = flow_dirs
+        self.accumulation = accumulation
+        self.origin_px = int(origin_px)
+        self.coarse_px = int(coarse_px)
+
+    # --- Построение ---
+
+    @classmethod
+    def build(cls, seed: int, preset: Any, radius_regions: int, cells_per_chunk: int = 4) -> "DrainageGraph":
+        chunk_size = int(preset.size)
+        region_size = int(preset.region_size)
+        coarse_px = max(1, chunk_size // max(1, int(cells_per_chunk)))
+        if chunk_size % coarse_px:
+            raise ValueError(f"DrainageGraph: размер чанка {chunk_size} не делится на шаг {coarse_px}")
+
+        cfg = getattr(preset, "elevation", {})
+        # Область: регионы [-radius, radius] и по чанку "фартука" с каждой стороны
+        origin_px = (-radius_regions * region_size - 1) * chunk_size
+        side_px = ((2 * radius_regions + 1) * region_size + 2) * chunk_size
+        n = side_px // coarse_px
+
+        # Рельеф берется в центрах грубых клеток
+        centers = origin_px + (np.arange(n, dtype=np.float32) + 0.5) * coarse_px - 0.5
+        x_coords, z_coords = np.meshgrid(centers, centers)
+        heights = run_elevation_pipeline(cfg.get("pipeline", []), x_coords, z_coords,
+                                float(getattr(preset, "cell_size", 1.0)), seed, verbose=False)
+        heights = (heights + float(cfg.get("base_height_m", 0.0))).astype(np.float32)
+
+        _, flow_dirs = priority_flood_fill(heights, 0.0)
+        # Накопление в пикселях площади: грубая клетка = coarse_px^2 пикселей
+        weights = np.full(heights.shape, float(coarse_px * coarse_px), dtype=np.float32)
+        accumulation = flow_accumulation_topological(flow_dirs, weights)
+        print(f"  -> [Drainage] Граф стока {n}x{n} (шаг {coarse_px} px, радиус {radius_regions} рег.) построен.")
+        return cls(heights, flow_dirs, accumulation, origin_px, coarse_px)
+
+    @classmethod
+    def load_or_build(cls, cache_dir: Path, seed: int, preset: Any, radius_regions: int,
+                      cells_per_chunk: int = 4) -> "DrainageGraph":
+        """Граф кэшируется на диске, чтобы процессы-воркеры не строили его заново."""
+        key = stage_key(
+            None, "drainage_graph",
+            seed=seed, chunk_size=preset.size, region_size=preset.region_size, cell_size=preset.cell_size,
+            elevation=getattr(preset, "elevation", {}), radius=radius_regions, cells_per_chunk=cells_per_chunk,
+        )
+        path = Path(cache_dir) / f"graph_{key}.npz"
+        if path.exists():
+            try:
+                with np.load(path, allow_pickle=False) as data:
+                    return cls(data["heights"], data["flow_dirs"], data["accumulation"],
+                               int(data["origin_px"]), int(data["coarse_px"]))
+            except (OSError, ValueError, KeyError) as e:
+                print(f"!!! [Drainage] Не удалось прочитать {path}: {e}. Граф будет построен заново.")
+
+        graph = cls.build(seed, preset, radius_regions, cells_per_chunk)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.stem}.{os.getpid()}.tmp")
+        try:
+            with open(tmp_path, "wb") as f:
+                np.savez(f, heights=graph.heights, flow_dirs=graph.flow_dirs, accumulation=graph.accumulation,
+                         origin_px=np.int64(graph.origin_px), coarse_px=np.int64(graph.coarse_px))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"!!! [Drainage] Не удалось сохранить {path}: {e}")
+        return graph
+
+    # --- Запросы для региона ---
+
+    def boundary_flow(self, scx: int, scz: int, region_size: int, chunk_size: int,
+                      heights_ext: np.ndarray) -> Optional[BoundaryFlow]:
+        """
+        Приток в расширенный холст региона ((region_size + 2) * chunk_size).
+        None, если холст не целиком внутри области графа.
+        """
+        cp = self.coarse_px
+        ext_size = (region_size + 2) * chunk_size
+        gx0 = (scx * region_size - 1) * chunk_size - self.origin_px
+        gz0 = (scz * region_size - 1) * chunk_size - self.origin_px
+        n = self.heights.shape[0]
+        i0, j0 = gz0 // cp, gx0 // cp
+        cells = ext_size // cp
+        if i0 < 0 or j0 < 0 or i0 + cells > n or j0 + cells > n:
+            return None
+
+        inflow = np.zeros((ext_size, ext_size), dtype=np.float32)
+        inflow_total = 0.0
+        outflow_total = 0.0
+
+        def inside(i: int, j: int) -> bool:
+            return i0 <= i < i0 + cells and j0 <= j < j0 + cells
+
+        # Приток считается только по воде, которая еще не проходила через холст:
+        # клетки холста - стоки с нулевым собственным стоком. Иначе вода,
+        # вышедшая из холста и вернувшаяся, была бы учтена второй раз.
+        cut_dirs = self.flow_dirs.copy()
+        cut_dirs[i0:i0 + cells, j0:j0 + cells] = -1
+        weights = np.full(cut_dirs.shape, float(cp * cp), dtype=np.float32)
+        weights[i0:i0 + cells, j0:j0 + cells] = 0.0
+        outside_accumulation = flow_accumulation_topological(cut_dirs, weights)
+
+        # Кандидаты - только кольцо грубых клеток вокруг холста и его крайние клетки
+        for i in range(i0 - 1, i0 + cells + 1):
+            for j in range(j0 - 1, j0 + cells + 1):
+                if not (0 <= i < n and 0 <= j < n):
+                    continue
+                on_ring = not inside(i, j)
+                on_edge = inside(i, j) and (i in (i0, i0 + cells - 1) or j in (j0, j0 + cells - 1))
+                if not (on_ring or on_edge):
+                    continue
+                d = self.flow_dirs[i, j]
+                if d < 0:
+                    continue
+                ri, rj = i + int(D8_NEIGHBORS[d, 0]), j + int(D8_NEIGHBORS[d, 1])
+                if on_ring and inside(ri, rj):
+                    amount = float(outside_accumulation[i, j])
+                    # Вода входит в холст: кладем ее в самую низкую точку грубой клетки-приемника
+                    bz, bx = (ri - i0) * cp, (rj - j0) * cp
+                    block = heights_ext[bz:bz + cp, bx:bx + cp]
+                    lz, lx = np.unravel_index(int(np.argmin(block)), block.shape)
+                    inflow[bz + lz, bx + lx] += amount
+                    inflow_total += amount
+                elif on_edge and not inside(ri, rj):
+                    outflow_total += float(self.accumulation[i, j])
+
+        return BoundaryFlow(inflow, inflow_total, outflow_total)
+
+
+def drainage_settings(preset: Any) -> Dict[str, Any]:
+    """Настройки графа из water.river.drainage_graph (выключен по умолчанию)."""
+    river_cfg = getattr(preset, "water", {}).get("river", {})
+    cfg = dict(river_cfg.get("drainage_graph", {}) or {})
+    radius = cfg.get("radius_regions")
+    return {
+        "enabled": bool(cfg.get("enabled", False)) and bool(river_cfg.get("enabled", False)),
+        "radius_regions": int(radius if radius is not None else getattr(preset, "initial_load_radius", 1) + 1),
+        "cells_per_chunk": int(cfg.get("cells_per_chunk", 4)),
+    }
@@ -4,6 +4,7 @@
 # ВЕРСИЯ 3.1: Исправлена логика получения 3D-координат для климата.
 # ==============================================================================
 from __future__ import annotations
+import os
 import time
 from pathlib import Path
 from typing import Dict, Tuple, Any
@@ -15,13 +16,18 @@ from ...core import constants as const
 from ...core.preset import Preset
 from ...core.types import GenResult
 from ...core.export import write_raw_regional_layers
+from ...core.utils.cache import BoundedCache, cache_limit_bytes
 
 # --- Утилиты и Аналитика ---
 from ..grid_utils import _apply_changes_to_chunks, region_base
 from ..analytics.region_analysis import RegionAnalysis
+from .stage_checkpoints import StageCheckpoints, file_fingerprint, stage_key
+from .drainage_graph import DrainageGraph, drainage_settings
 
 # --- "Специалисты" по генерации ---
 from ...algorithms.terrain.terrain import generate_elevation_region
+from ...algorithms.terrain.tile_store import ApronTileStore
+from ...algorithms.terrain.steps.stamping import configure_stamp_cache
 from ...algorithms.surfaces import classify_initial_terrain, apply_slope_textures, apply_beach_sand
 from ...algorithms.hydrology import apply_sea_level, generate_highland_lakes, generate_rivers
 
@@ -29,8 +35,11 @@ from ...algorithms.hydrology import apply_sea_level, generate_highland_lakes, ge
 from generator_logic.climate import global_models, biome_matcher
 # --- ГЛАВНЫЙ ИМПОРТ НОВОЙ МОДЕЛИ ---
 from generator_logic.climate.climate_model import generate_climate_maps
-# --- Импортируем функцию для корректного расчета 3D-координат ---
-from editor.logic.preview_logic import _generate_world_input
+# --- Расчет 3D-координат региона на сфере (без зависимостей от редактора) ---
+from ..sphere_coords import region_sphere_coords
+
+
+BIOMES_PATH = Path(__file__).parent.parent.parent / "data" / "biomes.json"
 
 
 class RegionProcessor:
@@ -38,22 +47,42 @@ class RegionProcessor:
         self.preset = preset
         self.world_seed = world_seed
         self.artifacts_root = artifacts_root
-        self.processed_region_cache: Dict[Tuple[int, int], Dict[str, np.ndarray]] = {}
-
-    def _prepare_context_for_coords(self, scx: int, scz: int, resolution: int, cell_size: float) -> Tuple[Dict, int]:
-        """Вспомогательная функция для создания временного контекста для расчета координат."""
-        world_side_m = resolution * cell_size
-        x_meters = np.linspace(-world_side_m / 2.0, world_side_m / 2.0, resolution, dtype=np.float32)
-        z_meters = np.linspace(-world_side_m / 2.0, world_side_m / 2.0, resolution, dtype=np.float32)
-        x_coords, z_coords = np.meshgrid(x_meters, z_meters)
-
-        context = {
-            'WORLD_SIZE_METERS': world_side_m,
-            'x_coords': x_coords,
-            'z_coords': z_coords,
-            'current_world_offset': self._get_world_offset_for_region(scx, scz)
-        }
-        return context, resolution
+        world_raw_path = self.artifacts_root / "world_raw" / str(self.world_seed)
+        # Ядра обработанных регионов нужны соседям для проверки швов.
+        # Кэш ограничен; вытесненные ядра уходят на диск (у каждого процесса свой каталог).
+        self._spill_root = world_raw_path / "cache_spill" / str(os.getpid())
+        self.processed_region_cache = BoundedCache(
+            "regions",
+            max_bytes=cache_limit_bytes(preset.export, "regions"),
+            spill_dir=self._spill_root / "regions",
+        )
+        # Кэш штампов общий на процесс, лимит берется из этого пресета
+        configure_stamp_cache(preset.export)
+        # Общие тайлы "фартука": соседние регионы (в т.ч. из других процессов)
+        # берут уже посчитанные тайлы высот отсюда.
+        self.apron_store = ApronTileStore(
+            world_raw_path / "apron_tiles", max_bytes=cache_limit_bytes(preset.export, "apron")
+        )
+        # Контрольные точки этапов: перезапуск продолжается с первого измененного этапа
+        self.checkpoints = StageCheckpoints(
+            world_raw_path / "regions", enabled=bool(preset.export.get("stage_checkpoints", True))
+        )
+        # Грубый граф стока мира строится лениво, один раз на процесс (и кэшируется на диске)
+        self.drainage_cfg = drainage_settings(preset)
+        self._drainage_graph: DrainageGraph | None = None
+        self._drainage_dir = world_raw_path / "drainage"
+        # Таблица биомов разворачивается в массивы один раз на процесс
+        self.biome_classifier = biome_matcher.load_biome_classifier(BIOMES_PATH)
+
+    def close(self) -> None:
+        """Освобождает кэш ядер и удаляет каталог выгрузки этого процесса."""
+        self.processed_region_cache.close()
+        for path in (self._spill_root, self._spill_root.parent):
+            try:
+                path.rmdir()
+            except OSError:
+                # Каталог не пуст (там данные других процессов) или его нет
+                break
 
     def process(self, scx: int, scz: int, chunks_with_border: Dict[Tuple[int, int], GenResult]) -> Dict[
         Tuple[int, int], Any]:
@@ -68,77 +97,79 @@ class RegionProcessor:
             'a': np.empty((ext_size, ext_size), dtype=np.float32),
             'b': np.empty((ext_size, ext_size), dtype=np.float32)
         }
-        biomes_path = Path(__file__).parent.parent.parent / "data" / "biomes.json"
-        with open(biomes_path, "r", encoding="utf-8") as f:
-            biomes_definition = json.load(f)
+        keys = self.stage_keys(scx, scz)
 
         # --- БЛОК 1: РЕЛЬЕФ ---
-        stitched_height_ext = generate_elevation_region(
-            self.world_seed, scx, scz, preset_region_size, chunk_size, self.preset, scratch_buffers
-        )
+        cached = self.checkpoints.load(scx, scz, "elevation", keys["elevation"])
+        if cached is not None:
+            stitched_height_ext = cached["height"]
+        else:
+            stitched_height_ext = generate_elevation_region(
+                self.world_seed, scx, scz, preset_region_size, chunk_size, self.preset, scratch_buffers,
+                tile_store=self.apron_store,
+            )
+            self.checkpoints.save(scx, scz, "elevation", keys["elevation"], {"height": stitched_height_ext})
 
         # --- БЛОК 2: ТЕКСТУРЫ И ГИДРОЛОГИЯ ---
-        stitched_surface_ext = np.empty((ext_size, ext_size), dtype=const.SURFACE_DTYPE)
-        stitched_nav_ext = np.empty((ext_size, ext_size), dtype=const.NAV_DTYPE)
-
-        classify_initial_terrain(stitched_surface_ext, stitched_nav_ext)
-        is_water_mask = apply_sea_level(stitched_height_ext, stitched_surface_ext, stitched_nav_ext, self.preset)
-        generate_highland_lakes(stitched_height_ext, stitched_surface_ext, stitched_nav_ext, None, self.preset,
-                                self.world_seed)
-        apply_beach_sand(stitched_height_ext, stitched_surface_ext, self.preset)
-        apply_slope_textures(stitched_height_ext, stitched_surface_ext, self.preset)
-        river_mask_ext = generate_rivers(stitched_height_ext, stitched_surface_ext, stitched_nav_ext, self.preset,
-                                         chunk_size)
-
-        # --- БЛОК 3: КЛИМАТ ---
-        print("  -> [Climate] Запуск глобальной климатической модели...")
-
-        # 3.1. Создаем "заглушку" главного окна и контекст для получения 3D-координат
-        from types import SimpleNamespace
-        mock_main_window = SimpleNamespace(
-            current_world_offset=self._get_world_offset_for_region(scx, scz),
-            planet_radius_label=SimpleNamespace(
-                text=f"{getattr(self.preset, 'elevation', {}).get('planet_radius_km', 6371)} км"),
-        )
-        mock_context, _ = self._prepare_context_for_coords(scx, scz, ext_size, self.preset.cell_size)
-
-        # 3.2. Получаем реальные 3D-координаты точек региона на сфере
-        region_coords_3d = _generate_world_input(mock_main_window, mock_context, {}, return_coords_only=True)
-
-        # 3.3. Расчет глобальной температуры
-        temp_params = self.preset.climate.get("temperature", {})
-        base_temp_map = global_models.calculate_base_temperature(
-            xyz_coords=region_coords_3d.reshape(-1, 3),
-            base_temp_c=temp_params.get("base_c", 15.0),
-            equator_pole_temp_diff_c=temp_params.get("equator_pole_diff", 30.0)
-        ).reshape((ext_size, ext_size))
+        cached = self.checkpoints.load(scx, scz, "hydrology", keys["hydrology"])
+        if cached is not None:
+            stitched_height_ext = cached["height"]
+            stitched_surface_ext = cached["surface"]
+            stitched_nav_ext = cached["navigation"]
+            river_mask_ext = cached["river"]
+            is_water_mask = cached["is_water"]
+        else:
+            # Гидрология меняет высоты на месте - не портим массив из контрольной точки рельефа
+            stitched_height_ext = np.array(stitched_height_ext, dtype=np.float32, copy=True)
+            stitched_surface_ext = np.empty((ext_size, ext_size), dtype=const.SURFACE_DTYPE)
+            stitched_nav_ext = np.empty((ext_size, ext_size), dtype=const.NAV_DTYPE)
 
-        temperature_map = base_temp_map + stitched_height_ext * temp_params.get("lapse_rate_c_per_m", -0.0065)
+            classify_initial_terrain(stitched_surface_ext, stitched_nav_ext)
+            is_water_mask = apply_sea_level(stitched_height_ext, stitched_surface_ext, stitched_nav_ext, self.preset)
+            generate_highland_lakes(stitched_height_ext, stitched_surface_ext, stitched_nav_ext, None, self.preset,
+                                    self.world_seed)
+            apply_beach_sand(stitched_height_ext, stitched_surface_ext, self.preset)
+            apply_slope_textures(stitched_height_ext, stitched_surface_ext, self.preset)
+            river_mask_ext = generate_rivers(stitched_height_ext, stitched_surface_ext, stitched_nav_ext, self.preset,
+                                             chunk_size, inflow=self._boundary_inflow(scx, scz, stitched_height_ext))
+            self.checkpoints.save(scx, scz, "hydrology", keys["hydrology"], {
+                "height": stitched_height_ext, "surface": stitched_surface_ext, "navigation": stitched_nav_ext,
+                "river": river_mask_ext, "is_water": is_water_mask,
+            })
 
-        # 3.4. Вызов нового оркестратора для расчета влажности
-        climate_context = {
-            "height_map": stitched_height_ext,
-            "is_water_mask": is_water_mask,
-            "river_mask": river_mask_ext,
-            "temperature_map": temperature_map,
-            "cell_size_m": self.preset.cell_size,
-            "climate_params": self.preset.climate.get("humidity", {})
-        }
-        climate_data = generate_climate_maps(climate_context)
-        humidity_map = climate_data.get('humidity', np.full_like(temperature_map, 0.5))
+        # --- БЛОК 3: КЛИМАТ ---
+        cached = self.checkpoints.load(scx, scz, "climate", keys["climate"])
+        if cached is not None:
+            temperature_map = cached["temperature"]
+            humidity_map = cached["humidity"]
+            shadow_map = cached["shadow"]
+        else:
+            temperature_map, humidity_map, shadow_map = self._run_climate(
+                scx, scz, ext_size, stitched_height_ext, is_water_mask, river_mask_ext
+            )
+            self.checkpoints.save(scx, scz, "climate", keys["climate"], {
+                "temperature": temperature_map, "humidity": humidity_map, "shadow": shadow_map,
+            })
 
         stitched_layers_ext = {
             'height': stitched_height_ext, 'surface': stitched_surface_ext,
             'navigation': stitched_nav_ext, 'river': river_mask_ext,
             'temperature': temperature_map, 'humidity': humidity_map,
-            'shadow': climate_data.get('rain_shadow', np.zeros_like(humidity_map))
+            'shadow': shadow_map
         }
 
         # 3.5. Расчет биомов
-        core_slice = slice(chunk_size, -chunk_size)
-        avg_temp = float(np.mean(temperature_map[core_slice, core_slice]))
-        avg_humidity = float(np.mean(humidity_map[core_slice, core_slice]))
-        biome_probabilities = biome_matcher.calculate_biome_probabilities(avg_temp, avg_humidity, biomes_definition)
+        cached = self.checkpoints.load(scx, scz, "analysis", keys["analysis"])
+        if cached is not None:
+            biome_probabilities = json.loads(str(cached["biome_probabilities"]))
+        else:
+            core_slice = slice(chunk_size, -chunk_size)
+            avg_temp = float(np.mean(temperature_map[core_slice, core_slice]))
+            avg_humidity = float(np.mean(humidity_map[core_slice, core_slice]))
+            biome_probabilities = self.biome_classifier.probabilities_dict(avg_temp, avg_humidity)
+            self.checkpoints.save(scx, scz, "analysis", keys["analysis"], {
+                "biome_probabilities": np.array(json.dumps(biome_probabilities, sort_keys=True)),
+            })
 
         # --- БЛОК 4: АНАЛИТИКА И ЗАВЕРШЕНИЕ ---
         analysis = RegionAnalysis(scx, scz, stitched_layers_ext, chunk_size)
@@ -172,15 +203,82 @@ class RegionProcessor:
             "biome_probabilities": biome_probabilities
         }
 
-    def _get_world_offset_for_region(self, scx: int, scz: int) -> tuple[float, float, float]:
-        # Простая функция для получения вектора смещения на сфере.
-        # В реальной системе здесь была бы логика на основе икосаэдра.
-        angle_x = scx * 0.1
-        angle_z = scz * 0.1
+    def _run_climate(self, scx: int, scz: int, ext_size: int, height_ext: np.ndarray,
+                     is_water_mask: np.ndarray, river_mask_ext: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        print("  -> [Climate] Запуск глобальной климатической модели...")
+
+        # 3.1-3.2. Реальные 3D-координаты точек региона на сфере
+        radius_km = float(getattr(self.preset, 'elevation', {}).get('planet_radius_km', 6371))
+        region_coords_3d = region_sphere_coords(scx, scz, ext_size, self.preset.cell_size,
+                                                radius_m=radius_km * 1000.0)
+
+        # 3.3. Расчет глобальной температуры
+        temp_params = self.preset.climate.get("temperature", {})
+        base_temp_map = global_models.calculate_base_temperature(
+            xyz_coords=region_coords_3d.reshape(-1, 3),
+            base_temp_c=temp_params.get("base_c", 15.0),
+            equator_pole_temp_diff_c=temp_params.get("equator_pole_diff", 30.0)
+        ).reshape((ext_size, ext_size))
+
+        temperature_map = base_temp_map + height_ext * temp_params.get("lapse_rate_c_per_m", -0.0065)
+
+        # 3.4. Вызов нового оркестратора для расчета влажности
+        climate_context = {
+            "height_map": height_ext,
+            "is_water_mask": is_water_mask,
+            "river_mask": river_mask_ext,
+            "temperature_map": temperature_map,
+            "cell_size_m": self.preset.cell_size,
+            "climate_params": self.preset.climate.get("humidity", {})
+        }
+        climate_data = generate_climate_maps(climate_context)
+        humidity_map = climate_data.get('humidity', np.full_like(temperature_map, 0.5))
+        shadow_map = climate_data.get('rain_shadow', np.zeros_like(humidity_map))
+        return temperature_map, humidity_map, shadow_map
 
-        x = np.cos(angle_x) * np.cos(angle_z)
-        y = np.sin(angle_z)
-        z = np.sin(angle_x) * np.cos(angle_z)
+    def _boundary_inflow(self, scx: int, scz: int, height_ext: np.ndarray) -> np.ndarray | None:
+        """Приток воды через границу холста из грубого графа стока (если включен)."""
+        if not self.drainage_cfg["enabled"]:
+            return None
+        if self._drainage_graph is None:
+            self._drainage_graph = DrainageGraph.load_or_build(
+                self._drainage_dir, self.world_seed, self.preset,
+                self.drainage_cfg["radius_regions"], self.drainage_cfg["cells_per_chunk"],
+            )
+        flow = self._drainage_graph.boundary_flow(scx, scz, self.preset.region_size, self.preset.size, height_ext)
+        if flow is None:
+            print(f"  -> [Drainage] Регион ({scx},{scz}) вне графа стока, приток не учитывается.")
+            return None
+        print(f"  -> [Drainage] Приток через границу: {flow.inflow_total:.0f}, отток: {flow.outflow_total:.0f} px.")
+        return flow.inflow
 
-        vec = np.array([x, y, z])
-        return tuple((vec / np.linalg.norm(vec)).tolist())
\ No newline at end of file
+    def stage_keys(self, scx: int, scz: int) -> Dict[str, str]:
+        """
+        Ключи контрольных точек всех этапов. Каждый ключ включает ключ
+        предыдущего этапа, поэтому изменение, например, настроек воды
+        инвалидирует гидрологию, климат и анализ, но не рельеф.
+        """
+        p = self.preset
+        elevation = getattr(p, "elevation", {})
+        elevation_key = stage_key(
+            None, "elevation",
+            seed=self.world_seed, scx=scx, scz=scz, region_size=p.region_size, chunk_size=p.size,
+            cell_size=p.cell_size, elevation=elevation,
+        )
+        hydrology_key = stage_key(
+            elevation_key, "hydrology",
+            sea_level_m=elevation.get("sea_level_m"), water=getattr(p, "water", {}),
+            surfaces=getattr(p, "surfaces", {}), slope_obstacles=getattr(p, "slope_obstacles", {}),
+            drainage=self.drainage_cfg,
+        )
+        climate_key = stage_key(
+            hydrology_key, "climate",
+            climate=getattr(p, "climate", {}), planet_radius_km=elevation.get("planet_radius_km"),
+        )
+        analysis_key = stage_key(climate_key, "analysis", biomes=file_fingerprint(BIOMES_PATH))
+        return {
+            "elevation": elevation_key,
+            "hydrology": hydrology_key,
+            "climate": climate_key,
+            "analysis": analysis_key,
+        }
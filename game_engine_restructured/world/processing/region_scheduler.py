@@ -0,0 +1,295 @@
+# ==============================================================================
+# Файл: game_engine_restructured/world/processing/region_scheduler.py
+# Назначение: Планировщик генерации регионов. Раздает независимые регионы
+#             пулу процессов-воркеров, соблюдая порядок "север/запад",
+#             на который опираются проверки швов в RegionAnalysis.
+# ==============================================================================
+from __future__ import annotations
+import concurrent.futures
+import multiprocessing.util
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ...core.utils.cache import CacheStats, format_cache_report
+
+# Слои, по которым RegionAnalysis считает швы и градиенты с соседями.
+# Только их имеет смысл передавать между процессами.
+SEAM_LAYERS = ("height", "temperature", "humidity")
+
+RegionKey = Tuple[int, int]
+SeamCore = Dict[str, np.ndarray]
+
+
+class RegionGenerationError(RuntimeError):
+    """
+    Часть регионов не сгенерирована. Поднимается после того, как пул
+    досчитал все регионы, которые от упавших не зависят.
+    """
+
+    def __init__(self, failed: Dict[RegionKey, str], skipped: List[RegionKey]):
+        self.failed = failed
+        self.skipped = skipped
+        super().__init__(
+            f"Ошибки в {len(failed)} регионах: {sorted(failed)}; "
+            f"не запущено из-за них: {len(skipped)}"
+        )
+
+
+@dataclass
+class SchedulerStats:
+    """Итоговая статистика прогона планировщика."""
+
+    regions: int
+    workers: int
+    elapsed_s: float
+    # Счетчики кэшей, просуммированные по всем процессам
+    cache_stats: List[CacheStats] = field(default_factory=list)
+
+    @property
+    def regions_per_minute(self) -> float:
+        if self.elapsed_s <= 0.0:
+            return 0.0
+        return self.regions * 60.0 / self.elapsed_s
+
+
+# ------------------------------------------------------------------------------
+# --- Код, выполняемый внутри процесса-воркера ---
+# ------------------------------------------------------------------------------
+
+# Состояние воркера создается один раз на процесс (в initializer),
+# чтобы не пересоздавать RegionManager/WorldActor на каждую задачу.
+_WORKER_STATE: Dict[str, Any] = {}
+
+
+def _init_worker(world_seed: int, preset: Any, artifacts_root: Path, graph_data: Dict[str, Any], verbose: bool):
+    from ..regions import RegionManager
+    from ...world_actor import WorldActor
+
+    region_manager = RegionManager(world_seed, preset, artifacts_root)
+    _WORKER_STATE["region_manager"] = region_manager
+    world_actor = WorldActor(world_seed, graph_data, artifacts_root, verbose=verbose)
+    _WORKER_STATE["world_actor"] = world_actor
+    # atexit в процессах multiprocessing не вызывается; Finalize с приоритетом
+    # срабатывает при штатном завершении воркера: останавливает потоки записи
+    # и удаляет каталог выгрузки кэша этого процесса
+    multiprocessing.util.Finalize(world_actor, world_actor.close, exitpriority=10)
+    multiprocessing.util.Finalize(region_manager, region_manager.close, exitpriority=10)
+
+
+def _extract_seam_core(region_manager, key: RegionKey) -> Optional[SeamCore]:
+    core = region_manager.region_processor.processed_region_cache.get(key)
+    if core is None:
+        return None
+    return {name: np.ascontiguousarray(core[name]) for name in SEAM_LAYERS if name in core}
+
+
+def _run_region(region_manager, world_actor, scx: int, scz: int,
+                neighbor_cores: Dict[RegionKey, SeamCore]) -> Optional[SeamCore]:
+    """Полный цикл для одного региона: сырые данные + детализация."""
+    cache = region_manager.region_processor.processed_region_cache
+    for key, core in neighbor_cores.items():
+        if core is not None:
+            cache.setdefault(key, core)
+
+    region_manager.generate_raw_region(scx, scz)
+    world_actor._detail_region(scx, scz)
+    return _extract_seam_core(region_manager, (scx, scz))
+
+
+def _region_task(scx: int, scz: int, neighbor_cores: Dict[RegionKey, SeamCore]
+                 ) -> Tuple[RegionKey, Optional[SeamCore], float, int, List[CacheStats]]:
+    t0 = time.perf_counter()
+    region_manager = _WORKER_STATE["region_manager"]
+    seam_core = _run_region(region_manager, _WORKER_STATE["world_actor"], scx, scz, neighbor_cores)
+    # Соседи нужны только для текущей задачи — не копим их в воркере.
+    cache = region_manager.region_processor.processed_region_cache
+    for key in neighbor_cores:
+        cache.pop(key, None)
+    cache.pop((scx, scz), None)
+    elapsed = time.perf_counter() - t0
+    return (scx, scz), seam_core, elapsed, os.getpid(), region_manager.cache_stats()
+
+
+def _merge_cache_stats(per_process: List[List[CacheStats]]) -> List[CacheStats]:
+    merged: Dict[str, CacheStats] = {}
+    for stats_list in per_process:
+        for stats in stats_list:
+            merged[stats.name] = merged[stats.name].merged(stats) if stats.name in merged else stats
+    return list(merged.values())
+
+
+# ------------------------------------------------------------------------------
+# --- Планировщик ---
+# ------------------------------------------------------------------------------
+
+class RegionScheduler:
+    """
+    Раздает регионы пулу процессов.
+
+    Регион (scx, scz) запускается только после того, как завершены его
+    северный (scx, scz - 1) и западный (scx - 1, scz) соседи из того же набора.
+    Их "ядра" (слои SEAM_LAYERS) передаются воркеру, поэтому отчет о швах
+    совпадает с последовательным прогоном. Регионы на одной антидиагонали
+    друг от друга не зависят и считаются параллельно.
+    """
+
+    def __init__(
+            self,
+            region_manager,
+            world_actor,
+            max_workers: int | None = None,
+            progress_callback: Callable[[int, str], None] | None = None,
+    ):
+        self.region_manager = region_manager
+        self.world_actor = world_actor
+        self.max_workers = max(1, int(max_workers or os.cpu_count() or 1))
+        self.progress_callback = progress_callback
+
+    def _log(self, percent: int, message: str):
+        if callable(self.progress_callback):
+            self.progress_callback(percent, message)
+        else:
+            print(message)
+
+    @staticmethod
+    def _dependencies(key: RegionKey, pending: set) -> List[RegionKey]:
+        scx, scz = key
+        return [k for k in ((scx, scz - 1), (scx - 1, scz)) if k in pending]
+
+    def run(self, regions: List[RegionKey]) -> SchedulerStats:
+        regions = list(dict.fromkeys(regions))
+        total = len(regions)
+        workers = min(self.max_workers, total) if total else 1
+        t_start = time.perf_counter()
+
+        if total == 0:
+            return SchedulerStats(regions=0, workers=workers, elapsed_s=0.0)
+
+        if workers <= 1:
+            self._run_inline(regions)
+            cache_stats = self.region_manager.cache_stats()
+        else:
+            cache_stats = self._run_pool(regions, workers)
+
+        stats = SchedulerStats(regions=total, workers=workers, elapsed_s=time.perf_counter() - t_start,
+                               cache_stats=cache_stats)
+        self._log(100, f"[RegionScheduler] {stats.regions} регионов за {stats.elapsed_s:.1f} с "
+                       f"({stats.regions_per_minute:.2f} регионов/мин, воркеров: {stats.workers}).")
+        if stats.cache_stats:
+            self._log(100, format_cache_report(stats.cache_stats))
+        return stats
+
+    def _run_inline(self, regions: List[RegionKey]):
+        # Порядок "строка за строкой" уже гарантирует, что север и запад готовы.
+        ordered = sorted(regions, key=lambda k: (k[1], k[0]))
+        for i, (scx, scz) in enumerate(ordered):
+            self._log(int(i / len(ordered) * 100),
+                      f"[{i + 1}/{len(ordered)}] Обработка региона ({scx}, {scz})...")
+            _run_region(self.region_manager, self.world_actor, scx, scz, {})
+
+    def _run_pool(self, regions: List[RegionKey], workers: int) -> List[CacheStats]:
+        pending = set(regions)
+        waiting_on: Dict[RegionKey, List[RegionKey]] = {k: self._dependencies(k, pending) for k in regions}
+        dependents: Dict[RegionKey, int] = {k: 0 for k in regions}
+        for deps in waiting_on.values():
+            for dep in deps:
+                dependents[dep] += 1
+
+        seam_cores: Dict[RegionKey, Optional[SeamCore]] = {}
+        # Последний снимок счетчиков кэшей от каждого процесса-воркера
+        worker_cache_stats: Dict[int, List[CacheStats]] = {}
+        failed: Dict[RegionKey, str] = {}
+        first_error: Optional[BaseException] = None
+        skipped: List[RegionKey] = []
+        done = 0
+        total = len(regions)
+
+        init_args = (
+            self.region_manager.world_seed,
+            self.region_manager.preset,
+            self.region_manager.artifacts_root,
+            self.world_actor.graph_data,
+            self.world_actor.verbose,
+        )
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_worker, initargs=init_args
+        ) as executor:
+            running: Dict[concurrent.futures.Future, RegionKey] = {}
+
+            def submit_ready():
+                ready = [k for k, deps in waiting_on.items() if not deps]
+                # Сначала более "северо-западные" регионы, чтобы фронт двигался по диагонали.
+                for key in sorted(ready, key=lambda k: (k[0] + k[1], k[1])):
+                    del waiting_on[key]
+                    scx, scz = key
+                    neighbors = {k: seam_cores.get(k) for k in ((scx, scz - 1), (scx - 1, scz)) if k in seam_cores}
+                    running[executor.submit(_region_task, scx, scz, neighbors)] = key
+
+            submit_ready()
+            while running:
+                finished, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in finished:
+                    key = running.pop(future)
+                    done += 1
+                    try:
+                        _, seam_core, elapsed, pid, cache_stats = future.result()
+                    except Exception as exc:
+                        failed[key] = f"{type(exc).__name__}: {exc}"
+                        first_error = first_error or exc
+                        self._log(int(done / total * 100),
+                                  f"!!! [{done}/{total}] Ошибка при генерации региона {key}: {exc}")
+                        # Зависимые регионы без ядра соседа не запускаются
+                        for blocked in self._block_dependents(key, waiting_on):
+                            skipped.append(blocked)
+                            done += 1
+                            self._log(int(done / total * 100),
+                                      f"!!! [{done}/{total}] Регион {blocked} пропущен: не готов сосед {key}.")
+                            self._release_neighbors(blocked, dependents, seam_cores)
+                        self._release_neighbors(key, dependents, seam_cores)
+                        continue
+
+                    worker_cache_stats[pid] = cache_stats
+                    self._log(int(done / total * 100),
+                              f"[{done}/{total}] Регион {key} готов за {elapsed:.1f} с.")
+
+                    if dependents[key] > 0:
+                        seam_cores[key] = seam_core
+                    for deps in waiting_on.values():
+                        if key in deps:
+                            deps.remove(key)
+                    self._release_neighbors(key, dependents, seam_cores)
+                submit_ready()
+
+        if failed:
+            # Как и при последовательном прогоне, ошибка региона доходит до вызывающего кода
+            raise RegionGenerationError(failed, skipped) from first_error
+        return _merge_cache_stats(list(worker_cache_stats.values()))
+
+    @staticmethod
+    def _block_dependents(key: RegionKey, waiting_on: Dict[RegionKey, List[RegionKey]]) -> List[RegionKey]:
+        """Снимает с очереди все регионы, которые прямо или через других ждут key."""
+        blocked: List[RegionKey] = []
+        frontier = [key]
+        while frontier:
+            current = frontier.pop()
+            for k in [k for k, deps in waiting_on.items() if current in deps]:
+                del waiting_on[k]
+                blocked.append(k)
+                frontier.append(k)
+        return blocked
+
+    @staticmethod
+    def _release_neighbors(key: RegionKey, dependents: Dict[RegionKey, int],
+                           seam_cores: Dict[RegionKey, Optional[SeamCore]]):
+        """Освобождает ядра соседей, которые больше никому не понадобятся."""
+        scx, scz = key
+        for dep in ((scx, scz - 1), (scx - 1, scz)):
+            if dep in dependents:
+                dependents[dep] -= 1
+                if dependents[dep] <= 0:
+                    seam_cores.pop(dep, None)
@@ -0,0 +1,87 @@
+# ==============================================================================
+# Файл: game_engine_restructured/world/processing/stage_checkpoints.py
+# Назначение: Контрольные точки этапов RegionProcessor (рельеф, гидрология,
+#             климат, анализ). Ключ этапа - хэш его входов и ключа
+#             предыдущего этапа, поэтому при перезапуске конвейер продолжает
+#             работу с первого этапа, чьи настройки изменились.
+# ==============================================================================
+from __future__ import annotations
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+# Увеличивать при изменении алгоритмов этапов, чтобы старые точки не подхватывались
+STAGE_FORMAT_VERSION = 5
+STAGES = ("elevation", "hydrology", "climate", "analysis")
+
+_KEY_FIELD = "__stage_key__"
+
+
+def stage_key(parent_key: Optional[str], stage: str, **inputs: Any) -> str:
+    """Хэш входов этапа, сцепленный с ключом предыдущего этапа."""
+    payload = {
+        "format": STAGE_FORMAT_VERSION,
+        "stage": stage,
+        "parent": parent_key,
+        "inputs": inputs,
+    }
+    blob = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha1(blob).hexdigest()[:20]
+
+
+def file_fingerprint(path: Path) -> str:
+    """Хэш содержимого файла (например, biomes.json)."""
+    try:
+        return hashlib.sha1(Path(path).read_bytes()).hexdigest()[:16]
+    except OSError:
+        return "missing"
+
+
+class StageCheckpoints:
+    """
+    Хранит результат каждого этапа в regions/<scx>_<scz>/stages/<stage>.npz.
+    В файле вместе с массивами лежит ключ этапа; точка считается валидной,
+    только если ключ совпадает с текущим.
+    """
+
+    def __init__(self, regions_root: Path, enabled: bool = True):
+        self.regions_root = Path(regions_root)
+        self.enabled = enabled
+
+    def _path(self, scx: int, scz: int, stage: str) -> Path:
+        return self.regions_root / f"{scx}_{scz}" / "stages" / f"{stage}.npz"
+
+    def load(self, scx: int, scz: int, stage: str, key: str) -> Optional[Dict[str, np.ndarray]]:
+        if not self.enabled:
+            return None
+        path = self._path(scx, scz, stage)
+        if not path.exists():
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if _KEY_FIELD not in data or str(data[_KEY_FIELD]) != key:
+                    return None
+                arrays = {name: data[name] for name in data.files if name != _KEY_FIELD}
+        except (OSError, ValueError) as e:
+            print(f"!!! [Checkpoints] Не удалось прочитать {path}: {e}")
+            return None
+        print(f"  -> [Checkpoints] Этап '{stage}' региона ({scx},{scz}) взят из контрольной точки.")
+        return arrays
+
+    def save(self, scx: int, scz: int, stage: str, key: str, arrays: Dict[str, np.ndarray]) -> None:
+        if not self.enabled:
+            return
+        path = self._path(scx, scz, stage)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.stem}.{os.getpid()}.tmp")
+        try:
+            with open(tmp_path, "wb") as f:
+                # Без сжатия: точки нужны для быстрого перезапуска
+                np.savez(f, **{_KEY_FIELD: np.array(key)}, **arrays)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"!!! [Checkpoints] Не удалось сохранить {path}: {e}")
@@ -7,8 +7,9 @@
 # ==============================================================================
 from __future__ import annotations
 import concurrent.futures
+import json
 from pathlib import Path
-from typing import Dict, Tuple
+from typing import Dict, List, Tuple
 
 # --- Компоненты движка ---
 from ..core.preset import Preset
@@ -18,6 +19,7 @@ from .processing.region_processor import RegionProcessor
 from .serialization import RegionMetaContract
 from ..core.utils.rng import init_rng
 from ..core.utils.layers import make_empty_layers
+from ..core.utils.cache import BoundedCache, CacheStats, cache_limit_bytes
 from .planners.road_planner import plan_roads_for_region
 from .grid_utils import region_base
 
@@ -29,15 +31,33 @@ class RegionManager:
         self.raw_data_path = self.artifacts_root / "world_raw" / str(self.world_seed)
         # RegionProcessor - единственный обработчик, который нам нужен
         self.region_processor = RegionProcessor(preset, world_seed, self.artifacts_root)
-        self.base_chunk_cache: Dict[Tuple[int, int], GenResult] = {}
+        # Контейнеры чанков переиспользуются соседними регионами (общая граница),
+        # но кэш ограничен по памяти, чтобы длинная генерация не съела всю RAM.
+        self.base_chunk_cache = BoundedCache("chunks", max_bytes=cache_limit_bytes(preset.export, "chunks"))
+
+    def close(self) -> None:
+        """Освобождает кэши процесса (вместе с выгруженными на диск записями)."""
+        self.base_chunk_cache.clear()
+        self.region_processor.close()
+
+    def cache_stats(self) -> List[CacheStats]:
+        """Счетчики всех кэшей, которыми пользуется генерация в этом процессе."""
+        from ..algorithms.terrain.steps.stamping import STAMP_CACHE
+        return [
+            self.base_chunk_cache.stats(),
+            self.region_processor.processed_region_cache.stats(),
+            self.region_processor.apron_store.stats(),
+            STAMP_CACHE.stats(),
+        ]
 
     def _generate_or_get_chunk_task(self, cx: int, cz: int) -> GenResult:
         """
         Задача для одного потока: СОЗДАТЬ ПУСТОЙ КОНТЕЙНЕР ДЛЯ ЧАНКА.
         Генерация данных будет выполнена позже пакетно в RegionProcessor.
         """
-        if (cx, cz) in self.base_chunk_cache:
-            return self.base_chunk_cache[(cx, cz)]
+        cached = self.base_chunk_cache.get((cx, cz))
+        if cached is not None:
+            return cached
 
         size = self.preset.size
         grid_spec = HexGridSpec(
@@ -59,8 +79,15 @@ class RegionManager:
             grid_spec=grid_spec,
         )
 
-        self.base_chunk_cache[(cx, cz)] = chunk_result
-        return chunk_result
+        return self.base_chunk_cache.setdefault((cx, cz), chunk_result)
+
+    @staticmethod
+    def _stored_pipeline_key(region_meta_path: Path) -> str | None:
+        try:
+            with open(region_meta_path, "r", encoding="utf-8") as f:
+                return json.load(f).get("pipeline_key")
+        except (OSError, ValueError):
+            return None
 
     def generate_raw_region(self, scx: int, scz: int):
         """
@@ -69,7 +96,8 @@ class RegionManager:
         region_meta_path = (
                 self.raw_data_path / "regions" / f"{scx}_{scz}" / "region_meta.json"
         )
-        if region_meta_path.exists():
+        pipeline_key = self.region_processor.stage_keys(scx, scz)["analysis"]
+        if region_meta_path.exists() and self._stored_pipeline_key(region_meta_path) == pipeline_key:
             print(f"[RegionManager] Сырые данные для региона ({scx},{scz}) уже существуют.")
             return
 
@@ -123,7 +151,8 @@ class RegionManager:
             scz=scz,
             world_seed=self.world_seed,
             road_plan=road_plan,
-            biome_probabilities=biome_probabilities  # <-- ДОБАВЛЕНА ЭТА СТРОКА
+            biome_probabilities=biome_probabilities,  # <-- ДОБАВЛЕНА ЭТА СТРОКА
+            pipeline_key=pipeline_key,
         )
         write_region_meta(str(region_meta_path), meta_contract)
 
@@ -25,6 +25,10 @@ class RegionMetaContract:
 
     edge_data: Dict[str, Any] = field(default_factory=dict)
 
+    # Ключ последнего этапа RegionProcessor: если настройки изменились,
+    # регион пересчитывается (с первого затронутого этапа)
+    pipeline_key: str = ""
+
 
 # --- Контракт 2: Данные чанка для клиента ---
 @dataclass
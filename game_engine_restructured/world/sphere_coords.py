@@ -0,0 +1,98 @@
+# ==============================================================================
+# Файл: game_engine_restructured/world/sphere_coords.py
+# Назначение: Перевод плоских координат региона (метры) в точки на сфере
+#             планеты. Общий код для движка и превью редактора; зависит
+#             только от NumPy, поэтому воркеры не тянут за собой Qt.
+# ==============================================================================
+from __future__ import annotations
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+EPS = 1e-9  # Константа для избежания деления на ноль
+DEFAULT_PLANET_RADIUS_M = 6371000.0
+GLOBAL_NORTH = np.array([0.0, 0.0, 1.0], dtype=np.float32)
+
+
+def planar_grid_meters(resolution: int, cell_size: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Сетка координат X/Z в метрах с центром в (0, 0)."""
+    world_side_m = resolution * cell_size
+    x_meters = np.linspace(-world_side_m / 2.0, world_side_m / 2.0, resolution, dtype=np.float32)
+    z_meters = np.linspace(-world_side_m / 2.0, world_side_m / 2.0, resolution, dtype=np.float32)
+    return np.meshgrid(x_meters, z_meters)
+
+
+def region_center_vector(scx: int, scz: int) -> Tuple[float, float, float]:
+    """
+    Вектор центра региона на единичной сфере.
+    Простая схема по углам; в реальной системе здесь была бы логика икосаэдра.
+    """
+    angle_x = scx * 0.1
+    angle_z = scz * 0.1
+
+    x = np.cos(angle_x) * np.cos(angle_z)
+    y = np.sin(angle_z)
+    z = np.sin(angle_x) * np.cos(angle_z)
+
+    vec = np.array([x, y, z])
+    return tuple((vec / np.linalg.norm(vec)).tolist())
+
+
+def tangent_basis(center) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Нормализованный центр и локальные оси U/V касательной плоскости
+    (X и Z на плоскости превью).
+    """
+    center_vec = np.array(center, dtype=np.float32)
+    if np.linalg.norm(center_vec) < EPS: center_vec = np.array([1.0, 0.0, 0.0])  # Fallback
+    center_vec /= np.linalg.norm(center_vec)
+
+    if np.abs(np.dot(center_vec, GLOBAL_NORTH)) > 0.99:
+        # Если мы на полюсе, выбираем другое направление для "вверх"
+        alternative_up = np.array([0.0, 1.0, 0.0], dtype=np.float32)
+        tangent_u = np.cross(alternative_up, center_vec)
+    else:
+        tangent_u = np.cross(GLOBAL_NORTH, center_vec)  # U = North x Center
+
+    if np.linalg.norm(tangent_u) < EPS:
+        alternative_up = np.array([0.0, 1.0, 0.0], dtype=np.float32)
+        tangent_u = np.cross(alternative_up, center_vec)
+
+    tangent_u /= np.linalg.norm(tangent_u)
+    tangent_v = np.cross(center_vec, tangent_u)  # V = Center x U
+    tangent_v /= np.linalg.norm(tangent_v)
+    return center_vec, tangent_u, tangent_v
+
+
+def sphere_coords(x_m: np.ndarray, z_m: np.ndarray, center, radius_m: float = DEFAULT_PLANET_RADIUS_M) -> np.ndarray:
+    """
+    Точки на единичной сфере (..., 3) float32 для плоских координат x_m/z_m,
+    отложенных от центра региона по касательной плоскости.
+    """
+    center_vec, tangent_u, tangent_v = tangent_basis(center)
+    points_in_plane = (center_vec[np.newaxis, np.newaxis, :]
+                       + tangent_u[np.newaxis, np.newaxis, :] * (x_m / radius_m)[..., np.newaxis]
+                       + tangent_v[np.newaxis, np.newaxis, :] * (z_m / radius_m)[..., np.newaxis])
+    coords = points_in_plane / np.linalg.norm(points_in_plane, axis=-1, keepdims=True)
+    return coords.astype(np.float32)
+
+
+def local_north_vector(center) -> Optional[List[float]]:
+    """
+    Направление на северный полюс в осях U/V касательной плоскости.
+    None, если центр совпадает с полюсом.
+    """
+    center_vec, tangent_u, tangent_v = tangent_basis(center)
+    north_tangent = GLOBAL_NORTH - np.dot(GLOBAL_NORTH, center_vec) * center_vec
+    north_norm = np.linalg.norm(north_tangent)
+    if north_norm <= EPS:
+        return None
+    north_tangent /= north_norm
+    return [float(np.dot(north_tangent, tangent_u)), float(np.dot(north_tangent, tangent_v))]
+
+
+def region_sphere_coords(scx: int, scz: int, resolution: int, cell_size: float,
+                         radius_m: float = DEFAULT_PLANET_RADIUS_M) -> np.ndarray:
+    """3D-координаты всех точек холста региона (resolution x resolution) на сфере."""
+    x_coords, z_coords = planar_grid_meters(resolution, cell_size)
+    return sphere_coords(x_coords, z_coords, region_center_vector(scx, scz), radius_m)
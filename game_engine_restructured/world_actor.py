@@ -6,22 +6,25 @@ from __future__ import annotations
 import json
 from pathlib import Path
 from typing import Dict, Any  # <-- ИЗМЕНЕНИЕ: Добавляем типы
+import numpy as np
 
 # --- Компоненты движка ---
 # --- ИЗМЕНЕНИЕ: Убираем Preset, добавляем SimpleNamespace ---
 from types import SimpleNamespace
 
 from .core.export import (
-    write_client_chunk_meta, write_heightmap_r16,
-    write_control_map_r32, write_objects_json,
-    read_raw_chunk
+    read_raw_chunk,
+    encode_heightmap_r16, encode_objects_json,
+    encode_client_chunk_meta, encode_preview_png, RegionPackWriter,
+    AsyncChunkWriter, pack_control_map, log_heightmap_range, log_control_map_stats,
+    render_preview_rgb, write_region_preview_atlas,
 )
 from .world.processing.detail_processor import DetailProcessor
+from .world.processing.region_scheduler import RegionScheduler
 from .world.context import Region
 from .world.road_types import RoadWaypoint, ChunkRoadPlan
 from .world.prefab_manager import PrefabManager
 from .world.serialization import ClientChunkContract
-from .core.export import write_chunk_preview
 
 
 class WorldActor:
@@ -64,14 +67,33 @@ class WorldActor:
         # Передаем "легкий" пресет дальше
         self.detail_processor = DetailProcessor(self.preset, self.prefab_manager, verbose=self.verbose)
         self.h_norm = self.preset.h_norm # Используем значение из нашего объекта
+        # Фоновая запись файлов чанков: диск работает, пока считается следующий чанк
+        export_cfg = self.preset.export
+        self.chunk_writer = AsyncChunkWriter(
+            max_workers=int(export_cfg.get("writer_threads", 2)),
+            max_pending=int(export_cfg.get("write_queue_size", 32)),
+            fsync=bool(export_cfg.get("fsync_writes", False)),
+            verbose=bool(export_cfg.get("log_file_saves", False)),
+        )
+        self.log_file_saves = bool(export_cfg.get("log_file_saves", False))
         if self.verbose:
             print(f"[WorldActor] H_NORM (from graph_data) = {self.h_norm:.3f}")
 
+    def close(self):
+        """Дожидается записи файлов и останавливает потоки записи."""
+        self.chunk_writer.close()
+
+    def __enter__(self) -> "WorldActor":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
     def _log(self, message: str):
         # Сообщение без явного процента — шлём с последним известным
         self._log_progress(self._last_percent, message)
 
-    def prepare_starting_area(self, region_manager):
+    def prepare_starting_area(self, region_manager, max_workers: int | None = None):
         radius = self.preset.initial_load_radius
         self._log_progress(0, f"Подготовка области с радиусом {radius}...")
 
@@ -85,12 +107,13 @@ class WorldActor:
             self._log_progress(100, "Нет регионов для генерации.")
             return
 
-        for i, (scx, scz) in enumerate(regions_to_generate):
-            percent = int((i / total_regions) * 100)
-            self._log_progress(percent, f"[{i + 1}/{total_regions}] Обработка региона ({scx}, {scz})...")
-
-            region_manager.generate_raw_region(scx, scz, self.graph_data)
-            self._detail_region(scx, scz)
+        # Число процессов: аргумент > export.max_workers > все ядра
+        if max_workers is None:
+            max_workers = self.preset.export.get("max_workers")
+        scheduler = RegionScheduler(
+            region_manager, self, max_workers=max_workers, progress_callback=self._log_progress
+        )
+        scheduler.run(regions_to_generate)
 
         self._log_progress(100, "Область сгенерирована.")
 
@@ -115,6 +138,81 @@ class WorldActor:
         region_size = self.preset.region_size
         from .world.grid_utils import region_base
         base_cx, base_cz = region_base(scx, scz, region_size)
+        palette = self.preset.export.get("palette", {})
+        # Общий PNG-атлас превью на весь регион (по флагу в пресете)
+        build_atlas = bool(self.preset.export.get("region_preview_atlas", False))
+        atlas_tiles: Dict[tuple, Any] = {}
+
+        # Один файл .rpack на регион вместо набора файлов на каждый чанк
+        if self.preset.export.get("region_pack", False):
+            with RegionPackWriter(self.final_data_path / "regions" / f"{scx}_{scz}.rpack", scx, scz) as pack:
+                encode_errors = self._detail_chunks(region_context, base_cx, base_cz, palette, pack,
+                                                    atlas_tiles if build_atlas else None)
+            write_errors = 0
+        else:
+            errors_before = self.chunk_writer.stats.errors
+            encode_errors = self._detail_chunks(region_context, base_cx, base_cz, palette, None,
+                                                atlas_tiles if build_atlas else None)
+            # Барьер: регион считается готовым, только когда все его файлы на диске
+            write_errors = self.chunk_writer.flush().errors - errors_before
+
+        if build_atlas and atlas_tiles:
+            chunk_size = next(iter(atlas_tiles.values())).shape[0]
+            write_region_preview_atlas(
+                str(self.final_data_path / "region_previews" / f"{scx}_{scz}.png"),
+                atlas_tiles, region_size, chunk_size,
+                verbose=self.preset.export.get("log_file_saves", False),
+            )
+
+        if encode_errors or write_errors:
+            # Остальные файлы региона записаны, но целиком он не готов
+            raise RuntimeError(f"Регион ({scx},{scz}): не создано файлов: {encode_errors}, "
+                               f"не записано: {write_errors}")
+
+    def _encode_chunk_files(self, chunk_dir: Path, layers, placed_objects, contract: ClientChunkContract,
+                            preview_rgb: np.ndarray | None) -> tuple[Dict[str, bytes], int]:
+        """
+        Байты файлов клиентского чанка. Ошибка кодирования одного файла
+        не мешает остальным: файл пропускается, ошибка считается.
+        preview_rgb - уже раскрашенное превью (None, если раскраска не удалась).
+        """
+        surface_grid, nav_grid, height_grid = layers.surface, layers.navigation, layers.height
+
+        def control_map() -> bytes:
+            packed, stats = pack_control_map(surface_grid, nav_grid, layers.overlay)
+            if self.log_file_saves:
+                log_control_map_stats(chunk_dir.name, stats)
+            return packed.tobytes()
+
+        def heightmap() -> bytes:
+            data = encode_heightmap_r16(height_grid, self.h_norm)
+            if self.log_file_saves:
+                log_heightmap_range(str(chunk_dir / "heightmap.r16"), height_grid, self.h_norm)
+            return data
+
+        encoders = {
+            "heightmap.r16": heightmap,
+            "control.r32": control_map,
+            "objects.json": lambda: encode_objects_json(placed_objects),
+            "preview.png": lambda: encode_preview_png(preview_rgb),
+            "chunk.json": lambda: encode_client_chunk_meta(contract),
+        }
+        files: Dict[str, bytes] = {}
+        errors = 0
+        for name, encode in encoders.items():
+            try:
+                files[name] = encode()
+            except Exception as e:
+                errors += 1
+                print(f"!!! LOG: CRITICAL ERROR while creating {name} for chunk {chunk_dir.name}: {e}")
+        return files, errors
+
+    def _detail_chunks(self, region_context: Region, base_cx: int, base_cz: int,
+                       palette: Dict[str, Any], pack: RegionPackWriter | None,
+                       atlas_tiles: Dict[tuple, Any] | None) -> int:
+        """Детализирует и выгружает чанки региона. Возвращает число файлов, которые не удалось создать."""
+        region_size = self.preset.region_size
+        encode_errors = 0
 
         for dz in range(region_size):
             for dx in range(region_size):
@@ -126,19 +224,29 @@ class WorldActor:
 
                 final_chunk = self.detail_processor.process(chunk_for_detailing, region_context)
                 client_chunk_dir = self.final_data_path / f"{chunk_cx}_{chunk_cz}"
-                surface_grid = final_chunk.layers.get("surface")
-                nav_grid = final_chunk.layers.get("navigation")
-                height_grid = final_chunk.layers.get("height_q", {}).get("grid", [])
-
-                if surface_grid is None or not height_grid:
+                layers = final_chunk.layers
+                if layers is None or layers.height.size == 0:
                     continue
+                placed_objects = getattr(final_chunk, "placed_objects", [])
+                contract = ClientChunkContract(cx=chunk_cx, cz=chunk_cz)
+
+                # Превью раскрашивается один раз: и для preview.png, и для атласа региона
+                try:
+                    preview_rgb = render_preview_rgb(layers.surface, layers.navigation, palette)
+                except Exception as e:
+                    preview_rgb = None
+                    print(f"!!! LOG: CRITICAL ERROR while rendering preview for chunk {client_chunk_dir.name}: {e}")
 
-                log_saves = self.preset.export.get("log_file_saves", False)
-                write_heightmap_r16(str(client_chunk_dir / "heightmap.r16"), height_grid, h_norm=self.h_norm, verbose=log_saves)
-                write_control_map_r32(str(client_chunk_dir / "control.r32"), surface_grid, nav_grid, final_chunk.layers.get("overlay"), verbose=log_saves)
-                write_objects_json(str(client_chunk_dir / "objects.json"), getattr(final_chunk, "placed_objects", []), verbose=log_saves)
-                write_chunk_preview(str(client_chunk_dir / "preview.png"), surface_grid, nav_grid, self.preset.export.get("palette", {}), verbose=log_saves)
-                write_client_chunk_meta(str(client_chunk_dir / "chunk.json"), ClientChunkContract(cx=chunk_cx, cz=chunk_cz), verbose=log_saves)
+                files, errors = self._encode_chunk_files(client_chunk_dir, layers, placed_objects, contract, preview_rgb)
+                encode_errors += errors
+                if pack is not None:
+                    for name, data in files.items():
+                        pack.add(chunk_cx, chunk_cz, name, data)
+                else:
+                    self.chunk_writer.submit_files(client_chunk_dir, files)
+                if atlas_tiles is not None and preview_rgb is not None:
+                    atlas_tiles[(dx, dz)] = preview_rgb
+        return encode_errors
 
     def _log_progress(self, percent: int, message: str):
         self._last_percent = int(percent)
@@ -1,6 +1,11 @@
 # generator_logic/climate/biome_matcher.py
 from __future__ import annotations
-from typing import Dict
+import json
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
 
 def calculate_biome_probabilities(
     avg_temp_c: float,
@@ -39,4 +44,86 @@ def calculate_biome_probabilities(
         for biome_id in probabilities:
             probabilities[biome_id] /= total_score
 
-    return probabilities
\ No newline at end of file
+    return probabilities
+
+
+class BiomeClassifier:
+    """
+    Векторизованный вариант calculate_biome_probabilities.
+
+    biomes.json один раз разворачивается в массивы идеальных условий,
+    после чего классификация любого числа точек - одно вычисление над
+    массивами (N, число биомов). Счет и нормализация те же, что у
+    calculate_biome_probabilities.
+
+    Если у биома задан "ideal_height_m", к расстоянию добавляется
+    высотная ось: (высота - ideal_height_m) / "height_scale_m" (по умолчанию
+    100 м на единицу, как 1 °C). Без этих ключей высота не учитывается.
+    """
+
+    def __init__(self, biomes_definition: Dict):
+        self.biome_ids: List[str] = list(biomes_definition.keys())
+        self.ideal_temp_c = np.array(
+            [float(b.get("ideal_temp_c", 15.0)) for b in biomes_definition.values()], dtype=np.float64)
+        self.ideal_humidity = np.array(
+            [float(b.get("ideal_humidity", 0.5)) for b in biomes_definition.values()], dtype=np.float64)
+        self.has_height = np.array(
+            ["ideal_height_m" in b for b in biomes_definition.values()], dtype=bool)
+        self.ideal_height_m = np.array(
+            [float(b.get("ideal_height_m", 0.0)) for b in biomes_definition.values()], dtype=np.float64)
+        self.height_scale_m = np.array(
+            [float(b.get("height_scale_m", 100.0)) for b in biomes_definition.values()], dtype=np.float64)
+
+    @classmethod
+    def from_file(cls, path: str | Path) -> "BiomeClassifier":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def __len__(self) -> int:
+        return len(self.biome_ids)
+
+    def probabilities(self, temperature_c, humidity, height_m=None) -> np.ndarray:
+        """Вероятности биомов (N, B) для массивов температуры/влажности (любой формы, разворачиваются в N)."""
+        temp = np.asarray(temperature_c, dtype=np.float64).reshape(-1, 1)
+        hum = np.asarray(humidity, dtype=np.float64).reshape(-1, 1)
+
+        temp_diff = temp - self.ideal_temp_c
+        humidity_diff = hum * 100 - self.ideal_humidity * 100
+        distance_sq = temp_diff ** 2 + humidity_diff ** 2
+        if height_m is not None and self.has_height.any():
+            height = np.asarray(height_m, dtype=np.float64).reshape(-1, 1)
+            height_diff = (height - self.ideal_height_m) / self.height_scale_m
+            distance_sq += np.where(self.has_height, height_diff ** 2, 0.0)
+
+        scores = 1.0 / (1.0 + distance_sq * 0.01)
+        total = scores.sum(axis=1, keepdims=True)
+        np.divide(scores, total, out=scores, where=total > 0)
+        return scores
+
+    def classify(self, temperature_c, humidity, height_m=None) -> Tuple[np.ndarray, np.ndarray]:
+        """(вероятности (N, B), индекс доминирующего биома (N,))."""
+        probs = self.probabilities(temperature_c, humidity, height_m)
+        if probs.shape[1] == 0:
+            return probs, np.full(probs.shape[0], -1, dtype=np.int64)
+        return probs, np.argmax(probs, axis=1)
+
+    def dominant_ids(self, dominant_idx: np.ndarray, default: str = "default") -> np.ndarray:
+        """Имена биомов по индексам из classify (-1 -> default)."""
+        names = np.array(self.biome_ids + [default], dtype=object)
+        return names[np.where(dominant_idx < 0, len(self.biome_ids), dominant_idx)]
+
+    def probabilities_dict(self, temperature_c: float, humidity: float) -> Dict[str, float]:
+        """Одна точка, в формате calculate_biome_probabilities."""
+        probs = self.probabilities(temperature_c, humidity)[0]
+        return {biome_id: float(p) for biome_id, p in zip(self.biome_ids, probs)}
+
+
+@lru_cache(maxsize=8)
+def _cached_classifier(path: str, mtime_ns: int) -> BiomeClassifier:
+    return BiomeClassifier.from_file(path)
+
+
+def load_biome_classifier(path: str | Path) -> BiomeClassifier:
+    """Классификатор для файла biomes.json; пересобирается, только если файл изменился."""
+    path = Path(path)
+    return _cached_classifier(str(path.resolve()), path.stat().st_mtime_ns)
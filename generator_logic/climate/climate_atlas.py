@@ -0,0 +1,135 @@
+# generator_logic/climate/climate_atlas.py
+"""
+Бинарный атлас климата регионов планеты.
+
+Файл состоит из заголовка фиксированного размера, таблицы имен биомов и
+массива записей одинакового размера - по одной на регион, номер записи
+равен ID региона. Поэтому климат одного региона читается за O(1): по
+смещению в файле или через np.memmap, без разбора всего файла.
+
+Формат (little-endian):
+    заголовок   - magic, версия, число регионов, число биомов,
+                  длина таблицы имен, сид мира, смещение записей;
+    имена       - ID биомов в UTF-8 через "\\n";
+    записи      - температура (f4), влажность (f4), доминирующий биом (i2,
+                  -1 - нет данных), вероятности биомов (f4 x число биомов).
+"""
+from __future__ import annotations
+import os
+import struct
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+CLIMATE_ATLAS_FILENAME = "global_climate_atlas.bin"
+# Прежний формат кэша (весь климат одним JSON), читается как запасной вариант
+LEGACY_CLIMATE_JSON_FILENAME = "global_climate_data.json"
+
+ATLAS_MAGIC = b"CLATLAS\0"
+ATLAS_VERSION = 1
+_HEADER = struct.Struct("<8sIIIIqQ")
+_ALIGN = 16
+
+
+def _record_dtype(n_biomes: int) -> np.dtype:
+    return np.dtype([
+        ("temperature_c", "<f4"),
+        ("humidity", "<f4"),
+        ("dominant", "<i2"),
+        ("probabilities", "<f4", (n_biomes,)),
+    ], align=True)
+
+
+def write_climate_atlas(
+        path: str | Path,
+        world_seed: int,
+        biome_ids: Sequence[str],
+        temperature_c: np.ndarray,
+        humidity: np.ndarray,
+        probabilities: np.ndarray,
+        dominant: np.ndarray,
+) -> Path:
+    """
+    Записывает атлас. Все массивы - по регионам (N,), probabilities - (N, B).
+    Регионы без данных помечаются dominant = -1. Запись атомарная.
+    """
+    path = Path(path)
+    names = "\n".join(biome_ids).encode("utf-8")
+    n_regions, n_biomes = int(len(temperature_c)), len(biome_ids)
+    data_offset = -(-(_HEADER.size + len(names)) // _ALIGN) * _ALIGN
+
+    records = np.zeros(n_regions, dtype=_record_dtype(n_biomes))
+    records["temperature_c"] = temperature_c
+    records["humidity"] = humidity
+    records["dominant"] = dominant
+    records["probabilities"] = np.asarray(probabilities).reshape(n_regions, n_biomes)
+
+    header = _HEADER.pack(ATLAS_MAGIC, ATLAS_VERSION, n_regions, n_biomes, len(names),
+                          int(world_seed), data_offset)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(names)
+        f.write(b"\0" * (data_offset - _HEADER.size - len(names)))
+        f.write(records.tobytes())
+    os.replace(tmp_path, path)
+    return path
+
+
+class ClimateAtlas:
+    """
+    Атлас, открытый на чтение. Записи отображаются в память (np.memmap),
+    поэтому открытие не зависит от числа регионов.
+    Используется как контекстный менеджер, чтобы файл не оставался открытым.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            raw = f.read(_HEADER.size)
+            if len(raw) < _HEADER.size:
+                raise ValueError(f"{self.path}: файл короче заголовка атласа климата")
+            magic, version, n_regions, n_biomes, names_len, world_seed, data_offset = _HEADER.unpack(raw)
+            if magic != ATLAS_MAGIC or version != ATLAS_VERSION:
+                raise ValueError(f"{self.path}: не атлас климата версии {ATLAS_VERSION}")
+            names = f.read(names_len).decode("utf-8")
+
+        self.world_seed = int(world_seed)
+        self.biome_ids: List[str] = names.split("\n") if names else []
+        if len(self.biome_ids) != n_biomes:
+            raise ValueError(f"{self.path}: таблица биомов повреждена")
+        if n_regions == 0:
+            self.records = np.zeros(0, dtype=_record_dtype(n_biomes))
+        else:
+            self.records = np.memmap(self.path, dtype=_record_dtype(n_biomes), mode="r",
+                                     offset=data_offset, shape=(n_regions,))
+
+    def __enter__(self) -> "ClimateAtlas":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        # Отображение закрывается вместе с последней ссылкой на него
+        self.records = None
+
+    def __len__(self) -> int:
+        return 0 if self.records is None else self.records.shape[0]
+
+    def region(self, region_id: int) -> Optional[Dict]:
+        """Климат региона в формате записи region_data прежнего JSON-кэша; None - нет данных."""
+        if not 0 <= region_id < len(self):
+            return None
+        rec = self.records[region_id]
+        dominant = int(rec["dominant"])
+        if dominant < 0:
+            return None
+        return {
+            "average_temperature_c": float(rec["temperature_c"]),
+            "average_humidity": float(rec["humidity"]),
+            "dominant_biome": self.biome_ids[dominant] if dominant < len(self.biome_ids) else "default",
+            "biome_probabilities": {k: float(p) for k, p in zip(self.biome_ids, rec["probabilities"])},
+        }
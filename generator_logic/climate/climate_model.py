@@ -4,7 +4,7 @@ from typing import Dict, Tuple
 import numpy as np
 from math import radians, cos, sin
 from scipy.ndimage import binary_erosion, gaussian_filter
-from game_engine_restructured.numerics.fast_hydrology import chamfer_distance_transform
+from game_engine_restructured.numerics.fast_hydrology import euclidean_distance_transform_multi
 
 # ==============================================================================
 # --- Вспомогательные под-функции, перенесенные и адаптированные ---
@@ -30,14 +30,18 @@ def _calculate_base_humidity(
     """
     Расчет базовой влажности на основе близости к океанам и рекам.
     """
+    # Расстояния до воды и до рек - одним проходом точного EDT.
+    # Источники - сами клетки воды/рек, расстояние считается для суши.
+    coast_dist_px, river_dist_px = euclidean_distance_transform_multi(
+        np.stack((is_water_mask, river_mask))
+    )
+
     # 1. Расстояние до крупных водоемов (океаны/моря)
-    coast_dist_px = chamfer_distance_transform(~is_water_mask)
     coast_falloff_m = params.get("coast_effect_falloff_m", 50000.0)
     # Влажность спадает экспоненциально от побережья
     coastal_humidity = np.exp(-coast_dist_px * mpp / coast_falloff_m)
 
     # 2. Расстояние до рек
-    river_dist_px = chamfer_distance_transform(~river_mask)
     river_proximity_threshold_px = params.get("river_proximity_threshold_px", 128.0)
     # Влажность повышена вблизи рек
     river_humidity = 1.0 - np.clip(river_dist_px / river_proximity_threshold_px, 0.0, 1.0)
@@ -4,7 +4,9 @@ from typing import Dict, Tuple
 import numpy as np
 import math
 import logging
+from scipy.sparse import csr_matrix
 from . import global_models
+from ..topology.icosa_grid import neighbors_to_csr
 from editor.utils.diag import diag_array
 
 # Получаем логгер для этого модуля
@@ -111,39 +113,47 @@ def transport_humidity(
         xyz_coords: np.ndarray,
         initial_humidity: np.ndarray,
         wind_vectors: np.ndarray,
-        neighbors: list[list[int]],
+        neighbors: list[list[int]] | Tuple[np.ndarray, np.ndarray],
         iterations: int = 5,
         damping: float = 0.98
 ) -> np.ndarray:
     """
     Симулирует перенос влаги по ветру с помощью простого итеративного метода.
+
+    neighbors - списки соседей или CSR-пара (indptr, indices) из build_hexplanet.
+    Веса переноса (проекция ветра на направление от соседа) не меняются между
+    итерациями, поэтому собираются один раз в разреженную матрицу, и каждая
+    итерация - одно умножение матрицы на вектор.
     """
+    if isinstance(neighbors, tuple):
+        indptr, indices = neighbors
+    else:
+        indptr, indices = neighbors_to_csr(neighbors)
+
+    n_cells = initial_humidity.shape[0]
+    rows = np.repeat(np.arange(n_cells), np.diff(indptr))
+    cols = np.asarray(indices, dtype=np.int64)
+
+    # Вектор от соседа к текущей точке и проекция ветра на него
+    direction_vec = xyz_coords[rows] - xyz_coords[cols]
+    wind_alignment = np.einsum("ij,ij->i", wind_vectors[rows], direction_vec)
+
+    # Учитываем только соседей, от которых ветер дует К нам.
+    # Океаны пропускаем, они всегда источник максимальной влажности.
+    inflow = (wind_alignment > 0) & (initial_humidity[rows] < 1.0)
+    transport = csr_matrix(
+        (wind_alignment[inflow].astype(np.float64), (rows[inflow], cols[inflow])), shape=(n_cells, n_cells)
+    )
+    count = np.bincount(rows[inflow], minlength=n_cells)
+    updated = count > 0
+    inv_count = 1.0 / count[updated]
+
     humidity = initial_humidity.copy()
     for i in range(iterations):
         next_humidity = humidity.copy()
-        for j in range(len(humidity)):
-            # Пропускаем океаны, они всегда источник максимальной влажности
-            if initial_humidity[j] >= 1.0:
-                continue
-
-            total_influx = 0.0
-            count = 0
-            for neighbor_idx in neighbors[j]:
-                # Вектор от соседа к текущей точке
-                direction_vec = xyz_coords[j] - xyz_coords[neighbor_idx]
-                # Проекция ветра на направление к нам
-                wind_alignment = np.dot(wind_vectors[j], direction_vec)
-
-                # Если ветер дует ОТ соседа К нам, учитываем его влажность
-                if wind_alignment > 0:
-                    total_influx += humidity[neighbor_idx] * wind_alignment
-                    count += 1
-
-            if count > 0:
-                avg_influx = total_influx / count
-                # --- ИЗМЕНЕНИЕ ЛОГИКИ ---
-                # Даем больше веса приходящей влаге, чтобы она быстрее распространялась
-                next_humidity[j] = humidity[j] * 0.6 + avg_influx * 0.4
+        avg_influx = (transport @ humidity)[updated] * inv_count
+        # Даем больше веса приходящей влаге, чтобы она быстрее распространялась
+        next_humidity[updated] = humidity[updated] * 0.6 + avg_influx * 0.4
 
         humidity = np.clip(next_humidity * damping, 0.0, 1.0)  # Применяем затухание и ограничитель
 
@@ -163,7 +173,7 @@ def orchestrate_global_climate_simulation(
         xyz_coords: np.ndarray,
         heights_m: np.ndarray,
         is_land_mask: np.ndarray,
-        neighbors: list[list[int]],
+        neighbors: list[list[int]] | Tuple[np.ndarray, np.ndarray],
         params: dict
 ) -> Dict[str, np.ndarray]:
     """
@@ -1,8 +1,15 @@
 # ЗАМЕНА ВСЕГО ФАЙЛА: generator_logic/topology/icosa_grid.py
 from __future__ import annotations
+import itertools
+import logging
 import math
+import os
+from pathlib import Path
 from typing import List, Tuple, Dict
 import numpy as np
+from scipy.spatial import cKDTree
+
+logger = logging.getLogger(__name__)
 
 EPS = 1e-12
 
@@ -29,184 +36,272 @@ def _xyz_to_lonlat(X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
     lat = np.arcsin(np.clip(z, -1.0, 1.0))
     return lon, lat
 
+RHOMB_PAIRS = [(0,1),(2,3),(4,5),(6,7),(8,9), (10,11),(12,13),(14,15),(16,17),(18,19)]
+
+# Версия формата кэша гексапланеты на диске (менять при изменении построения)
+HEXPLANET_CACHE_VERSION = 1
+
 def build_hexplanet(f: int, lon0_deg: float = 18.0) -> Dict[str, object]:
     if f < 1: raise ValueError("subdivision f must be >= 1")
     v0, F = _icosahedron()
-    v_to_f = [[] for _ in range(12)]
-    for face_idx, (v1, v2, v3) in enumerate(F):
-        v_to_f[v1].append(face_idx)
-        v_to_f[v2].append(face_idx)
-        v_to_f[v3].append(face_idx)
     V, T, owner_face, local_xy = _subdivide_and_project(v0, F, f)
-    neighbors = _vertex_adjacency_from_faces(T, V.shape[0])
+    neighbors_indptr, neighbors_indices = _vertex_adjacency_csr(T, V.shape[0])
+    neighbors = csr_to_neighbors(neighbors_indptr, neighbors_indices)
     centers_xyz = _normalize(V).astype(np.float32)
-    deg = np.array([len(nbs) for nbs in neighbors], dtype=np.int32)
+    deg = np.diff(neighbors_indptr).astype(np.int32)
     pent_ids = np.where(deg == 5)[0].astype(np.int32).tolist()
     hex_ids  = np.where(deg == 6)[0].astype(np.int32).tolist()
-    N_cells = V.shape[0]
     lon, lat = _xyz_to_lonlat(centers_xyz)
     centers_lonlat_rad = np.stack([lon, lat], axis=1).astype(np.float32)
-    cell_polys_lonlat_rad = _cell_polygons_lonlat(centers_xyz, T)
-    RHOMB_PAIRS = [(0,1),(2,3),(4,5),(6,7),(8,9), (10,11),(12,13),(14,15),(16,17),(18,19)]
-    FACE_ROT60 = {f:0 for f in range(20)}
-    FACE_UPPER = {a:True for a,b in RHOMB_PAIRS} | {b:False for a,b in RHOMB_PAIRS}
-    maps = {f: _face_affine(f, RHOMB_PAIRS, FACE_ROT60, FACE_UPPER) for f in range(20)}
-    xy_net = np.zeros((V.shape[0], 2), dtype=np.float32)
-    for vi in range(V.shape[0]):
-        f_owner = owner_face[vi]
-        if f_owner < 0: f_owner = v_to_f[vi][0]
-        xloc, yloc = local_xy[vi]
-        X, Y = maps[f_owner](xloc, yloc)
-        xy_net[vi,0] = X; xy_net[vi,1] = Y
-    minx,miny = xy_net[:,0].min(), xy_net[:,1].min()
-    xy_net[:,0] -= minx; xy_net[:,1] -= miny
-    maxx,maxy = xy_net[:,0].max(), xy_net[:,1].max()
-    scale = max(maxx, maxy)
-    if scale > 1e-6: xy_net /= scale
+    corners_xyz, polys_indptr, polys_corners = _cell_polygons_csr(centers_xyz, T)
+    xy_net = _net_xy01(F, owner_face, local_xy)
+    return _hexplanet_dict(centers_xyz, centers_lonlat_rad, neighbors, pent_ids, hex_ids,
+                           neighbors_indptr, neighbors_indices, lon0_deg,
+                           corners_xyz, polys_indptr, polys_corners, T, xy_net)
+
+def _hexplanet_dict(centers_xyz, centers_lonlat_rad, neighbors, pent_ids, hex_ids,
+                    neighbors_indptr, neighbors_indices, lon0_deg,
+                    corners_xyz, polys_indptr, polys_corners, T, xy_net) -> Dict[str, object]:
+    # Многоугольники ячеек: углы - центроиды треугольников, по CSR (indptr, corners)
+    lon, lat = _xyz_to_lonlat(corners_xyz[polys_corners])
+    ring_lonlat = np.stack([lon, lat], axis=1).astype(np.float32)
+    cell_polys_lonlat_rad = np.split(ring_lonlat, polys_indptr[1:-1])
     return {
         "centers_xyz": centers_xyz, "centers_lonlat_rad": centers_lonlat_rad,
         "neighbors": neighbors, "pent_ids": pent_ids, "hex_ids": hex_ids,
+        "neighbors_indptr": neighbors_indptr, "neighbors_indices": neighbors_indices,
         "lon0_rad": math.radians(lon0_deg), "cell_polys_lonlat_rad": cell_polys_lonlat_rad,
+        "corners_xyz": corners_xyz, "cell_polys_indptr": polys_indptr, "cell_polys_corners": polys_corners,
         "triangles": T, "net_xy01": xy_net.astype(np.float32)
     }
 
-def _face_affine(face_id, RHOMB_PAIRS, FACE_ROT60, FACE_UPPER):
-    rot = FACE_ROT60.get(face_id, 0)
-    upper = FACE_UPPER[face_id]
+def load_or_build_hexplanet(f: int, cache_dir: Path | None = None, lon0_deg: float = 18.0) -> Dict[str, object]:
+    """build_hexplanet с кэшем на диске (один файл на уровень разбиения)."""
+    if cache_dir is None:
+        return build_hexplanet(f, lon0_deg)
+    # lon0 на массивы не влияет, поэтому в ключ не входит
+    path = Path(cache_dir) / f"hexplanet_v{HEXPLANET_CACHE_VERSION}_f{int(f)}.npz"
+    if path.exists():
+        try:
+            with np.load(path, allow_pickle=False) as d:
+                indptr, indices = d["neighbors_indptr"], d["neighbors_indices"]
+                return _hexplanet_dict(
+                    d["centers_xyz"], d["centers_lonlat_rad"], csr_to_neighbors(indptr, indices),
+                    d["pent_ids"].tolist(), d["hex_ids"].tolist(), indptr, indices, lon0_deg,
+                    d["corners_xyz"], d["cell_polys_indptr"], d["cell_polys_corners"],
+                    d["triangles"], d["net_xy01"])
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Не удалось прочитать кэш гексапланеты {path}: {e}. Сетка будет построена заново.")
+
+    planet = build_hexplanet(f, lon0_deg)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.stem}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, "wb") as fh:
+            np.savez(fh, **{k: np.asarray(planet[k]) for k in (
+                "centers_xyz", "centers_lonlat_rad", "pent_ids", "hex_ids", "neighbors_indptr",
+                "neighbors_indices", "corners_xyz", "cell_polys_indptr", "cell_polys_corners",
+                "triangles", "net_xy01")})
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Не удалось сохранить кэш гексапланеты {path}: {e}")
+    return planet
+
+def _face_affine_params(face_id: int) -> Tuple[float, float, float, bool]:
+    """(ox, oy, угол поворота, верхний треугольник) для раскладки грани на развертке."""
+    rot = 0
+    upper = True
     col, row = 0, 0
     for idx,(fa,fb) in enumerate(RHOMB_PAIRS):
-        if face_id in (fa,fb): col = idx % 5; row = idx // 5; break
-    ox = col * 1.5
-    oy = row * math.sqrt(3)
-    def map_point(x,y):
-        cx, cy = (0.5, math.sqrt(3)/4.0)
-        dx, dy = (x - cx, y - cy)
-        ang = rot * (math.pi/3.0)
-        rx =  dx*math.cos(ang) - dy*math.sin(ang)
-        ry =  dx*math.sin(ang) + dy*math.cos(ang)
-        X = rx + cx + ox
-        Y = (ry + cy + oy) if upper else (ry + cy + oy - math.sqrt(3)/2.0)
-        return X, Y
-    return map_point
+        if face_id in (fa,fb):
+            col = idx % 5; row = idx // 5; upper = face_id == fa; break
+    return col * 1.5, row * math.sqrt(3), rot * (math.pi/3.0), upper
+
+def _net_xy01(F: np.ndarray, owner_face: np.ndarray, local_xy: np.ndarray) -> np.ndarray:
+    # Угловые вершины икосаэдра принадлежат первой грани, в которую они входят
+    first_face = np.full(12, -1, dtype=np.int64)
+    for face_idx in range(F.shape[0] - 1, -1, -1):
+        first_face[F[face_idx]] = face_idx
+    owner = owner_face.copy()
+    owner[:12] = first_face
+
+    params = np.array([_face_affine_params(fi) for fi in range(F.shape[0])], dtype=np.float64)
+    ox, oy, ang, upper = (params[owner, k] for k in range(4))
+    cx, cy = (0.5, math.sqrt(3)/4.0)
+    dx, dy = local_xy[:, 0] - cx, local_xy[:, 1] - cy
+    rx = dx*np.cos(ang) - dy*np.sin(ang)
+    ry = dx*np.sin(ang) + dy*np.cos(ang)
+    xy_net = np.empty((owner.shape[0], 2), dtype=np.float32)
+    xy_net[:, 0] = rx + cx + ox
+    xy_net[:, 1] = np.where(upper > 0, ry + cy + oy, ry + cy + oy - math.sqrt(3)/2.0)
+    minx,miny = xy_net[:,0].min(), xy_net[:,1].min()
+    xy_net[:,0] -= minx; xy_net[:,1] -= miny
+    maxx,maxy = xy_net[:,0].max(), xy_net[:,1].max()
+    scale = max(maxx, maxy)
+    if scale > 1e-6: xy_net /= scale
+    return xy_net
 
 def _normalize(V: np.ndarray) -> np.ndarray:
     n = np.linalg.norm(V, axis=1, keepdims=True)
     n[n < EPS] = 1.0
     return V / n
 
-def _subdivide_and_project(V0: np.ndarray, F: np.ndarray, f: int) -> Tuple[np.ndarray, np.ndarray, List[int], List[Tuple[float,float]]]:
+def _face_grid_template(f: int):
+    """
+    Точки треугольной сетки одной грани в порядке обхода (i, затем j)
+    и треугольники сетки в локальных номерах этих точек.
+    """
+    I = np.concatenate([np.full(f + 1 - i, i, dtype=np.int64) for i in range(f + 1)])
+    J = np.concatenate([np.arange(f + 1 - i, dtype=np.int64) for i in range(f + 1)])
+    row_start = np.concatenate([[0], np.cumsum(np.arange(f + 1, 0, -1))])
+    tris = []
+    for i in range(f):
+        j = np.arange(f - i, dtype=np.int64)
+        g0, g1 = row_start[i] + j, row_start[i + 1] + j
+        up = np.stack([g0, g1, g0 + 1], axis=1)
+        down = np.stack([g1[:-1], g1[:-1] + 1, g0[:-1] + 1], axis=1)
+        # Чередование как при обходе: вверх j, вниз j, вверх j+1, ...
+        pair = np.empty((2 * (f - i) - 1, 3), dtype=np.int64)
+        pair[0::2] = up
+        pair[1::2] = down
+        tris.append(pair)
+    return I, J, f - I - J, np.concatenate(tris)
+
+def _subdivide_and_project(V0: np.ndarray, F: np.ndarray, f: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Разбиение граней икосаэдра на f частей по ребру. Нумерация вершин та же,
+    что у прежнего построения по граням: 12 вершин икосаэдра, затем точки
+    в порядке первого появления при обходе граней. Общие точки ребер
+    объединяются по ключу (ребро, шаг от меньшей вершины), без словаря.
+    """
     V0 = _normalize(V0.copy())
-    verts: List[List[float]] = V0.tolist()
-    faces_out: List[Tuple[int,int,int]] = []
-    owner_face = [-1] * 12
-    local_xy   = [(0.0, 0.0)] * 12
     A2 = np.array([0.0, 0.0]); B2 = np.array([1.0, 0.0]); C2 = np.array([0.5, math.sqrt(3)/2.0])
-    edge_cache: Dict[Tuple[int,int,int,int], int] = {}
-    def get_edge_point(a: int, b: int, step: int, which: str, face_id: int) -> int:
-        if step <= 0: return a
-        if step >= f: return b
-        if a < b: key = (a, b, step, f); t = step / float(f); pa, pb = a, b
-        else: key = (b, a, f - step, f); t = (f - step) / float(f); pa, pb = b, a
-        idx = edge_cache.get(key, -1)
-        if idx != -1: return idx
-        A = V0[pa]; B = V0[pb]
-        p = (1.0 - t) * A + t * B
-        p = p / (np.linalg.norm(p) + EPS)
-        idx = len(verts)
-        verts.append(p.tolist())
-        if which == 'AB': P2 = (1-t)*A2 + t*B2
-        elif which == 'AC': P2 = (1-t)*A2 + t*C2
-        else: P2 = (1-t)*B2 + t*C2
-        owner_face.append(face_id)
-        local_xy.append((float(P2[0]), float(P2[1])))
-        edge_cache[key] = idx
-        return idx
-    for face_id, (a, b, c) in enumerate(F):
-        def edge_AB_point(step): return get_edge_point(a, b, step, which='AB', face_id=face_id)
-        def edge_AC_point(step): return get_edge_point(a, c, step, which='AC', face_id=face_id)
-        def edge_BC_point(step): return get_edge_point(c, b, step, which='BC', face_id=face_id)
-        grid: List[List[int]] = []
-        for i in range(f + 1):
-            row: List[int] = []
-            max_j = f - i
-            for j in range(max_j + 1):
-                k = f - i - j
-                if i == f and j == 0: idx = a
-                elif j == f and i == 0: idx = b
-                elif k == f and i == 0 and j == 0: idx = c
-                elif k == 0: idx = edge_AB_point(j)
-                elif j == 0: idx = edge_AC_point(f - i)
-                elif i == 0: idx = edge_BC_point(j)
-                else:
-                    A = V0[a]; B = V0[b]; C = V0[c]
-                    p = (i * A + j * B + k * C) / float(f)
-                    p = p / (np.linalg.norm(p) + EPS)
-                    idx = len(verts)
-                    verts.append(p.tolist())
-                    P2 = (i*A2 + j*B2 + k*C2) / float(f)
-                    owner_face.append(face_id)
-                    local_xy.append((float(P2[0]), float(P2[1])))
-                row.append(idx)
-            grid.append(row)
-        for i in range(f):
-            max_j = f - i
-            for j in range(max_j):
-                v00 = grid[i][j]; v10 = grid[i + 1][j]; v01 = grid[i][j + 1]
-                faces_out.append((v00, v10, v01))
-                if j < max_j - 1: v11 = grid[i + 1][j + 1]; faces_out.append((v10, v11, v01))
-    V = np.asarray(verts, dtype=np.float64)
-    V = _normalize(V)
-    T = np.asarray(faces_out, dtype=np.int32)
-    return V, T, owner_face, local_xy
-
-def _vertex_adjacency_from_faces(T: np.ndarray, nV: int) -> List[List[int]]:
-    adj: List[set] = [set() for _ in range(nV)]
-    for a, b, c in T:
-        adj[a].add(b); adj[a].add(c)
-        adj[b].add(a); adj[b].add(c)
-        adj[c].add(a); adj[c].add(b)
-    return [sorted(list(s)) for s in adj]
+    I, J, K, tri_template = _face_grid_template(f)
+    P = I.shape[0]
+    n_faces = F.shape[0]
 
-def _tangent_basis(n: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
-    a = np.array([1.0, 0.0, 0.0], dtype=np.float64)
-    if abs(float(n @ a)) > 0.9: a = np.array([0.0, 1.0, 0.0], dtype=np.float64)
-    t = a - n * float(n @ a)
-    t /= (np.linalg.norm(t) + 1e-12)
-    b = np.cross(n, t)
-    b /= (np.linalg.norm(b) + 1e-12)
-    return t, b
+    # Все точки всех граней в порядке обхода
+    face = np.repeat(np.arange(n_faces, dtype=np.int64), P)
+    i, j, k = np.tile(I, n_faces), np.tile(J, n_faces), np.tile(K, n_faces)
+    a, b, c = F[face, 0].astype(np.int64), F[face, 1].astype(np.int64), F[face, 2].astype(np.int64)
+
+    corner = np.full(face.shape[0], -1, dtype=np.int64)
+    is_a = (i == f) & (j == 0)
+    is_b = (j == f) & (i == 0)
+    is_c = (k == f) & (i == 0) & (j == 0)
+    corner[is_a] = a[is_a]; corner[is_b] = b[is_b]; corner[is_c] = c[is_c]
+    is_corner = corner >= 0
+    on_ab = ~is_corner & (k == 0)
+    on_ac = ~is_corner & ~on_ab & (j == 0)
+    on_bc = ~is_corner & ~on_ab & ~on_ac & (i == 0)
+    interior = ~(is_corner | on_ab | on_ac | on_bc)
+
+    # Точка ребра (p -> q, шаг s) приводится к виду (меньшая вершина, большая, шаг от меньшей)
+    p = np.where(on_ab, a, c)
+    p = np.where(on_ac, a, p)
+    q = np.where(on_ab, b, np.where(on_ac, c, b))
+    step = np.where(on_ab, j, np.where(on_ac, f - i, j))
+    forward = p < q
+    pa, pb = np.where(forward, p, q), np.where(forward, q, p)
+    canon_step = np.where(forward, step, f - step)
+    t = canon_step / float(f)
+
+    on_edge = on_ab | on_ac | on_bc
+    key = np.where(on_edge, (pa * 12 + pb) * (f + 1) + canon_step, 144 * (f + 1) + np.arange(face.shape[0]))
+    new_points = ~is_corner
+    uniq, first, inverse = np.unique(key[new_points], return_index=True, return_inverse=True)
+    creation_order = np.argsort(first, kind="stable")
+    new_id = np.empty(uniq.shape[0], dtype=np.int64)
+    new_id[creation_order] = 12 + np.arange(uniq.shape[0])
+    vid = corner.copy()
+    vid[new_points] = new_id[inverse]
+
+    # Координаты и локальные xy берутся у первого появления точки
+    src = np.flatnonzero(new_points)[first[creation_order]]
+    n_new = src.shape[0]
+    verts = np.empty((12 + n_new, 3), dtype=np.float64)
+    verts[:12] = V0
+    local_xy = np.zeros((12 + n_new, 2), dtype=np.float64)
+    owner_face = np.full(12 + n_new, -1, dtype=np.int64)
+    owner_face[12:] = face[src]
+
+    e = src[on_edge[src]]
+    te = t[e][:, None]
+    pts = (1.0 - te) * V0[pa[e]] + te * V0[pb[e]]
+    e_out = 12 + np.flatnonzero(on_edge[src])
+    verts[e_out] = pts / (np.linalg.norm(pts, axis=1, keepdims=True) + EPS)
+    local_xy[e_out] = np.where(on_ab[e][:, None], (1 - te)*A2 + te*B2,
+                               np.where(on_ac[e][:, None], (1 - te)*A2 + te*C2, (1 - te)*B2 + te*C2))
+
+    m = src[interior[src]]
+    ii, jj, kk = i[m][:, None], j[m][:, None], k[m][:, None]
+    pts = (ii * V0[a[m]] + jj * V0[b[m]] + kk * V0[c[m]]) / float(f)
+    m_out = 12 + np.flatnonzero(interior[src])
+    verts[m_out] = pts / (np.linalg.norm(pts, axis=1, keepdims=True) + EPS)
+    local_xy[m_out] = (ii*A2 + jj*B2 + kk*C2) / float(f)
+
+    grid = vid.reshape(n_faces, P)
+    T = grid[:, tri_template].reshape(-1, 3).astype(np.int32)
+    return _normalize(verts), T, owner_face, local_xy
+
+def _vertex_adjacency_csr(T: np.ndarray, nV: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Соседи вершин по ребрам треугольников в CSR, соседи каждой вершины по возрастанию."""
+    T = T.astype(np.int64)
+    src = np.concatenate([T[:, 0], T[:, 1], T[:, 2], T[:, 1], T[:, 2], T[:, 0]])
+    dst = np.concatenate([T[:, 1], T[:, 2], T[:, 0], T[:, 0], T[:, 1], T[:, 2]])
+    pairs = np.unique(src * nV + dst)
+    indptr = np.zeros(nV + 1, dtype=np.int64)
+    np.cumsum(np.bincount(pairs // nV, minlength=nV), out=indptr[1:])
+    return indptr, (pairs % nV).astype(np.int32)
+
+def csr_to_neighbors(indptr: np.ndarray, indices: np.ndarray) -> List[List[int]]:
+    """Обратное к neighbors_to_csr: списки соседей для кода, который работает со списками."""
+    return [nbs.tolist() for nbs in np.split(indices, indptr[1:-1])]
+
+def neighbors_to_csr(neighbors: List[List[int]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Списки соседей в формате CSR: соседи ячейки i - indices[indptr[i]:indptr[i+1]]."""
+    counts = np.fromiter((len(nbs) for nbs in neighbors), dtype=np.int64, count=len(neighbors))
+    indptr = np.zeros(len(neighbors) + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    indices = np.fromiter(itertools.chain.from_iterable(neighbors), dtype=np.int32, count=int(indptr[-1]))
+    return indptr, indices
 
 def _triangle_centroids_xyz(V: np.ndarray, T: np.ndarray) -> np.ndarray:
     C = V[T[:,0]] + V[T[:,1]] + V[T[:,2]]
     return C / (np.linalg.norm(C, axis=1, keepdims=True) + 1e-12)
 
-def _incident_faces(T: np.ndarray, nV: int) -> list[list[int]]:
-    inc = [[] for _ in range(nV)]
-    for fi, (a,b,c) in enumerate(T):
-        inc[a].append(fi); inc[b].append(fi); inc[c].append(fi)
-    return inc
+def _tangent_basis(n: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Касательный базис (t, b) для массива нормалей (N, 3)."""
+    a = np.zeros_like(n)
+    use_y = np.abs(n[:, 0]) > 0.9
+    a[~use_y, 0] = 1.0
+    a[use_y, 1] = 1.0
+    t = a - n * np.sum(n * a, axis=1, keepdims=True)
+    t /= (np.linalg.norm(t, axis=1, keepdims=True) + 1e-12)
+    b = np.cross(n, t)
+    b /= (np.linalg.norm(b, axis=1, keepdims=True) + 1e-12)
+    return t, b
 
-def _cell_polygons_lonlat(V: np.ndarray, T: np.ndarray) -> list[np.ndarray]:
+def _cell_polygons_csr(V: np.ndarray, T: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Многоугольники ячеек (дуальная сетка): углы ячейки v - центроиды
+    инцидентных ей треугольников, упорядоченные по углу вокруг v.
+    Возвращает (corners_xyz, indptr, corners): углы ячейки i -
+    corners_xyz[corners[indptr[i]:indptr[i+1]]].
+    """
     C = _triangle_centroids_xyz(V, T)
-    inc = _incident_faces(T, V.shape[0])
-    polys = []
-    for v_idx in range(V.shape[0]):
-        n = V[v_idx]
-        t, b = _tangent_basis(n)
-        fids = inc[v_idx]
-        if not fids: polys.append(np.zeros((0,2), dtype=np.float32)); continue
-        angles = []
-        for fi in fids:
-            q = C[fi]
-            w = q - n * float(n @ q)
-            wx = float(w @ t); wy = float(w @ b)
-            ang = math.atan2(wy, wx)
-            angles.append((ang, fi))
-        angles.sort(key=lambda x: x[0])
-        ring = np.array([C[fi] for (ang, fi) in angles], dtype=np.float64)
-        lon, lat = _xyz_to_lonlat(ring)
-        polys.append(np.stack([lon, lat], axis=1).astype(np.float32))
-    return polys
+    occ_v = T.ravel().astype(np.int64)
+    occ_f = np.repeat(np.arange(T.shape[0], dtype=np.int64), 3)
+    t, b = _tangent_basis(V)
+    n = V[occ_v]
+    q = C[occ_f]
+    w = q - n * np.sum(n * q, axis=1, keepdims=True)
+    ang = np.arctan2(np.sum(w * b[occ_v], axis=1), np.sum(w * t[occ_v], axis=1))
+    # Внутри ячейки - по углу, при равенстве углов - по номеру треугольника
+    order = np.lexsort((occ_f, ang, occ_v))
+    indptr = np.zeros(V.shape[0] + 1, dtype=np.int64)
+    np.cumsum(np.bincount(occ_v, minlength=V.shape[0]), out=indptr[1:])
+    return C.astype(np.float32), indptr, occ_f[order].astype(np.int32)
 
 def lonlat_to_uv(lon_rad: float, lat_rad: float, lon0_rad: float) -> Tuple[float, float]:
     u = (lon_rad - lon0_rad) / (2.0 * math.pi)
@@ -229,4 +324,30 @@ def nearest_cell_by_lonlat(lon_rad: float, lat_rad: float, centers_lonlat_rad: n
 
 def nearest_cell_by_xyz(p_xyz: np.ndarray, centers_xyz: np.ndarray) -> int:
     dot_products = np.dot(centers_xyz, p_xyz)
-    return int(np.argmax(dot_products))
\ No newline at end of file
+    return int(np.argmax(dot_products))
+
+class HexCellLocator:
+    """
+    Поиск ближайшей ячейки гексапланеты для пачки точек на сфере.
+
+    Центры ячеек - единичные векторы, поэтому максимум скалярного
+    произведения (как в nearest_cell_by_xyz) совпадает с минимумом
+    евклидова расстояния до нормированной точки. KD-дерево строится один
+    раз, каждый запрос - O(log n) вместо полного перебора центров.
+    """
+
+    def __init__(self, centers_xyz: np.ndarray):
+        self.centers_xyz = _normalize(np.asarray(centers_xyz, dtype=np.float64))
+        self._tree = cKDTree(self.centers_xyz)
+
+    def __len__(self) -> int:
+        return self.centers_xyz.shape[0]
+
+    def query(self, points_xyz: np.ndarray) -> np.ndarray:
+        """Индексы ближайших ячеек (int32) для точек формы (N, 3)."""
+        pts = _normalize(np.asarray(points_xyz, dtype=np.float64).reshape(-1, 3))
+        _, idx = self._tree.query(pts, k=1)
+        return np.asarray(idx, dtype=np.int32)
+
+    def query_one(self, p_xyz: np.ndarray) -> int:
+        return int(self.query(p_xyz)[0])
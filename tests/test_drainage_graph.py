@@ -0,0 +1,59 @@
+# Файл: tests/test_drainage_graph.py
+# Приток через границу холста региона из грубого графа стока.
+import numpy as np
+
+from game_engine_restructured.numerics.fast_hydrology import (
+    build_d8_flow_directions, flow_accumulation_topological,
+)
+from game_engine_restructured.world.processing.drainage_graph import DrainageGraph
+
+# Холст региона (0, 0) при region_size 1 и чанке 4 px - 6x6 грубых клеток
+# по 2 px, начиная с клетки (3, 3) графа 12x12.
+N, CP, CHUNK, REGION = 12, 2, 4, 1
+ORIGIN_PX = -10
+I0 = J0 = 3
+CELLS = (REGION + 2) * CHUNK // CP
+AREA = CP * CP
+
+
+def _graph(flow_dirs: np.ndarray) -> DrainageGraph:
+    heights = np.tile(np.arange(N, 0, -1, dtype=np.float32), (N, 1))
+    weights = np.full(flow_dirs.shape, float(AREA), dtype=np.float32)
+    return DrainageGraph(heights, flow_dirs, flow_accumulation_topological(flow_dirs, weights), ORIGIN_PX, CP)
+
+
+def _tilted_plane_dirs() -> np.ndarray:
+    # Плоскость с уклоном на восток: вся вода течет по строкам направо
+    heights = np.tile(np.arange(N, 0, -1, dtype=np.float32), (N, 1))
+    flow_dirs = build_d8_flow_directions(heights)
+    assert np.all(flow_dirs[:, :-1] == 0)
+    return flow_dirs
+
+
+def _boundary_flow(graph: DrainageGraph):
+    heights_ext = np.zeros(((REGION + 2) * CHUNK,) * 2, dtype=np.float32)
+    return graph.boundary_flow(0, 0, REGION, CHUNK, heights_ext)
+
+
+def test_tilted_plane_inflow_through_west_edge():
+    flow = _boundary_flow(_graph(_tilted_plane_dirs()))
+
+    # В каждую строку холста втекает вода J0 западных клеток
+    expected_in = CELLS * J0 * AREA
+    assert flow.inflow_total == expected_in
+    assert float(flow.inflow.sum()) == expected_in
+    # Приток лежит в западном столбце грубых клеток
+    assert np.all(flow.inflow[:, CP:] == 0)
+    assert flow.outflow_total == CELLS * (J0 + CELLS) * AREA
+
+
+def test_water_that_leaves_and_reenters_is_not_counted_twice():
+    flow_dirs = _tilted_plane_dirs()
+    # Клетка края холста сливает на север, клетка кольца возвращает воду на юго-восток
+    flow_dirs[I0, J0 + 1] = 2
+    flow_dirs[I0 - 1, J0 + 1] = 7
+    flow = _boundary_flow(_graph(flow_dirs))
+
+    # Вернувшаяся вода уже прошла через холст; в приток идет только сток
+    # кольца западнее петли (J0 + 2 клеток)
+    assert flow.inflow_total == CELLS * J0 * AREA + (J0 + 2) * AREA
@@ -0,0 +1,50 @@
+# Файл: tests/test_stage_checkpoints.py
+# Сцепление ключей этапов и валидация контрольных точек RegionProcessor.
+from typing import Any, Dict
+
+import numpy as np
+
+from game_engine_restructured.world.processing.stage_checkpoints import (
+    STAGES, StageCheckpoints, stage_key,
+)
+
+
+def _chain(climate: Dict[str, Any]) -> Dict[str, str]:
+    keys: Dict[str, str] = {}
+    parent = None
+    inputs = {"elevation": {"seed": 1}, "hydrology": {"water": {}}, "climate": climate, "analysis": {}}
+    for stage in STAGES:
+        parent = keys[stage] = stage_key(parent, stage, **inputs[stage])
+    return keys
+
+
+def test_keys_are_deterministic():
+    assert _chain({"temperature": {"base_c": 15.0}}) == _chain({"temperature": {"base_c": 15.0}})
+
+
+def test_changed_stage_invalidates_only_itself_and_later_stages():
+    base = _chain({"temperature": {"base_c": 15.0}})
+    changed = _chain({"temperature": {"base_c": 20.0}})
+    assert base["elevation"] == changed["elevation"]
+    assert base["hydrology"] == changed["hydrology"]
+    assert base["climate"] != changed["climate"]
+    assert base["analysis"] != changed["analysis"]
+
+
+def test_checkpoint_loads_only_under_its_own_key(tmp_path):
+    base = _chain({"temperature": {"base_c": 15.0}})
+    changed = _chain({"temperature": {"base_c": 20.0}})
+    checkpoints = StageCheckpoints(tmp_path)
+    data = {"height": np.arange(6, dtype=np.float32).reshape(2, 3)}
+    checkpoints.save(0, 0, "climate", base["climate"], data)
+
+    loaded = checkpoints.load(0, 0, "climate", base["climate"])
+    assert loaded is not None
+    assert np.array_equal(loaded["height"], data["height"])
+    assert checkpoints.load(0, 0, "climate", changed["climate"]) is None
+
+
+def test_disabled_checkpoints_never_load(tmp_path):
+    key = _chain({})["climate"]
+    StageCheckpoints(tmp_path).save(0, 0, "climate", key, {"a": np.zeros(1)})
+    assert StageCheckpoints(tmp_path, enabled=False).load(0, 0, "climate", key) is None